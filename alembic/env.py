@@ -11,24 +11,20 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-# 🔧 Chargement des variables d'environnement
-from dotenv import load_dotenv
-load_dotenv()
-
 # ⬇️ IMPORTATION DE VOS MODÈLES SQLALCHEMY
 # Adapte ce chemin selon l'emplacement réel de tes modèles
 # ⬇️ IMPORTATION DE VOS MODÈLES SQLALCHEMY
 from app.database import Base    # Base vient bien de database.py
-import app.models                # déclenche l’import de tous les modèles
+from app.models import load_all_models
+load_all_models()                # déclenche l’import de tous les modèles (chargés paresseusement sinon)
 
 
 # 🔧 RÉCUPÉRATION DE LA CONFIGURATION ALEMBIC
 config = context.config
 
-# 🛠️ MISE À JOUR DE L'URL DE CONNEXION AVEC CELLE DU .env
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL n'est pas défini. Vérifiez votre fichier .env.")
+# 🛠️ MISE À JOUR DE L'URL DE CONNEXION AVEC CELLE DU .env (lue via les paramètres de l'application)
+from app.config import get_settings
+DATABASE_URL = get_settings().database_url
 
 config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
@@ -57,10 +53,15 @@ def run_migrations_offline() -> None:
 # 🔁 MIGRATIONS EN MODE ONLINE
 def run_migrations_online() -> None:
     """Exécuter les migrations avec une connexion à la base de données."""
+    # Pool par défaut (QueuePool) : une seule poignée de main TCP/TLS pour toute la migration.
+    # NullPool reste disponible via ALEMBIC_NULLPOOL=1 (ex. derrière pgbouncer en mode transaction).
+    engine_kwargs = {}
+    if os.getenv("ALEMBIC_NULLPOOL"):
+        engine_kwargs["poolclass"] = pool.NullPool
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
+        **engine_kwargs,
     )
 
     with connectable.connect() as connection:
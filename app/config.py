@@ -1,14 +1,43 @@
 # app/config.py
-import os
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Literal
+from pydantic import Field, SecretStr
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
-# Charge le contenu de .env dans l'environnement
-load_dotenv()
 
-# Récupère la variable d'environnement pour l'URL de la base
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL n'est pas défini dans le fichier .env")
+class Settings(BaseSettings):
+    """
+    Configuration de l'application, lue une seule fois depuis l'environnement et le fichier .env.
+    """
+    # URL de la base de données (obligatoire)
+    database_url: str
 
-# Autres variables de configuration si nécessaire
-SECRET_KEY = os.getenv("SECRET_KEY", "votre_cle_secrete_par_defaut")
+    # Clé secrète utilisée pour signer les tokens JWT (obligatoire, aucune valeur par défaut :
+    # le démarrage échoue si elle est absente ou trop courte)
+    secret_key: SecretStr = Field(..., min_length=32)
+    # Algorithme de signature des tokens : seul HS256 est émis (en-tête JWT précalculé)
+    jwt_algorithm: Literal["HS256"] = "HS256"
+    # Durée de validité des tokens d'accès, directement en secondes (30 minutes par défaut)
+    access_token_expire_seconds: int = Field(1800, gt=0)
+
+    # Dimensionnement des pools de connexions (par engine et par worker)
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    # Attente maximale (s) d'une connexion libre quand le pool est saturé, avant erreur
+    db_pool_timeout: int = 30
+
+    # DATABASE_URL pointe vers pgbouncer en mode "transaction" :
+    # désactive les requêtes préparées nommées d'asyncpg, incompatibles avec le multiplexage
+    pgbouncer: bool = False
+
+    # Lecture du fichier .env (les variables d'environnement restent prioritaires)
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Retourne l'instance unique des paramètres : le fichier .env n'est analysé qu'une fois par processus.
+    """
+    # Lève une erreur de validation explicite si DATABASE_URL ou SECRET_KEY n'est pas défini
+    return Settings()
@@ -1,13 +1,65 @@
 # app/database.py
+import uuid
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import DATABASE_URL
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from app.config import get_settings
+
+# URL de connexion lue depuis les paramètres (analysés une seule fois)
+settings = get_settings()
+DATABASE_URL = settings.database_url
 
 # Création de l'engine SQLAlchemy
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# (rollback explicite au retour dans le pool : aucune connexion ne garde une transaction ouverte)
+# Pas de pool_pre_ping : il ajoute un aller-retour "SELECT 1" à chaque emprunt de connexion.
+# Le recyclage à 30 minutes écarte les connexions périmées ; une déconnexion détectée invalide le pool.
+# executemany (psycopg2) : session.execute(insert(Model), [dict, ...]) est réécrit en INSERT multi-VALUES
+# par pages de 10 000 lignes ; les UPDATE/DELETE en lot passent par execute_batch (un aller-retour par page).
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=False,
+    pool_recycle=1800,
+    pool_reset_on_return="rollback",
+    executemany_mode="values_plus_batch",
+    insertmanyvalues_page_size=10000,
+)
 
 # Création d'une session locale pour interagir avec la BDD
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Base sur laquelle seront basés tous les modèles SQLAlchemy
-Base = declarative_base()
+# URL asynchrone : même base, mais via le driver asyncpg (postgresql+asyncpg://…)
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+
+# Derrière pgbouncer (mode transaction), une requête préparée nommée peut être exécutée
+# sur une autre connexion serveur : cache désactivé et noms uniques pour chaque préparation.
+# (psycopg2, utilisé par l'engine synchrone, n'emploie pas de requêtes préparées côté serveur.)
+ASYNC_CONNECT_ARGS = {}
+if settings.pgbouncer:
+    ASYNC_DATABASE_URL = ASYNC_DATABASE_URL.update_query_dict({"prepared_statement_cache_size": "0"})
+    ASYNC_CONNECT_ARGS = {
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+# Engine asynchrone utilisé par les chemins chauds (authentification) :
+# les E/S suspendent la coroutine au lieu de bloquer un thread du threadpool.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=settings.db_pool_size,          # connexions permanentes dans le pool
+    max_overflow=settings.db_max_overflow,    # connexions supplémentaires autorisées en pic
+    pool_timeout=settings.db_pool_timeout,    # attente maximale d'une connexion libre
+    pool_pre_ping=False,  # pas de "SELECT 1" à chaque emprunt (voir engine ci-dessus)
+    pool_recycle=1800,    # recycle les connexions après 30 minutes
+    connect_args=ASYNC_CONNECT_ARGS,
+)
+
+# Fabrique de sessions asynchrones (les objets restent lisibles après commit)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# Base sur laquelle seront basés tous les modèles SQLAlchemy (style SQLAlchemy 2.0)
+class Base(DeclarativeBase):
+    pass
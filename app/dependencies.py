@@ -1,40 +1,107 @@
 # app/dependencies.py
 
+import time
+import uuid
+import xxhash
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from app.database import SessionLocal
-from app.models.user import User
-import os
+import jwt  # PyJWT : HMAC délégué à OpenSSL (hashlib) plutôt qu'une implémentation en pur Python
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal, AsyncSessionLocal
+from app.models.User import User
+from app.schemas.user import UserOut
+from app.config import get_settings
 
-# Paramètres JWT : on récupère la SECRET_KEY depuis la variable d'environnement (avec une valeur par défaut)
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-ALGORITHM = "HS256"
+# Paramètres JWT : la SECRET_KEY provient des paramètres de l'application (lus une seule fois)
+# et est encodée en octets dès l'import, plutôt qu'à chaque vérification de token.
+SECRET_KEY = get_settings().secret_key.get_secret_value().encode()
+ALGORITHM = get_settings().jwt_algorithm
+# Arguments de jwt.decode construits une seule fois (et non à chaque requête) ;
+# "require" garantit la présence de "sub" et "exp" dans tout token accepté.
+_JWT_ALGORITHMS = [ALGORITHM]
+_JWT_OPTIONS = {"verify_signature": True, "verify_exp": True, "require": ["sub", "exp"]}
 
 # Déclaration du schéma OAuth2 qui attend un token Bearer dans l'en-tête "Authorization".
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# Caches en mémoire du chemin d'authentification :
+# - xxh3_64(token) -> (token, user_id, exp) (évite de revérifier la signature HS256 à chaque requête ;
+#   la clé est un entier 64 bits plutôt que le JWT complet, le token stocké lève les collisions ;
+#   exp est revérifié à chaque lecture : un token qui expire pendant le TTL n'est plus accepté)
+# - user_id -> instantané UserOut (évite le SELECT sur la table "user")
+# Les TTL restent très inférieurs à la durée de vie du token pour qu'une révocation
+# ou une modification du compte soit prise en compte rapidement.
+_token_cache = TTLCache(maxsize=10_000, ttl=30)
+_user_cache = TTLCache(maxsize=10_000, ttl=10)
+
+def get_db():
+    """
+    Dépendance FastAPI fournissant une session de base de données synchrone.
+    Déclarée une seule fois ici : FastAPI met en cache le résultat d'une même dépendance
+    pour toute la durée de la requête, donc tous les Depends(get_db) d'un endpoint
+    (et de ses sous-dépendances) partagent une seule connexion du pool.
+    """
+    with SessionLocal() as db:
+        yield db
+
+async def get_async_db():
+    """
+    Dépendance FastAPI fournissant une session asynchrone (asyncpg).
+    La session est fermée automatiquement à la fin de la requête.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _decode_user_id(token: str) -> uuid.UUID:
+    """
+    Décode le JWT et retourne l'identifiant utilisateur qu'il contient.
+    Le résultat est mis en cache par token pour éviter de revérifier la signature.
+    """
+    token_key = xxhash.xxh3_64_intdigest(token.encode())  # xxhash >= 4 n'accepte que des octets
+    cached = _token_cache.get(token_key)
+    if cached is not None and cached[0] == token and cached[2] > time.time():
+        return cached[1]  # sinon (token expiré) : jwt.decode lève ExpiredSignatureError -> 401
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                detail="Token is missing user identification")
-        # Convertir user_id en entier si votre modèle User utilise des entiers pour l'ID
+        payload = jwt.decode(token, SECRET_KEY, algorithms=_JWT_ALGORITHMS, options=_JWT_OPTIONS)
+        user_id = payload["sub"]  # présence garantie par l'option "require"
+        # Le modèle User utilise des UUID comme identifiant
         try:
-            user_id = int(user_id)
+            user_id = uuid.UUID(user_id)
         except ValueError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Invalid user id in token")
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Could not validate credentials")
+    _token_cache[token_key] = (token, user_id, payload["exp"])
+    return user_id
 
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
-    db.close()
+async def get_current_user(token: str = Depends(oauth2_scheme),
+                           db: AsyncSession = Depends(get_async_db)):
+    user_id = _decode_user_id(token)
+
+    # Chemin rapide : instantané récent de l'utilisateur, sans aller-retour à la base
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    # Requête asynchrone : la coroutine est suspendue pendant l'aller-retour à la base
+    stmt = select(User).where(User.id == user_id)
+    try:
+        user = await db.scalar(stmt)
+    except DBAPIError as exc:
+        # Sans pool_pre_ping, une connexion coupée côté serveur (57P01, 08006…) n'est découverte
+        # qu'à l'usage : SQLAlchemy l'invalide, on relance alors une seule fois cette lecture.
+        if not exc.connection_invalidated:
+            raise
+        await db.rollback()
+        user = await db.scalar(stmt)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="User not found")
+    user = UserOut.model_validate(user)
+    _user_cache[user_id] = user
     return user
@@ -1,22 +1,77 @@
 # app/main.py
 
+import os                                # Pour lire les variables d'environnement
+import importlib                         # Pour importer les routeurs à partir de leur nom de module
+from contextlib import asynccontextmanager  # Pour déclarer le cycle de vie (lifespan) de l'application
 from fastapi import FastAPI              # Importation de FastAPI pour créer l'application web
+from fastapi.responses import ORJSONResponse  # Sérialisation JSON des réponses par orjson (C)
+from fastapi.openapi.utils import get_openapi  # Pour générer le schéma OpenAPI personnalisé
+from starlette.concurrency import run_in_threadpool  # Pour exécuter du code synchrone hors de la boucle d'événements
 from app.database import engine, Base    # Importation de l'engine et de Base pour gérer la création des tables en base
-from app.routers import user, auth, protected             # Importation du module user (router) depuis le dossier app/routers
+from app.models import load_all_models   # Chargement explicite des modèles (importés paresseusement sinon)
+from app.services.api_key_usage import start_api_key_usage_flusher, stop_api_key_usage_flusher
+from app.services.failed_transaction_log import start_failed_transaction_flusher, stop_failed_transaction_flusher
+from app.services.error_code_cache import start_error_code_cache, stop_error_code_cache
+from app.services.webhook_retry_queue import start_webhook_retry_queue_refresher, stop_webhook_retry_queue_refresher
 
-# Création de l'application FastAPI avec un titre identifiable
-app = FastAPI(title="Application Bancaire paysecond_app")
+# Routeurs de l'application, dans l'ordre d'inclusion
+ROUTER_MODULES = (
+    "app.routers.auth",       # Endpoints d'authentification (register, login)
+    "app.routers.protected",  # Endpoints protégés nécessitant un token
+    "app.routers.user",       # Endpoints relatifs aux utilisateurs (CRUD)
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Cycle de vie de l'application : exécuté au démarrage du worker, et non plus à l'import.
+    Création automatique des tables en base de données à partir des modèles SQLAlchemy.
+    En développement, cela vous évite de gérer manuellement les migrations.
+    En production, définissez RUN_CREATE_ALL=0 : c'est Alembic qui gère le schéma.
+    """
+    if os.getenv("RUN_CREATE_ALL", "1") == "1":
+        load_all_models()  # create_all doit connaître toutes les tables, pas seulement celles déjà importées
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    # Précalcul du schéma OpenAPI : la première requête /openapi.json ou /docs est servie depuis le cache
+    app.openapi()
+    # Écriture groupée (write-behind) des compteurs d'utilisation des clés API
+    start_api_key_usage_flusher()
+    # Journalisation groupée des transactions échouées (log_failed_transactions_bulk)
+    start_failed_transaction_flusher()
+    # Codes d'erreur en mémoire, rechargés sur NOTIFY error_codes_changed
+    await start_error_code_cache()
+    # File des relances webhook (mv_webhook_retry_queue) rafraîchie sur NOTIFY
+    start_webhook_retry_queue_refresher()
+    yield
+    await stop_webhook_retry_queue_refresher()
+    await stop_error_code_cache()
+    await stop_failed_transaction_flusher()
+    await stop_api_key_usage_flusher()
 
 
-from fastapi.openapi.utils import get_openapi
+# Création de l'application FastAPI avec un titre identifiable
+# (titre, version et description sont définis une seule fois ici et réutilisés par custom_openapi)
+app = FastAPI(
+    title="Application Bancaire paysecond_app",
+    version="1.0.0",
+    description="API pour l'application bancaire",
+    # orjson encode datetime, UUID et Enum nativement, bien plus vite que json.dumps
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
 
 def custom_openapi():
+    # Le schéma est construit une seule fois puis mis en cache dans app.openapi_schema.
+    # Pas besoin de verrou : FastAPI appelle app.openapi() de manière synchrone sur la
+    # boucle d'événements, deux constructions ne peuvent donc pas s'entrelacer.
     if app.openapi_schema:
         return app.openapi_schema
     openapi_schema = get_openapi(
-        title="Application Bancaire",
-        version="1.0.0",
-        description="API pour l'application bancaire",
+        title=app.title,
+        version=app.version,
+        description=app.description,
         routes=app.routes,
     )
     # Utiliser un schéma de sécurité HTTP de type Bearer JWT
@@ -35,16 +90,16 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 
+def register_routers(app: FastAPI):
+    """
+    Importe et inclut les routeurs déclarés dans ROUTER_MODULES.
+    """
+    for module_name in ROUTER_MODULES:
+        app.include_router(importlib.import_module(module_name).router)
 
-# Création automatique des tables en base de données à partir des modèles SQLAlchemy.
-# En développement, cela vous évite de gérer manuellement les migrations.
-# En production, il est conseillé d'utiliser Alembic pour les migrations.
-Base.metadata.create_all(bind=engine)
 
-# Inclusion du routeur user dans l'application.
-app.include_router(auth.router)       # Endpoints d'authentification (register, login)
-app.include_router(protected.router)  # Endpoints protégés nécessitant un token
-app.include_router(user.router)       # Endpoints relatifs aux utilisateurs (CRUD)
+# Inclusion des routeurs dans l'application.
+register_routers(app)
 
 
 # Endpoint racine pour tester que l'application fonctionne
@@ -1,9 +1,10 @@
 import enum
 from sqlalchemy import (
-    Column, Text, Boolean, BigInteger, DateTime, Index, text, ForeignKey,
+    Column, String, Text, Boolean, BigInteger, DateTime, Index, text, ForeignKey, DDL, event,
+    CheckConstraint,
 )
 from sqlalchemy.dialects.postgresql import (
-    UUID, INET, CIDR, ARRAY, ENUM as PGEnum
+    UUID, INET, CIDR, ARRAY
 )
 from app.database import Base
 
@@ -60,10 +61,10 @@ class ApiKey(Base):
     )  # [expires_at] : Date d’expiration de la clé
 
     status = Column(
-        PGEnum(ApiKeyStatus, name="api_key_status", create_type=True),
+        String(20),
         nullable=False,
-        server_default=ApiKeyStatus.active.value
-    )  # [status] : Statut de la clé (active, revoked, expired)
+        server_default=text(f"'{ApiKeyStatus.active.value}'")
+    )  # [status] : Statut de la clé (active, revoked, expired), contrôlé par chk_api_key_status
 
     permissions = Column(
         ARRAY(Text),
@@ -99,9 +100,43 @@ class ApiKey(Base):
     )  # [usage_count] : Nombre total d’utilisations de la clé
 
     __table_args__ = (
+        CheckConstraint(
+            "status IN ('active','revoked','expired')",
+            name="chk_api_key_status"
+        ),  # valeurs autorisées pour status (remplace le type ENUM Postgres)
+        Index("idx_api_key_key_hash", "key_hash", unique=True),   # clé de recherche de l’authentification (key_hash = ?)
         Index("idx_api_key_merchant", "merchant_id"),             # index pour retrouver les clés d’un commerçant
-        Index("idx_api_key_status", "status"),                    # index sur le statut de la clé
-        Index("idx_api_key_last_used_at", text("last_used_at DESC")),  # index trié sur last_used_at
-        Index("idx_api_key_expires_at", "expires_at"),            # index sur la date d’expiration
-        Index("idx_api_key_usage_count", "usage_count"),          # index sur le compteur d’utilisation
+        Index(
+            "idx_api_key_merchant_status_active", "merchant_id",
+            postgresql_where=text("status = 'active'")
+        ),  # index partiel : clés actives d’un commerçant
+        Index(
+            "idx_api_key_permissions_gin", "permissions",
+            postgresql_using="gin"
+        ),  # index GIN : permissions @> ARRAY['write']
+        Index(
+            "idx_api_key_ip_gin", "ip_restrictions",
+            postgresql_using="gin"
+        ),  # index GIN : ip_restrictions @> / && ARRAY[...]::cidr[]
+        Index(
+            "idx_api_key_status_nonactive", "status",
+            postgresql_where=text("status <> 'active'")
+        ),  # index partiel : seules les clés non actives (minoritaires) sont indexées
+        Index(
+            "idx_api_key_expires_at", "expires_at",
+            postgresql_where=text("status = 'active'")
+        ),  # index partiel : l’expiration ne concerne que les clés actives
+        # Ni last_used_at ni usage_count ne sont indexés : leurs mises à jour restent HOT (voir fillfactor)
     )
+
+# ========================================================
+# 🔑 3. DDL de stockage
+# ========================================================
+ddl_api_key_fillfactor = DDL("""
+ALTER TABLE api_key SET (fillfactor = 80);
+""")  # 20 % d’espace libre par page : les mises à jour de last_used_at / usage_count restent HOT
+
+# ========================================================
+# 🔑 4. Attachement des DDL après création de la table
+# ========================================================
+event.listen(ApiKey.__table__, 'after_create', ddl_api_key_fillfactor)
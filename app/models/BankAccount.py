@@ -1,9 +1,9 @@
 import enum
 from sqlalchemy import (
     Column, String, Text, Boolean, DateTime, ForeignKey,
-    UniqueConstraint, Index, DDL, event, text, func
+    UniqueConstraint, CheckConstraint, Index, DDL, event, text, func
 )
-from sqlalchemy.dialects.postgresql import UUID, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 
 # ========================================================
@@ -70,16 +70,16 @@ class BankAccount(Base):
     )  # Indique si c’est le compte principal
 
     status = Column(
-        PGEnum(BankAccountStatus, name="bank_account_status", create_type=True),
+        String(20),
         nullable=False,
-        server_default=BankAccountStatus.pending.value
-    )  # Statut du compte
+        server_default=text(f"'{BankAccountStatus.pending.value}'")
+    )  # Statut du compte (contrôlé par chk_bank_account_status)
 
     verification_method = Column(
-        PGEnum(VerificationMethod, name="bank_account_verification_method", create_type=True),
+        String(20),
         nullable=False,
-        server_default=VerificationMethod.manual.value
-    )  # Méthode de vérification
+        server_default=text(f"'{VerificationMethod.manual.value}'")
+    )  # Méthode de vérification (contrôlée par chk_bank_account_verification_method)
 
     rejected_reason = Column(
         Text,
@@ -126,6 +126,14 @@ class BankAccount(Base):
     )  # Qui a validé le compte
 
     __table_args__ = (
+        CheckConstraint(
+            "status IN ('pending','verified','rejected','suspended')",
+            name="chk_bank_account_status"
+        ),
+        CheckConstraint(
+            "verification_method IN ('manual','auto')",
+            name="chk_bank_account_verification_method"
+        ),
         UniqueConstraint("iban", "user_id", name="unique_iban_user"),
         Index("idx_bank_account_user", "user_id"),
         Index("idx_bank_account_status", "status"),
@@ -135,45 +143,38 @@ class BankAccount(Base):
 # ========================================================
 # 3. DDL pour triggers et procédure stockée
 # ========================================================
-ddl_timestamps = DDL("""
-CREATE OR REPLACE FUNCTION trg_set_bank_account_timestamps()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at := CURRENT_TIMESTAMP;
-
-    IF NEW.status = 'verified' AND OLD.status <> 'verified' THEN
-        NEW.verified_at := CURRENT_TIMESTAMP;
-    ELSIF NEW.status = 'rejected' AND OLD.status <> 'rejected' THEN
-        NEW.rejected_at := CURRENT_TIMESTAMP;
-    END IF;
-
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_update_bank_account_timestamps
-BEFORE UPDATE ON bank_account
-FOR EACH ROW EXECUTE FUNCTION trg_set_bank_account_timestamps();
-""")
-
-ddl_primary = DDL("""
-CREATE OR REPLACE FUNCTION ensure_single_primary_account()
+ddl_before_row = DDL("""
+CREATE OR REPLACE FUNCTION trg_bank_account_before_row()
 RETURNS TRIGGER AS $$
 BEGIN
+    -- un seul compte principal par utilisateur
     IF NEW.is_primary THEN
         UPDATE bank_account
         SET is_primary = FALSE
         WHERE user_id = NEW.user_id
-          AND id <> NEW.id;
+          AND id <> NEW.id
+          AND is_primary;
+    END IF;
+
+    -- horodatages (UPDATE uniquement)
+    IF TG_OP = 'UPDATE' THEN
+        NEW.updated_at := CURRENT_TIMESTAMP;
+
+        IF NEW.status = 'verified' AND OLD.status <> 'verified' THEN
+            NEW.verified_at := CURRENT_TIMESTAMP;
+        ELSIF NEW.status = 'rejected' AND OLD.status <> 'rejected' THEN
+            NEW.rejected_at := CURRENT_TIMESTAMP;
+        END IF;
     END IF;
+
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trg_ensure_primary_account
+CREATE TRIGGER trg_bank_account_before_row
 BEFORE INSERT OR UPDATE ON bank_account
-FOR EACH ROW EXECUTE FUNCTION ensure_single_primary_account();
-""")
+FOR EACH ROW EXECUTE FUNCTION trg_bank_account_before_row();
+""")  # Un seul trigger BEFORE (compte principal + horodatages) au lieu de deux
 
 ddl_verify_proc = DDL("""
 CREATE OR REPLACE PROCEDURE verify_bank_account(
@@ -196,6 +197,5 @@ $$;
 # ========================================================
 # 4. Attachement des DDL après création de la table
 # ========================================================
-event.listen(BankAccount.__table__, 'after_create', ddl_timestamps)
-event.listen(BankAccount.__table__, 'after_create', ddl_primary)
+event.listen(BankAccount.__table__, 'after_create', ddl_before_row)
 event.listen(BankAccount.__table__, 'after_create', ddl_verify_proc)
@@ -147,38 +147,30 @@ class BatchProcessing(Base):
 # ========================================================
 # 3. DDL pour triggers
 # ========================================================
-ddl_update_progress = DDL("""
-CREATE OR REPLACE FUNCTION update_batch_progress()
+ddl_before_row = DDL("""
+CREATE OR REPLACE FUNCTION trg_batch_before_row()
 RETURNS TRIGGER AS $$
 BEGIN
+    -- progression calculée à l'insertion comme à la mise à jour
     IF NEW.total_items > 0 AND NEW.processed_items IS NOT NULL THEN
         NEW.progress_percentage := (NEW.processed_items * 100) / NEW.total_items;
     END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql STABLE;
 
-CREATE TRIGGER trg_update_batch_progress
-BEFORE INSERT OR UPDATE ON batch_processing
-FOR EACH ROW EXECUTE FUNCTION update_batch_progress();
-""")
+    -- horodatage de mise à jour (UPDATE uniquement)
+    IF TG_OP = 'UPDATE' THEN
+        NEW.updated_at := CURRENT_TIMESTAMP;
+    END IF;
 
-ddl_update_timestamp = DDL("""
-CREATE OR REPLACE FUNCTION trg_set_batch_updated_at()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at := CURRENT_TIMESTAMP;
     RETURN NEW;
 END;
-$$ LANGUAGE plpgsql STABLE;
+$$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trg_update_batch_timestamp
-BEFORE UPDATE ON batch_processing
-FOR EACH ROW EXECUTE FUNCTION trg_set_batch_updated_at();
-""")
+CREATE TRIGGER trg_batch_before_row
+BEFORE INSERT OR UPDATE ON batch_processing
+FOR EACH ROW EXECUTE FUNCTION trg_batch_before_row();
+""")  # Un seul trigger BEFORE (progression + updated_at) : une invocation plpgsql par ligne au lieu de deux
 
 # ========================================================
 # 4. Attachement des DDL après création de la table
 # ========================================================
-event.listen(BatchProcessing.__table__, 'after_create', ddl_update_progress)
-event.listen(BatchProcessing.__table__, 'after_create', ddl_update_timestamp)
+event.listen(BatchProcessing.__table__, 'after_create', ddl_before_row)
@@ -1,11 +1,13 @@
 import enum
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import (
     Column, String, DateTime, Boolean, Integer, Text, Date, Numeric,
-    ForeignKey, CheckConstraint, Index, DDL, event, text
+    ForeignKey, ForeignKeyConstraint, CheckConstraint, Index, DDL, event, text
 )
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
+from app.utils.ids import uuid7
 
 # ========================================================
 # 1. Python Enums pour Card
@@ -24,6 +26,24 @@ class CardStatus(enum.Enum):
     stolen             = "stolen"             # carte déclarée volée
     pending_activation = "pending_activation" # en attente d’activation
 
+# Durée de rétention par défaut (doit rester alignée sur server_default de data_retention_days)
+DEFAULT_DATA_RETENTION_DAYS = 730
+
+def compute_purge_after(context):
+    """
+    Calcule purge_after côté Python à l'insertion : maintenant + data_retention_days.
+    Évite l'exécution d'un trigger plpgsql pour chaque carte insérée par l'ORM
+    (trg_set_purge_after_insert ne se déclenche que si purge_after est absent).
+    """
+    params = context.get_current_parameters()
+    days = params.get("data_retention_days")
+    if days is None:
+        days = DEFAULT_DATA_RETENTION_DAYS
+    created_at = params.get("created_at")
+    if created_at is None:
+        created_at = datetime.now(timezone.utc)
+    return created_at + timedelta(days=days)
+
 # ========================================================
 # 2. Modèle SQLAlchemy pour la table "card"
 # ========================================================
@@ -33,6 +53,7 @@ class Card(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
+        default=uuid7,
         server_default=text("gen_random_uuid()")
     )  # [id] : Identifiant unique de la carte, généré automatiquement.
 
@@ -44,9 +65,8 @@ class Card(Base):
 
     wallet_id = Column(
         UUID(as_uuid=True),
-        ForeignKey("wallet.id", ondelete="CASCADE"),
         nullable=False
-    )  # [wallet_id] : Référence au portefeuille associé (ON DELETE CASCADE).
+    )  # [wallet_id] : Référence au portefeuille associé (FK composite fk_card_wallet_owner, ON DELETE CASCADE).
 
     card_number_encrypted = Column(
         Text,
@@ -70,15 +90,15 @@ class Card(Base):
     )  # [expiry_date] : Date d’expiration (entre maintenant et +10 ans).
 
     type = Column(
-        PGEnum(CardType, name="card_type", create_type=True),
+        String(20),
         nullable=False
-    )  # [type] : Type de carte (virtual, physical, credit, debit).
+    )  # [type] : Type de carte (virtual, physical, credit, debit), contrôlé par chk_card_type.
 
     status = Column(
-        PGEnum(CardStatus, name="card_status", create_type=True),
+        String(20),
         nullable=False,
-        server_default=CardStatus.active.value
-    )  # [status] : Statut de la carte (active, blocked, etc.).
+        server_default=text(f"'{CardStatus.active.value}'")
+    )  # [status] : Statut de la carte (active, blocked, etc.), contrôlé par chk_card_status.
 
     reported_lost = Column(
         Boolean,
@@ -106,8 +126,9 @@ class Card(Base):
 
     purge_after = Column(
         DateTime(timezone=True),
-        nullable=False
-    )  # [purge_after] : Date à partir de laquelle purger la carte.
+        nullable=False,
+        default=compute_purge_after
+    )  # [purge_after] : Date à partir de laquelle purger la carte (calculée à l'insertion ; trigger pour le SQL brut).
 
     cardholder_name = Column(
         Text,
@@ -126,6 +147,25 @@ class Card(Base):
     )  # [encryption_key_id] : Clé utilisée pour chiffrer le numéro (ON DELETE RESTRICT).
 
     __table_args__ = (
+        ForeignKeyConstraint(
+            ["wallet_id", "user_id"],
+            ["wallet.id", "wallet.user_id"],
+            name="fk_card_wallet_owner",
+            ondelete="CASCADE",
+            deferrable=True,
+            initially="DEFERRED"
+        ),  # [fk_card_wallet_owner] : le portefeuille doit appartenir au titulaire de la carte (RI native).
+
+        CheckConstraint(
+            "type IN ('virtual','physical','credit','debit')",
+            name="chk_card_type"
+        ),  # [type CHECK] : valeurs autorisées (remplace le type ENUM Postgres).
+
+        CheckConstraint(
+            "status IN ('active','blocked','expired','lost','stolen','pending_activation')",
+            name="chk_card_status"
+        ),  # [status CHECK] : valeurs autorisées (remplace le type ENUM Postgres).
+
         CheckConstraint(
             "char_length(card_number_last_four) = 4",
             name="chk_card_last_four_length"
@@ -153,7 +193,11 @@ class Card(Base):
             postgresql_where=text("status != 'active'")
         ),  # [idx_card_status] : index partiel pour cartes non actives.
         Index("idx_card_expiry", "expiry_date"),  # [idx_card_expiry] : index date d’expiration.
-        Index("idx_card_purge", "purge_after"),  # [idx_card_purge] : index date de purge.
+        Index(
+            "idx_card_purge_brin", "purge_after",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": "32"}
+        ),  # [idx_card_purge_brin] : index BRIN (valeurs croissantes), bien plus petit qu'un B-tree.
         Index("idx_card_encryption_key_id", "encryption_key_id"),  # [idx_card_encryption_key_id] : index clé de chiffrement.
     )
 
@@ -167,6 +211,9 @@ BEGIN
     IF NEW.status = 'active' AND OLD.status <> 'active' THEN
         NEW.failed_attempts := 0;  -- réinitialise quand carte repasse active
     END IF;
+    IF NEW.failed_attempts >= 3 AND NEW.status = 'active' THEN
+        NEW.status := 'blocked';   -- blocage automatique après 3 échecs
+    END IF;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -174,7 +221,7 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER trg_reset_card_failed_attempts
 BEFORE UPDATE ON card
 FOR EACH ROW EXECUTE FUNCTION reset_card_failed_attempts();
-""")  # Trigger 1 : reset du compteur failed_attempts
+""")  # Trigger 1 : reset du compteur failed_attempts et blocage automatique
 
 ddl_set_purge_after = DDL("""
 CREATE OR REPLACE FUNCTION set_purge_after()
@@ -186,45 +233,24 @@ END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_set_purge_after
-BEFORE INSERT OR UPDATE ON card
+BEFORE UPDATE OF created_at, data_retention_days ON card
 FOR EACH ROW EXECUTE FUNCTION set_purge_after();
-""")  # Trigger 2 : calcul de la date de purge
 
-ddl_check_wallet_belongs = DDL("""
-CREATE OR REPLACE FUNCTION check_wallet_belongs_to_user()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF NOT EXISTS (
-        SELECT 1 FROM wallet
-        WHERE id = NEW.wallet_id AND user_id = NEW.user_id
-    ) THEN
-        RAISE EXCEPTION 'Wallet % does not belong to user %', NEW.wallet_id, NEW.user_id;
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE CONSTRAINT TRIGGER trg_check_wallet_belongs_to_user
-AFTER INSERT OR UPDATE ON card
-DEFERRABLE INITIALLY DEFERRED
-FOR EACH ROW EXECUTE FUNCTION check_wallet_belongs_to_user();
-""")  # Trigger 3 : cohérence wallet↔user
+CREATE TRIGGER trg_set_purge_after_insert
+BEFORE INSERT ON card
+FOR EACH ROW WHEN (NEW.purge_after IS NULL)
+EXECUTE FUNCTION set_purge_after();
+""")  # Trigger 2 : recalcul de la date de purge si la rétention change, et à l'insertion
+#   SQL brute sans purge_after (l'ORM la fournit : la clause WHEN évite alors l'appel plpgsql)
 
-ddl_block_proc = DDL("""
-CREATE OR REPLACE PROCEDURE block_card_on_failed_attempts(p_card_id UUID)
-LANGUAGE plpgsql AS $$
-BEGIN
-    UPDATE card
-    SET status = 'blocked'
-    WHERE id = p_card_id AND failed_attempts >= 3;
-END;
-$$;
-""")  # Procédure : bloquer la carte après 3 échecs
+ddl_card_fillfactor = DDL("""
+ALTER TABLE card SET (fillfactor = 90);
+""")  # Espace libre par page : les mises à jour de failed_attempts restent HOT
+#   (celles de status, colonne indexée par idx_card_status, créent toujours une entrée d'index)
 
 # ========================================================
 # 4. Attachement des DDL après création de la table
 # ========================================================
 event.listen(Card.__table__, 'after_create', ddl_reset_failed_attempts)
 event.listen(Card.__table__, 'after_create', ddl_set_purge_after)
-event.listen(Card.__table__, 'after_create', ddl_check_wallet_belongs)
-event.listen(Card.__table__, 'after_create', ddl_block_proc)
+event.listen(Card.__table__, 'after_create', ddl_card_fillfactor)
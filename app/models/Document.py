@@ -1,15 +1,17 @@
 import enum                                    # import du module enum pour créer des énumérations
 
 from sqlalchemy import (                        # import des classes et fonctions SQLAlchemy
-    Column, String, Text, DateTime, ForeignKey, 
-    Index, DDL, event, text, func
+    Column, String, Text, DateTime, ForeignKey,
+    Index, DDL, event, text, func, update
 )
 
 from sqlalchemy.dialects.postgresql import (    # import des types PostgreSQL spécifiques
-    UUID, JSONB, ENUM as PGEnum
+    UUID, JSONB
 )
 
 from app.database import Base                   # import du Base SQLAlchemy pour déclarer les modèles
+from app.utils.ids import uuid7                 # import du générateur d'UUIDv7 (clés primaires ordonnées)
+from app.utils.lookup import LookupCode, lookup_ids, lookup_table  # SMALLINT <-> énumération, tables de référence
 
 # ========================================================
 # 1. Définition des énumérations Python
@@ -31,7 +33,22 @@ class VerificationStatus(enum.Enum):            # énumération des statuts de v
     retry = "retry"                             #   à revalider
 
 # ========================================================
-# 2. Modèle SQLAlchemy : table "document"
+# 2. Tables de référence (remplacent les ENUM PostgreSQL)
+# ========================================================
+# Identifiants figés dans l'ordre des énumérations (nouvelle valeur en fin d'énumération),
+# insérés tels quels dans les tables de référence et servant de cache applicatif
+# (aucune requête pour traduire code <-> id). Ajouter une valeur = simple INSERT, sans ALTER TYPE.
+DOCUMENT_TYPE_IDS = lookup_ids(DocumentType)
+VERIFICATION_STATUS_IDS = lookup_ids(VerificationStatus)
+
+document_type = lookup_table("document_type", DOCUMENT_TYPE_IDS)
+document_verification_status = lookup_table("document_verification_status", VERIFICATION_STATUS_IDS)
+
+def _status_ids(*statuses):                     # liste SQL d'identifiants pour les index partiels
+    return ", ".join(str(VERIFICATION_STATUS_IDS[s]) for s in statuses)
+
+# ========================================================
+# 3. Modèle SQLAlchemy : table "document"
 # ========================================================
 class Document(Base):                           # déclaration de la classe Document
     __tablename__ = "document"                  # nom de la table en base
@@ -39,7 +56,8 @@ class Document(Base):                           # déclaration de la classe Docu
     id = Column(                                # colonne id
         UUID(as_uuid=True),                     #   type UUID PostgreSQL
         primary_key=True,                       #   clé primaire
-        server_default=text("gen_random_uuid()")#   génération automatique côté serveur
+        default=uuid7,                          #   UUIDv7 généré côté client (ordre chronologique)
+        server_default=text("gen_random_uuid()")#   repli côté serveur (insertions SQL brutes)
     )
 
     user_id = Column(                           # colonne user_id
@@ -49,11 +67,8 @@ class Document(Base):                           # déclaration de la classe Docu
     )
 
     type = Column(                              # colonne type
-        PGEnum(                                 #   type ENUM PostgreSQL
-            DocumentType, 
-            name="document_type", 
-            create_type=True
-        ),
+        LookupCode(DocumentType, DOCUMENT_TYPE_IDS), # SMALLINT, lu comme DocumentType
+        ForeignKey("document_type.id"),         #   référence la table document_type
         nullable=False                          #   ne peut pas être nul
     )
 
@@ -69,13 +84,10 @@ class Document(Base):                           # déclaration de la classe Docu
     )
 
     verification_status = Column(               # colonne verification_status
-        PGEnum(                                 #   type ENUM PostgreSQL
-            VerificationStatus, 
-            name="document_verification_status", 
-            create_type=True
-        ),
+        LookupCode(VerificationStatus, VERIFICATION_STATUS_IDS), # SMALLINT, lu comme VerificationStatus
+        ForeignKey("document_verification_status.id"), # référence la table de statuts
         nullable=False,                         #   ne peut pas être nul
-        server_default=VerificationStatus.pending.value  #   défaut 'pending'
+        server_default=text(str(VERIFICATION_STATUS_IDS[VerificationStatus.pending]))  # défaut 'pending'
     )
 
     rejection_reason = Column(                  # colonne rejection_reason
@@ -136,103 +148,75 @@ class Document(Base):                           # déclaration de la classe Docu
 
     __table_args__ = (                          # index et contraintes personnalisés
         Index("idx_document_user", "user_id"),  #   index sur user_id
-        Index("idx_document_status", "verification_status"), # index sur statut
-        Index("idx_document_type", "type"),     #   index sur type
-        Index("idx_document_uploaded_at",       #   index sur uploaded_at DESC
-              text("uploaded_at DESC")),
+        Index("idx_document_status_open",       #   index partiel : seuls les statuts en cours
+              "verification_status",            #   (compteurs des tableaux de bord)
+              postgresql_where=text(
+                  f"verification_status IN ({_status_ids(VerificationStatus.pending, VerificationStatus.under_review)})"
+              )),
+        Index("idx_document_uploaded_at",       #   index partiel sur uploaded_at DESC
+              text("uploaded_at DESC"),
+              postgresql_where=text(            #   limité aux documents encore à traiter
+                  f"verification_status IN ({_status_ids(VerificationStatus.pending, VerificationStatus.under_review, VerificationStatus.retry)})"
+              ),
+              postgresql_include=["user_id"]),  #   user_id inclus : parcours d'index seul
         Index("idx_document_expires_at", "expires_at"), # index sur expires_at
         Index(                                  #   index unique partiel
             "uniq_user_doc_type_valid",         #   nom de l’index
             "user_id", "type",                  #   colonnes couvertes
             unique=True,                        #   contrainte d’unicité
             postgresql_where=text(              #   condition PostgreSQL
-                "verification_status IN ("
-                "'pending','under_review','approved')"
+                f"verification_status IN ({_status_ids(VerificationStatus.pending, VerificationStatus.under_review, VerificationStatus.approved)})"
             )
         ),
     )
 
+    @classmethod
+    def apply_verification(cls, db, document_id, new_status,
+                           rejection_reason=None, verifier_user_id=None):
+        """
+        Met à jour le statut de vérification d'un document en un seul UPDATE paramétré
+        (remplace la procédure update_document_verification_status : pas d'exécuteur PL/pgSQL,
+        instruction compilée mise en cache par SQLAlchemy).
+        verified_at et updated_at sont posés par le trigger trg_document_maintenance.
+        Retourne le nombre de lignes modifiées (0 si le document n'existe pas).
+        """
+        status = VerificationStatus(new_status)
+        values = {"verification_status": status}
+        if status is VerificationStatus.rejected:
+            values["rejection_reason"] = rejection_reason
+        if status in (VerificationStatus.approved, VerificationStatus.rejected):
+            values["verified_by"] = verifier_user_id
+        stmt = update(cls).where(cls.id == document_id).values(**values)
+        return db.execute(stmt).rowcount
+
 # ========================================================
-# 3. DDL pour triggers et procédure stockée
+# 4. DDL pour trigger
 # ========================================================
-ddl_set_verified_at = DDL(                    # DDL pour trigger set_document_verified_at
+ddl_row_maintenance = DDL(                    # DDL pour l'unique trigger de maintenance de ligne
     """
-    CREATE OR REPLACE FUNCTION set_document_verified_at()
+    CREATE OR REPLACE FUNCTION document_row_maintenance()
     RETURNS TRIGGER AS $$
     BEGIN
-        IF NEW.verification_status = 'approved'
-           AND OLD.verification_status <> 'approved'
+        IF NEW.verification_status = %(approved)s        -- approved
+           AND OLD.verification_status <> %(approved)s
         THEN
             NEW.verified_at := CURRENT_TIMESTAMP;
         END IF;
+        NEW.updated_at := CURRENT_TIMESTAMP;    -- horodatage de mise à jour
         RETURN NEW;
     END;
-    $$ LANGUAGE plpgsql STABLE;
+    $$ LANGUAGE plpgsql;
 
-    CREATE TRIGGER trg_set_document_verified_at
+    CREATE TRIGGER trg_document_maintenance
     BEFORE UPDATE ON document
-    FOR EACH ROW EXECUTE FUNCTION set_document_verified_at();
-    """
-)
-
-ddl_set_updated_at = DDL(                     # DDL pour trigger set_document_updated_at
-    """
-    CREATE OR REPLACE FUNCTION set_document_updated_at()
-    RETURNS TRIGGER AS $$
-    BEGIN
-        NEW.updated_at := CURRENT_TIMESTAMP;
-        RETURN NEW;
-    END;
-    $$ LANGUAGE plpgsql STABLE;
-
-    CREATE TRIGGER trg_document_updated_at
-    BEFORE UPDATE ON document
-    FOR EACH ROW EXECUTE FUNCTION set_document_updated_at();
-    """
-)
-
-ddl_update_verification = DDL(                # DDL pour procédure update_document_verification_status
-    """
-    CREATE OR REPLACE PROCEDURE update_document_verification_status(
-        p_document_id UUID,
-        p_new_status VARCHAR,
-        p_rejection_reason TEXT DEFAULT NULL,
-        p_verifier_user_id UUID DEFAULT NULL
-    )
-    LANGUAGE plpgsql
-    AS $$
-    BEGIN
-        UPDATE document
-        SET
-            verification_status = p_new_status,
-            rejection_reason = CASE
-                WHEN p_new_status = 'rejected' THEN p_rejection_reason
-                ELSE rejection_reason
-            END,
-            verified_at = CASE
-                WHEN p_new_status = 'approved' THEN CURRENT_TIMESTAMP
-                ELSE verified_at
-            END,
-            verified_by = CASE
-                WHEN p_new_status IN ('approved','rejected') THEN p_verifier_user_id
-                ELSE verified_by
-            END,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = p_document_id;
-    END;
-    $$;
-    """
+    FOR EACH ROW EXECUTE FUNCTION document_row_maintenance();
+    """,
+    context={"approved": VERIFICATION_STATUS_IDS[VerificationStatus.approved]}
 )
 
 # ========================================================
-# 4. Attachement des DDL après création de la table
+# 5. Attachement des DDL après création des tables
 # ========================================================
-event.listen(                                # attache ddl_set_verified_at
-    Document.__table__, 'after_create', ddl_set_verified_at
-)
-event.listen(                                # attache ddl_set_updated_at
-    Document.__table__, 'after_create', ddl_set_updated_at
-)
-event.listen(                                # attache ddl_update_verification
-    Document.__table__, 'after_create', ddl_update_verification
+event.listen(                                # attache ddl_row_maintenance (verified_at + updated_at)
+    Document.__table__, 'after_create', ddl_row_maintenance
 )
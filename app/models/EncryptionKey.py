@@ -1,12 +1,13 @@
 import enum
 from sqlalchemy import (
-    Column, DateTime, Boolean, Integer, Text, ForeignKey,
+    Column, DateTime, Boolean, Integer, Text, LargeBinary, ForeignKey,
     CheckConstraint, Index, DDL, event, text
 )
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID, JSONB, CHAR, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM as PGEnum
 from sqlalchemy.schema import Computed
 from app.database import Base
+from app.utils.ids import uuid7
 
 # ========================================================
 # 🔐 1. Python Enums pour EncryptionKey
@@ -36,6 +37,7 @@ class EncryptionKey(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
+        default=uuid7,
         server_default=text("gen_random_uuid()")
     )  # [id] : Identifiant unique, généré automatiquement
 
@@ -101,9 +103,9 @@ class EncryptionKey(Base):
     )  # [metadata] : Métadonnées techniques (IV, tag, etc.)
 
     key_fingerprint = Column(
-        CHAR(64),
-        Computed("encode(sha256(key::bytea), 'hex')", persisted=True)
-    )  # [key_fingerprint] : Empreinte SHA-256, calculée et stockée automatiquement
+        LargeBinary(32),
+        Computed("sha256(key::bytea)", persisted=True)
+    )  # [key_fingerprint] : Empreinte SHA-256 brute (32 octets, BYTEA), calculée et stockée automatiquement
 
     key_storage = Column(
         PGEnum(KeyStorage, name="encryption_key_storage", create_type=True),
@@ -153,41 +155,48 @@ ddl_rotate_keys = DDL("""
 CREATE OR REPLACE FUNCTION rotate_encryption_keys()
 RETURNS TRIGGER AS $$
 BEGIN
-    -- Désactive les anciennes clés actives du même type
-    UPDATE encryption_key
+    -- Un seul UPDATE pour toute l'instruction INSERT :
+    -- désactive les anciennes clés actives des types nouvellement insérés.
+    -- Si plusieurs clés actives d'un même type arrivent ensemble, la version la plus haute reste active.
+    UPDATE encryption_key e
     SET active = FALSE,
         rotated_at = CURRENT_TIMESTAMP
-    WHERE active = TRUE
-      AND key_type = NEW.key_type
-      AND id <> NEW.id;
-    RETURN NEW;
+    FROM (
+        SELECT DISTINCT ON (key_type) key_type, id
+        FROM new_keys
+        WHERE active = TRUE
+        ORDER BY key_type, key_version DESC, id DESC
+    ) n
+    WHERE e.active = TRUE
+      AND e.key_type = n.key_type
+      AND e.id <> n.id;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_rotate_keys
 AFTER INSERT ON encryption_key
-FOR EACH ROW
-WHEN (NEW.active = TRUE)
+REFERENCING NEW TABLE AS new_keys
+FOR EACH STATEMENT
 EXECUTE FUNCTION rotate_encryption_keys();
-""")  # désactive automatiquement les anciennes clés à chaque insertion d’une nouvelle clé active
+""")  # désactive les anciennes clés une fois par INSERT (trigger d'instruction), et non pour chaque ligne
 
 ddl_prevent_deactivation = DDL("""
 CREATE OR REPLACE FUNCTION prevent_key_deactivation()
 RETURNS TRIGGER AS $$
-DECLARE
-    cnt INT;
 BEGIN
     IF OLD.active = TRUE AND NEW.active = FALSE THEN
-        -- compte les clés actives restantes pour ce type
-        SELECT COUNT(*) INTO cnt
-        FROM encryption_key
-        WHERE key_type = OLD.key_type
-          AND active = TRUE
-          AND id <> OLD.id;
-
-        IF cnt = 0 THEN
+        -- vérifie qu'une autre clé active existe pour ce type
+        -- (EXISTS s'arrête à la première ligne trouvée via l'index partiel active = TRUE)
+        IF NOT EXISTS (
+            SELECT 1
+            FROM encryption_key
+            WHERE key_type = OLD.key_type
+              AND active = TRUE
+              AND id <> OLD.id
+        ) THEN
             RAISE EXCEPTION
-                'Impossible de désactiver la dernière clé active de type %',
+                'Impossible de désactiver la dernière clé active de type %%',
                 OLD.key_type
             USING HINT = 'Activez d’abord une nouvelle clé avant de désactiver l’actuelle.';
         END IF;
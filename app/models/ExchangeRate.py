@@ -1,7 +1,7 @@
 import enum
 from sqlalchemy import (
     Column, Numeric, DateTime, String, Index,
-    DDL, event, text, ForeignKey
+    text, ForeignKey
 )
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID, ENUM as PGEnum
@@ -64,8 +64,9 @@ class ExchangeRate(Base):
     updated_at = Column(
         DateTime(timezone=True),
         nullable=False,
-        server_default=func.current_timestamp()
-    )  # [updated_at] : Date de dernière modification (mise à jour via trigger)
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp()
+    )  # [updated_at] : Date de dernière modification (ajoutée par SQLAlchemy à chaque UPDATE, sans trigger)
 
     __table_args__ = (
         Index(
@@ -79,28 +80,6 @@ class ExchangeRate(Base):
         ),  # index pour trier par date de prise d'effet descendant
     )
 
-# ========================================================
-# 3. DDL pour trigger de mise à jour d'updated_at
-# ========================================================
-ddl_update_exchange_rate_ts = DDL("""
-CREATE OR REPLACE FUNCTION update_exchange_rate_timestamp()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at := CURRENT_TIMESTAMP;  -- met à jour updated_at avant chaque UPDATE
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql STABLE;
-
-CREATE TRIGGER trg_update_exchange_rate
-BEFORE UPDATE ON exchange_rate
-FOR EACH ROW EXECUTE FUNCTION update_exchange_rate_timestamp();
-""")  # trigger qui rafraîchit updated_at
-
-# ========================================================
-# 4. Attachement du DDL après création de la table
-# ========================================================
-event.listen(
-    ExchangeRate.__table__,
-    'after_create',
-    ddl_update_exchange_rate_ts
-)
+# Note : updated_at n'est plus maintenu par un trigger. Les UPDATE passant par
+# l'ORM ou par update(ExchangeRate) l'ajoutent automatiquement (onupdate) ;
+# une requête SQL brute doit inclure "updated_at = CURRENT_TIMESTAMP".
@@ -1,11 +1,14 @@
 import enum
 from sqlalchemy import (
-    Column, Text, Boolean, DateTime, Integer, Float,
+    Column, Text, DateTime, SmallInteger, Float,
     CheckConstraint, Index, ForeignKey, DDL, event, text
 )
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, VARCHAR
+from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, VARCHAR, ENUM as PGEnum
 from app.database import Base
+from app.models.Transaction import Transaction, TransactionStatus, TRANSACTION_STATUS_IDS
+from app.utils.ids import uuid7
 
 # ========================================================
 # 1. Enum Python pour resolution_status
@@ -18,7 +21,18 @@ class ResolutionStatus(enum.Enum):
     escalated       = "escalated"
 
 # ========================================================
-# 2. Modèle SQLAlchemy pour failed_transaction
+# 2. Disposition des bits de failed_transaction.status_bits
+# ========================================================
+FRAUD_BIT        = 0b1            # bit 0      : fraud_detected
+ESCALATION_SHIFT = 1
+ESCALATION_MASK  = 0b1111 << 1    # bits 1-4   : escalation_level (0–5)
+RETRY_SHIFT      = 5
+RETRY_MASK       = 0x3FF << 5     # bits 5-14  : automatic_retry_attempt (0–1023, bit de signe inutilisé)
+MAX_ESCALATION_LEVEL = 5          # borne de chk_failed_transaction_escalation_level
+MAX_RETRY_ATTEMPT    = 0x3FF      # plus grande valeur représentable sur 10 bits
+
+# ========================================================
+# 3. Modèle SQLAlchemy pour failed_transaction
 # ========================================================
 class FailedTransaction(Base):
     __tablename__ = "failed_transaction"
@@ -26,13 +40,15 @@ class FailedTransaction(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
+        default=uuid7,
         server_default=text("gen_random_uuid()")
     )
 
     transaction_id = Column(
         UUID(as_uuid=True),
         nullable=True
-    )
+    )  # pas de FK : "transaction" est partitionnée (PK id + created_at) ; l'existence est
+       # vérifiée par log_failed_transaction(s) via UPDATE transaction ... RETURNING id
 
     error_code = Column(
         VARCHAR(50),
@@ -45,17 +61,18 @@ class FailedTransaction(Base):
         nullable=True
     )
 
-    fraud_detected = Column(
-        Boolean,
+    status_bits = Column(
+        SmallInteger,
         nullable=False,
-        server_default=text("FALSE")
-    )
+        default=0,
+        server_default=text("0")
+    )  # fraud_detected, escalation_level et automatic_retry_attempt regroupés dans 2 octets
 
     resolution_status = Column(
-        Text,
+        PGEnum(ResolutionStatus, name="failed_transaction_resolution_status", create_type=True),
         nullable=False,
         server_default=ResolutionStatus.investigating.value
-    )
+    )  # ENUM Postgres : 4 octets par ligne au lieu du texte complet
 
     resolved_at = Column(
         DateTime(timezone=True),
@@ -64,9 +81,10 @@ class FailedTransaction(Base):
 
     created_at = Column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
         server_default=func.current_timestamp()
-    )
+    )  # clé de partitionnement : doit faire partie de la clé primaire (id, created_at)
 
     updated_at = Column(
         DateTime(timezone=True),
@@ -92,18 +110,6 @@ class FailedTransaction(Base):
         nullable=True
     )
 
-    automatic_retry_attempt = Column(
-        Integer,
-        nullable=False,
-        server_default=text("0")
-    )
-
-    escalation_level = Column(
-        Integer,
-        nullable=False,
-        server_default=text("0")
-    )
-
     ip_address = Column(
         INET,
         nullable=True
@@ -125,34 +131,101 @@ class FailedTransaction(Base):
         nullable=True # autorise la valeur NULL
     )  # [metadata] : Métadonnées techniques (IV, tag, etc.)
 
+    # --------------------------------------------------------
+    # Accès aux champs empaquetés dans status_bits (Python et SQL)
+    # --------------------------------------------------------
+    @hybrid_property
+    def fraud_detected(self):
+        return bool((self.status_bits or 0) & FRAUD_BIT)
+
+    @fraud_detected.inplace.setter
+    def _fraud_detected_setter(self, value):
+        bits = (self.status_bits or 0) & ~FRAUD_BIT
+        self.status_bits = bits | (FRAUD_BIT if value else 0)
+
+    @fraud_detected.inplace.expression
+    @classmethod
+    def _fraud_detected_expression(cls):
+        return cls.status_bits.op("&")(FRAUD_BIT) != 0
+
+    @hybrid_property
+    def escalation_level(self):
+        return ((self.status_bits or 0) & ESCALATION_MASK) >> ESCALATION_SHIFT
+
+    @escalation_level.inplace.setter
+    def _escalation_level_setter(self, value):
+        if not 0 <= value <= MAX_ESCALATION_LEVEL:
+            raise ValueError(f"escalation_level must be between 0 and {MAX_ESCALATION_LEVEL}, got {value!r}")
+        bits = (self.status_bits or 0) & ~ESCALATION_MASK
+        self.status_bits = bits | ((value << ESCALATION_SHIFT) & ESCALATION_MASK)
+
+    @escalation_level.inplace.expression
+    @classmethod
+    def _escalation_level_expression(cls):
+        return cls.status_bits.op("&")(ESCALATION_MASK).op(">>")(ESCALATION_SHIFT)
+
+    @hybrid_property
+    def automatic_retry_attempt(self):
+        return ((self.status_bits or 0) & RETRY_MASK) >> RETRY_SHIFT
+
+    @automatic_retry_attempt.inplace.setter
+    def _automatic_retry_attempt_setter(self, value):
+        if not 0 <= value <= MAX_RETRY_ATTEMPT:
+            raise ValueError(f"automatic_retry_attempt must be between 0 and {MAX_RETRY_ATTEMPT}, got {value!r}")
+        bits = (self.status_bits or 0) & ~RETRY_MASK
+        self.status_bits = bits | ((value << RETRY_SHIFT) & RETRY_MASK)
+
+    @automatic_retry_attempt.inplace.expression
+    @classmethod
+    def _automatic_retry_attempt_expression(cls):
+        return cls.status_bits.op("&")(RETRY_MASK).op(">>")(RETRY_SHIFT)
+
     __table_args__ = (
         CheckConstraint(
-            "resolution_status IN ('investigating','resolved','denied','pending_review','escalated')",
-            name="chk_failed_transaction_resolution_status"
-        ),
-        CheckConstraint(
-            "escalation_level BETWEEN 0 AND 5",
+            "((status_bits & 30) >> 1) <= 5 AND status_bits >= 0",
             name="chk_failed_transaction_escalation_level"
-        ),
+        ),  # escalation_level (bits 1-4) entre 0 et 5
         CheckConstraint(
             "anomaly_score >= 0",
             name="chk_failed_transaction_anomaly_score"
         ),
-        Index("idx_failed_transaction_status", "resolution_status"),
+        Index(
+            "idx_failed_transaction_status_escalation",
+            "resolution_status",
+            text("((status_bits & 30) >> 1) DESC"),
+            postgresql_with={"fillfactor": 90}
+        ),  # remplace les index séparés sur resolution_status et escalation_level
         Index(
             "idx_failed_transaction_fraud",
-            "fraud_detected",
-            postgresql_where=text("fraud_detected = TRUE")
-        ),
-        Index("idx_failed_transaction_error", "error_code"),
-        Index("idx_failed_transaction_created", text("created_at DESC")),
-        Index("idx_failed_transaction_transaction_id", "transaction_id"),
-        Index("idx_failed_transaction_escalation", text("escalation_level DESC")),
-        Index("idx_failed_transaction_anomaly", "anomaly_score"),
+            "status_bits",
+            postgresql_where=text("(status_bits & 1) = 1"),
+            postgresql_with={"fillfactor": 90}
+        ),  # index partiel : transactions frauduleuses (bit 0)
+        Index(
+            "idx_failed_transaction_error", "error_code",
+            postgresql_with={"fillfactor": 90}
+        ),  # conservé : Postgres n'indexe pas les FK (ON DELETE SET NULL)
+        Index(
+            "idx_failed_transaction_created_brin",
+            "created_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ),  # index BRIN : created_at croît avec l'ordre d'insertion, index minuscule et quasi gratuit à maintenir
+        Index(
+            "idx_failed_transaction_transaction_id", "transaction_id",
+            postgresql_with={"fillfactor": 90}
+        ),  # conservé : seul index de la FK transaction_id
+        Index(
+            "idx_failed_transaction_anomaly", "anomaly_score",
+            postgresql_with={"fillfactor": 90}
+        ),  # fillfactor 90 : marge pour les insertions sur cette table très écrite
+        {
+            "postgresql_partition_by": "RANGE (created_at)"
+        },  # une partition par mois : index de la partition active bornés, purge par DETACH/DROP
     )
 
 # ========================================================
-# 3. DDL pour triggers set_resolved_at & update updated_at
+# 4. DDL pour triggers set_resolved_at & update updated_at
 # ========================================================
 ddl_resolve_update = DDL("""
 CREATE OR REPLACE FUNCTION set_resolved_at_failed_transaction()
@@ -173,29 +246,6 @@ BEFORE UPDATE ON failed_transaction
 FOR EACH ROW EXECUTE FUNCTION set_resolved_at_failed_transaction();
 """)
 
-# ========================================================
-# 4. DDL pour trigger de validation transaction_id
-# ========================================================
-ddl_check_tx = DDL("""
-CREATE OR REPLACE FUNCTION check_transaction_exists()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF NEW.transaction_id IS NOT NULL THEN
-        PERFORM 1 FROM transaction WHERE id = NEW.transaction_id;
-        IF NOT FOUND THEN
-            RAISE EXCEPTION 'Transaction invalide: %', NEW.transaction_id;
-        END IF;
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE CONSTRAINT TRIGGER trg_check_transaction_exists
-AFTER INSERT OR UPDATE ON failed_transaction
-DEFERRABLE INITIALLY DEFERRED
-FOR EACH ROW EXECUTE FUNCTION check_transaction_exists();
-""")
-
 # ========================================================
 # 5. DDL pour procédure log_failed_transaction
 # ========================================================
@@ -212,34 +262,117 @@ CREATE OR REPLACE PROCEDURE log_failed_transaction(
 )
 LANGUAGE plpgsql AS $$
 BEGIN
-    PERFORM 1 FROM transaction WHERE id = p_transaction_id;
-    IF NOT FOUND THEN
-        RAISE EXCEPTION 'Transaction invalide: %', p_transaction_id;
-    END IF;
-
+    -- Une seule instruction : la transaction est localisée une fois (un plan, une sonde d'index),
+    -- l'échec n'est journalisé que si l'UPDATE a trouvé la transaction
+    WITH upd AS (
+        UPDATE transaction
+        SET status          = %(failed)s,
+            completed_at    = CURRENT_TIMESTAMP,
+            fraud_flag      = p_fraud_detected,
+            failure_reason  = p_reason
+        WHERE id = p_transaction_id
+        RETURNING id
+    )
     INSERT INTO failed_transaction (
         transaction_id, error_code, reason,
-        fraud_detected, ip_address, user_agent,
+        status_bits, ip_address, user_agent,
         metadata, created_by
-    ) VALUES (
-        p_transaction_id, p_error_code, p_reason,
-        p_fraud_detected, p_ip_address, p_user_agent,
+    )
+    SELECT
+        upd.id, p_error_code, p_reason,
+        CASE WHEN p_fraud_detected THEN 1 ELSE 0 END, p_ip_address, p_user_agent,
         p_metadata, p_created_by
-    );
-
-    UPDATE transaction
-    SET status          = 'failed',
-        completed_at    = CURRENT_TIMESTAMP,
-        fraud_flag      = p_fraud_detected,
-        failure_reason  = p_reason
-    WHERE id = p_transaction_id;
+    FROM upd;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Transaction invalide: %%', p_transaction_id;  -- %% : échappement de DDL()
+    END IF;
+END;
+$$;
+""", context={"failed": TRANSACTION_STATUS_IDS[TransactionStatus.failed]})
+
+# ========================================================
+# 6. DDL pour procédure log_failed_transactions_bulk
+# ========================================================
+ddl_log_bulk_proc = DDL("""
+CREATE OR REPLACE PROCEDURE log_failed_transactions_bulk(
+    p_transaction_ids UUID[],
+    p_error_codes VARCHAR(50)[],
+    p_reasons TEXT[],
+    p_fraud_detected BOOLEAN[]
+)
+LANGUAGE SQL AS $$
+    -- Version ensembliste de log_failed_transaction : N échecs, une instruction.
+    -- Les transactions introuvables sont ignorées (pas d'exception pour tout le lot).
+    WITH f AS (
+        SELECT *
+        FROM UNNEST(p_transaction_ids, p_error_codes, p_reasons, p_fraud_detected)
+             AS f(transaction_id, error_code, reason, fraud_detected)
+    ), upd AS (
+        UPDATE transaction
+        SET status          = %(failed)s,
+            completed_at    = CURRENT_TIMESTAMP,
+            fraud_flag      = f.fraud_detected,
+            failure_reason  = f.reason
+        FROM f
+        WHERE transaction.id = f.transaction_id
+        RETURNING transaction.id
+    )
+    INSERT INTO failed_transaction (transaction_id, error_code, reason, status_bits)
+    SELECT f.transaction_id, f.error_code, f.reason,
+           CASE WHEN f.fraud_detected THEN 1 ELSE 0 END
+    FROM f
+    WHERE f.transaction_id IN (SELECT id FROM upd);
+$$;
+""", context={"failed": TRANSACTION_STATUS_IDS[TransactionStatus.failed]})
+
+# ========================================================
+# 7. DDL pour partitions mensuelles et maintenance
+# ========================================================
+ddl_partitions = DDL("""
+CREATE OR REPLACE FUNCTION create_failed_transaction_partitions(p_months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    v_month DATE;
+    v_name  TEXT;
+BEGIN
+    FOR i IN 0..p_months_ahead LOOP
+        v_month := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE;
+        v_name  := 'failed_transaction_' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(  -- %% doublés : DDL() applique le formatage Python
+                'CREATE TABLE %%I PARTITION OF failed_transaction FOR VALUES FROM (%%L) TO (%%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Filet de sécurité : reçoit les lignes hors des mois déjà créés
+CREATE TABLE IF NOT EXISTS failed_transaction_default PARTITION OF failed_transaction DEFAULT;
+
+SELECT create_failed_transaction_partitions();
+
+-- Maintenance : création anticipée des partitions chaque 1er du mois (si pg_cron est installé)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule(
+            'failed_transaction_partitions', '0 3 1 * *',
+            'SELECT create_failed_transaction_partitions()'
+        );
+    END IF;
 END;
 $$;
 """)
 
 # ========================================================
-# 6. Attachement des DDL après création de la table
+# 8. Attachement des DDL après création de la table
 # ========================================================
+# Sans FK vers "transaction", l'ordre de création doit être déclaré : la procédure
+# LANGUAGE SQL log_failed_transactions_bulk est analysée dès sa création.
+FailedTransaction.__table__.add_is_dependent_on(Transaction.__table__)
 event.listen(
     FailedTransaction.__table__,
     'after_create',
@@ -248,10 +381,15 @@ event.listen(
 event.listen(
     FailedTransaction.__table__,
     'after_create',
-    ddl_check_tx
+    ddl_log_proc
+)
+event.listen(
+    FailedTransaction.__table__,
+    'after_create',
+    ddl_log_bulk_proc
 )
 event.listen(
     FailedTransaction.__table__,
     'after_create',
-    ddl_log_proc
+    ddl_partitions
 )
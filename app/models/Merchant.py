@@ -1,11 +1,12 @@
 import enum
 from sqlalchemy import (
-    Column, String, Text, Numeric, DateTime,
+    Column, String, Text, Numeric, DateTime, Computed,
     ForeignKey, UniqueConstraint, CheckConstraint,
     Index, DDL, event, func, text
 )
-from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from app.database import Base
+from app.utils.lookup import LookupCode, lookup_ids, lookup_table
 
 # ========================================================
 # 1. Python Enums pour Merchant
@@ -40,6 +41,17 @@ class MerchantStatus(enum.Enum):
     disabled  = "disabled"
     closed    = "closed"
 
+# Tables de référence SMALLINT (2 octets par colonne, nouvelle valeur = simple INSERT)
+MERCHANT_CATEGORY_IDS = lookup_ids(MerchantCategory)
+KYB_STATUS_IDS = lookup_ids(KybStatus)
+RISK_LEVEL_IDS = lookup_ids(RiskLevel)
+MERCHANT_STATUS_IDS = lookup_ids(MerchantStatus)
+
+merchant_category_lu = lookup_table("merchant_category_lu", MERCHANT_CATEGORY_IDS)
+merchant_kyb_status_lu = lookup_table("merchant_kyb_status_lu", KYB_STATUS_IDS)
+merchant_risk_level_lu = lookup_table("merchant_risk_level_lu", RISK_LEVEL_IDS)
+merchant_status_lu = lookup_table("merchant_status_lu", MERCHANT_STATUS_IDS)
+
 # ========================================================
 # 2. Modèle SQLAlchemy pour la table "merchant"
 # ========================================================
@@ -55,15 +67,13 @@ class Merchant(Base):
     user_id = Column(
         UUID(as_uuid=True),
         ForeignKey("user.id", ondelete="CASCADE"),
-        nullable=False,
-        unique=True
-    )
+        nullable=False
+    )  # unicité portée par uq_merchant_user (un seul index)
 
     siret = Column(
         String(14),
-        nullable=False,
-        unique=True
-    )
+        nullable=False
+    )  # unicité portée par idx_merchant_siret (un seul index)
 
     legal_name = Column(
         String(255),
@@ -76,14 +86,16 @@ class Merchant(Base):
     )
 
     category = Column(
-        PGEnum(MerchantCategory, name="merchant_category", create_type=True),
+        LookupCode(MerchantCategory, MERCHANT_CATEGORY_IDS),
+        ForeignKey("merchant_category_lu.id"),
         nullable=False
     )
 
     kyb_status = Column(
-        PGEnum(KybStatus, name="merchant_kyb_status", create_type=True),
+        LookupCode(KybStatus, KYB_STATUS_IDS),
+        ForeignKey("merchant_kyb_status_lu.id"),
         nullable=False,
-        server_default=KybStatus.pending.value
+        server_default=text(str(KYB_STATUS_IDS[KybStatus.pending]))
     )
 
     monthly_volume_estimate = Column(
@@ -105,8 +117,9 @@ class Merchant(Base):
     updated_at = Column(
         DateTime(timezone=True),
         nullable=False,
-        server_default=func.current_timestamp()
-    )
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp()
+    )  # ajoutée par SQLAlchemy à chaque UPDATE, sans trigger
 
     business_description = Column(
         Text,
@@ -124,9 +137,10 @@ class Merchant(Base):
     )
 
     risk_level = Column(
-        PGEnum(RiskLevel, name="merchant_risk_level", create_type=True),
+        LookupCode(RiskLevel, RISK_LEVEL_IDS),
+        ForeignKey("merchant_risk_level_lu.id"),
         nullable=False,
-        server_default=RiskLevel.medium.value
+        server_default=text(str(RISK_LEVEL_IDS[RiskLevel.medium]))
     )
 
     bank_account_id = Column(
@@ -136,11 +150,21 @@ class Merchant(Base):
     )
 
     status = Column(
-        PGEnum(MerchantStatus, name="merchant_status", create_type=True),
+        LookupCode(MerchantStatus, MERCHANT_STATUS_IDS),
+        ForeignKey("merchant_status_lu.id"),
         nullable=False,
-        server_default=MerchantStatus.active.value
+        server_default=text(str(MERCHANT_STATUS_IDS[MerchantStatus.active]))
     )
 
+    search_text = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(legal_name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(trading_name, '')), 'B')",
+            persisted=True
+        )
+    )  # texte indexé full-text, calculé par Postgres (remplace search_index)
+
     __table_args__ = (
         CheckConstraint(
             "char_length(siret) = 14 AND siret ~ '^[0-9]{14}$'",
@@ -149,28 +173,46 @@ class Merchant(Base):
         UniqueConstraint("user_id", name="uq_merchant_user"),
         Index("idx_merchant_siret", "siret", unique=True),
         Index("idx_merchant_kyb_status", "kyb_status"),
-        Index("idx_merchant_user_id", "user_id"),
         Index("idx_merchant_category", "category"),
         Index("idx_merchant_risk_level", "risk_level"),
-    )
+        Index("idx_merchant_search_text", "search_text", postgresql_using="gin"),
+    )
+
+    @classmethod
+    def bulk_create(cls, db, rows):
+        """
+        Insère une liste de marchands (dictionnaires aux mêmes clés) en une seule instruction
+        INSERT INTO merchant (...) SELECT * FROM UNNEST(CAST(:p0 AS type[]), ...) :
+        un paramètre tableau par colonne, quelle que soit la taille du lot.
+        Les colonnes absentes des dictionnaires prennent leur server_default.
+        Retourne le nombre de lignes insérées.
+        """
+        if not rows:
+            return 0
+        dialect = db.get_bind().dialect
+        columns = [cls.__table__.c[name] for name in rows[0]]
+        arrays, params = [], {}
+        for i, column in enumerate(columns):
+            values = [row[column.key] for row in rows]
+            process = column.type.bind_processor(dialect)  # enum -> id SMALLINT, UUID, JSONB…
+            if process is not None:
+                values = [process(v) for v in values]
+            params[f"p{i}"] = values
+            arrays.append(f"CAST(:p{i} AS {column.type.compile(dialect=dialect)}[])")
+        stmt = text(
+            f"INSERT INTO merchant ({', '.join(c.name for c in columns)}) "
+            f"SELECT * FROM UNNEST({', '.join(arrays)})"
+        )
+        db.execute(stmt, params)
+        return len(rows)
+
+# Note : updated_at n'est plus maintenu par un trigger. Les UPDATE passant par
+# l'ORM ou par update(Merchant) l'ajoutent automatiquement (onupdate) ;
+# une requête SQL brute doit inclure "updated_at = CURRENT_TIMESTAMP".
 
 # ========================================================
-# 3. DDL pour triggers et procédure stockée
+# 3. DDL pour procédure stockée
 # ========================================================
-ddl_update_timestamp = DDL("""
-CREATE OR REPLACE FUNCTION update_merchant_timestamp()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at := CURRENT_TIMESTAMP;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_update_merchants
-BEFORE UPDATE ON merchant
-FOR EACH ROW EXECUTE FUNCTION update_merchant_timestamp();
-""")
-
 ddl_update_kyb_proc = DDL("""
 CREATE OR REPLACE PROCEDURE update_merchant_kyb_status(
     p_merchant_id UUID,
@@ -180,7 +222,7 @@ LANGUAGE plpgsql
 AS $$
 BEGIN
     UPDATE merchant
-    SET kyb_status = p_new_status,
+    SET kyb_status = (SELECT id FROM merchant_kyb_status_lu WHERE code = p_new_status),
         updated_at = CURRENT_TIMESTAMP
     WHERE id = p_merchant_id;
 END;
@@ -190,5 +232,4 @@ $$;
 # ========================================================
 # 4. Attachement des DDL après création de la table
 # ========================================================
-event.listen(Merchant.__table__, 'after_create', ddl_update_timestamp)
 event.listen(Merchant.__table__, 'after_create', ddl_update_kyb_proc)
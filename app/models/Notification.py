@@ -1,11 +1,12 @@
 import enum
 from sqlalchemy import (
-    Column, Text, Boolean, DateTime, Integer, JSON, ForeignKey,
-    Index, DDL, event, text
+    Column, Text, String, Boolean, DateTime, Integer, JSON, ForeignKey,
+    Index, DDL, event, text, update
 )
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID, INET, JSONB
 from app.database import Base
+from app.utils.lookup import LookupCode, lookup_ids, lookup_table
 
 # ========================================================
 # 🔔 1. Python Enums pour Notification
@@ -31,6 +32,15 @@ class Channel(enum.Enum):
     sms    = "sms"     # canal SMS
     push   = "push"    # canal push
 
+# Tables de référence SMALLINT (2 octets par colonne, nouvelle valeur = simple INSERT)
+NOTIFICATION_TYPE_IDS = lookup_ids(NotificationType)
+NOTIFICATION_LANGUAGE_IDS = lookup_ids(NotificationLanguage)
+CHANNEL_IDS = lookup_ids(Channel)
+
+notification_type_lu = lookup_table("notification_type_lu", NOTIFICATION_TYPE_IDS)
+notification_language_lu = lookup_table("notification_language_lu", NOTIFICATION_LANGUAGE_IDS)
+notification_channel_lu = lookup_table("notification_channel_lu", CHANNEL_IDS)
+
 # ========================================================
 # 🔔 2. Modèle SQLAlchemy pour la table "notification"
 # ========================================================
@@ -46,8 +56,9 @@ class Notification(Base):
     user_id = Column(
         UUID(as_uuid=True),
         ForeignKey("user.id", ondelete="CASCADE"),
+        primary_key=True,
         nullable=False
-    )  # [user_id] : Utilisateur destinataire (ON DELETE CASCADE)
+    )  # [user_id] : Utilisateur destinataire (ON DELETE CASCADE), clé de partition (PK = id, user_id)
 
     title = Column(
         Text,
@@ -66,8 +77,8 @@ class Notification(Base):
     )  # [is_read] : Statut de lecture
 
     notification_type = Column(
-        PGEnum(NotificationType,
-               name="notification_type_enum", create_type=True),
+        LookupCode(NotificationType, NOTIFICATION_TYPE_IDS),
+        ForeignKey("notification_type_lu.id"),
         nullable=True
     )  # [notification_type] : Catégorie de la notification
 
@@ -80,7 +91,7 @@ class Notification(Base):
     read_at = Column(
         DateTime(timezone=True),
         nullable=True
-    )  # [read_at] : Date de lecture (définie par trigger)
+    )  # [read_at] : Date de lecture (définie par Notification.mark_read)
 
     expires_at = Column(
         DateTime(timezone=True),
@@ -88,10 +99,10 @@ class Notification(Base):
     )  # [expires_at] : Date d’expiration de la notification
 
     language = Column(
-        PGEnum(NotificationLanguage,
-               name="notification_language_enum", create_type=True),
+        LookupCode(NotificationLanguage, NOTIFICATION_LANGUAGE_IDS),
+        ForeignKey("notification_language_lu.id"),
         nullable=False,
-        server_default=NotificationLanguage.fr.value
+        server_default=text(str(NOTIFICATION_LANGUAGE_IDS[NotificationLanguage.fr]))
     )  # [language] : Langue de la notification
 
     action_url = Column(
@@ -106,9 +117,10 @@ class Notification(Base):
     )  # [priority] : Niveau de priorité (1–3)
 
     channel = Column(
-        PGEnum(Channel, name="notification_channel_enum", create_type=True),
+        LookupCode(Channel, CHANNEL_IDS),
+        ForeignKey("notification_channel_lu.id"),
         nullable=False,
-        server_default=Channel.in_app.value
+        server_default=text(str(CHANNEL_IDS[Channel.in_app]))
     )  # [channel] : Canal de diffusion
 
     sender_id = Column(
@@ -123,9 +135,9 @@ class Notification(Base):
     )  # [ip_address] : Adresse IP d’origine
 
     source_system = Column(
-        Text,
+        String(32),
         nullable=True
-    )  # [source_system] : Système émetteur
+    )  # [source_system] : Système émetteur (identifiant court, 32 caractères max)
 
     payload = Column(
         JSONB,
@@ -133,35 +145,38 @@ class Notification(Base):
     )  # [payload] : Données dynamiques complémentaires
 
     __table_args__ = (
-        Index("idx_notification_user", "user_id"),                                    # index user_id
-        Index("idx_notification_read", "is_read", postgresql_where=text("NOT is_read")),  # index notifications non lues
-        Index("idx_notification_created", text("created_at DESC")),                   # index tri par date création
+        Index("idx_notification_user", "user_id"),                                    # index user_id (ON DELETE CASCADE depuis user)
+        Index("idx_notification_user_unread_recent", "user_id", text("created_at DESC"),
+              postgresql_where=text("NOT is_read")),                                 # fil non lu d'un utilisateur, déjà trié
         Index("idx_notification_priority", text("priority DESC")),                    # index tri par priorité
         Index("idx_notification_type", "notification_type"),                          # index par type
         Index("idx_notification_channel", "channel"),                                # index par canal
+        Index("idx_notification_created_brin", "created_at", postgresql_using="brin",
+              postgresql_with={"pages_per_range": 32}),                              # BRIN : created_at croît avec l'insertion
+        Index("idx_notification_campaign", text("(payload->>'campaign_id')"),
+              postgresql_where=text("payload ? 'campaign_id'")),                     # seules les notifications de campagne
+        {"postgresql_partition_by": "HASH (user_id)"},                               # 16 partitions par hachage de user_id
     )
 
-# ========================================================
-# 🔔 3. DDL pour trigger de lecture
-# ========================================================
-ddl_set_read_at = DDL("""
-CREATE OR REPLACE FUNCTION set_notification_read_at()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF NEW.is_read = TRUE AND OLD.is_read = FALSE THEN
-        NEW.read_at := CURRENT_TIMESTAMP;  -- définit read_at lors du passage à lu
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_set_notification_read_at
-BEFORE UPDATE ON notification
-FOR EACH ROW EXECUTE FUNCTION set_notification_read_at();
-""")  # trigger qui remplit read_at
+    @classmethod
+    def mark_read(cls, db, notification_ids, user_id=None):
+        """
+        Marque des notifications comme lues et renseigne read_at dans le même UPDATE
+        (remplace le trigger set_notification_read_at). Les notifications déjà lues
+        gardent leur read_at d'origine. Retourne le nombre de lignes modifiées.
+        Fournir user_id limite l'UPDATE à la partition de cet utilisateur.
+        """
+        stmt = (
+            update(cls)
+            .where(cls.id.in_(notification_ids), cls.is_read.is_(False))
+            .values(is_read=True, read_at=func.current_timestamp())
+        )
+        if user_id is not None:
+            stmt = stmt.where(cls.user_id == user_id)
+        return db.execute(stmt).rowcount
 
 # ========================================================
-# 🔔 4. DDL pour procédure create_notification
+# 🔔 3. DDL pour procédure create_notification
 # ========================================================
 ddl_create_notification = DDL("""
 CREATE OR REPLACE PROCEDURE create_notification(
@@ -176,7 +191,7 @@ CREATE OR REPLACE PROCEDURE create_notification(
     p_sender_id UUID DEFAULT NULL,
     p_payload JSONB DEFAULT NULL,
     p_expires_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
-    p_source_system VARCHAR(30) DEFAULT NULL,
+    p_source_system VARCHAR(32) DEFAULT NULL,
     p_ip_address INET DEFAULT NULL
 )
 LANGUAGE plpgsql AS $$
@@ -186,8 +201,11 @@ BEGIN
         priority, language, channel, sender_id,
         payload, expires_at, source_system, ip_address
     ) VALUES (
-        p_user_id, p_title, p_message, p_notification_type, p_action_url,
-        p_priority, p_language, p_channel, p_sender_id,
+        p_user_id, p_title, p_message,
+        (SELECT id FROM notification_type_lu WHERE code = p_notification_type), p_action_url,
+        p_priority,
+        (SELECT id FROM notification_language_lu WHERE code = p_language),
+        (SELECT id FROM notification_channel_lu WHERE code = p_channel), p_sender_id,
         p_payload, p_expires_at, p_source_system, p_ip_address
     );
 END;
@@ -195,7 +213,60 @@ $$;
 """)  # procédure stockée pour créer une notification
 
 # ========================================================
-# 🚀 5. Attachement des DDL après création de la table
+# 🔔 4. DDL pour procédure create_notifications_bulk
+# ========================================================
+ddl_create_notifications_bulk = DDL("""
+CREATE OR REPLACE PROCEDURE create_notifications_bulk(
+    p_user_ids UUID[],
+    p_titles TEXT[],
+    p_messages TEXT[],
+    p_types TEXT[],
+    p_priorities INT[],
+    p_languages TEXT[],
+    p_channels TEXT[],
+    p_payloads JSONB[]
+)
+LANGUAGE SQL AS $$
+    INSERT INTO notification (
+        user_id, title, message, notification_type,
+        priority, language, channel, payload
+    )
+    SELECT
+        n.u, n.t, n.m, ty.id,
+        COALESCE(n.pr, 1), lg.id,
+        ch.id, n.pl
+    FROM UNNEST(
+        p_user_ids, p_titles, p_messages, p_types,
+        p_priorities, p_languages, p_channels, p_payloads
+    ) AS n(u, t, m, nt, pr, lg, ch, pl)
+    LEFT JOIN notification_type_lu ty ON ty.code = COALESCE(n.nt, 'system')
+    LEFT JOIN notification_language_lu lg ON lg.code = COALESCE(n.lg, 'fr')
+    LEFT JOIN notification_channel_lu ch ON ch.code = COALESCE(n.ch, 'in-app');
+$$;
+""")  # N notifications en un seul appel (un aller-retour, un plan) ; mêmes défauts que create_notification.
+#   LEFT JOIN : un code inconnu donne NULL comme dans create_notification (aucune ligne perdue ;
+#   la contrainte NOT NULL de language/channel lève alors une erreur)
+
+# ========================================================
+# 🔔 5. DDL pour les partitions par hachage de user_id
+# ========================================================
+NOTIFICATION_PARTITIONS = 16
+
+ddl_notification_partitions = DDL("\n".join(
+    f"CREATE TABLE IF NOT EXISTS notification_p{i:02d} PARTITION OF notification "
+    f"FOR VALUES WITH (MODULUS {NOTIFICATION_PARTITIONS}, REMAINDER {i});"
+    for i in range(NOTIFICATION_PARTITIONS)
+))  # chaque partition (et ses index) reste petite et chaude en cache pour ses utilisateurs
+
+# Payloads JSONB non compressés : pas de pglz/LZ4 à l'écriture ni à la lecture
+ddl_payload_storage = DDL("""
+ALTER TABLE notification ALTER COLUMN payload SET STORAGE EXTERNAL;
+""")
+
+# ========================================================
+# 🚀 6. Attachement des DDL après création de la table
 # ========================================================
-event.listen(Notification.__table__, 'after_create', ddl_set_read_at)
+event.listen(Notification.__table__, 'after_create', ddl_notification_partitions)
+event.listen(Notification.__table__, 'after_create', ddl_payload_storage)
 event.listen(Notification.__table__, 'after_create', ddl_create_notification)
+event.listen(Notification.__table__, 'after_create', ddl_create_notifications_bulk)
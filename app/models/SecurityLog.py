@@ -1,10 +1,47 @@
+import enum
 from sqlalchemy import (
-    Column, String, DateTime, CheckConstraint, Index,
+    Column, String, DateTime, CheckConstraint, Index, CHAR, SmallInteger,
     DDL, event, Boolean, Float, Text, ForeignKey, func, text
 )
 from sqlalchemy.dialects.postgresql import UUID, INET, JSONB
 from app.database import Base
 
+# ========================================================
+# 0. Codes numériques (stockés en SMALLINT, 2 octets)
+# ========================================================
+class SecuritySeverity(enum.IntEnum):
+    low      = 0
+    medium   = 1
+    high     = 2
+    critical = 3
+
+class SecurityEventType(enum.Enum):
+    # Valeurs autorisées pour event_type (contrôlées par CHECK)
+    login    = "login"
+    logout   = "logout"
+    password = "password"
+    mfa      = "mfa"
+    token    = "token"
+    access   = "access"
+    account  = "account"
+    fraud    = "fraud"
+    ban      = "ban"
+    other    = "other"
+
+class SecurityEventSubtype(enum.IntEnum):
+    # Sous-types fréquents : évitent de les ranger dans details (JSONB)
+    other               = 0
+    login_success       = 1
+    login_failure       = 2
+    logout              = 3
+    password_change     = 4
+    mfa_challenge       = 5
+    mfa_failure         = 6
+    token_revoked       = 7
+    account_locked      = 8
+    suspicious_location = 9
+    fraud_alert         = 10
+
 # ========================================================
 # 1. Modèle SQLAlchemy pour la table "security_log"
 #    (partitionnée par année sur created_at)
@@ -13,11 +50,17 @@ class SecurityLog(Base):
     __tablename__ = "security_log"
     __table_args__ = (
         CheckConstraint(
-            "severity IN ('low','medium','high','critical')",
+            "severity BETWEEN 0 AND 3",
             name="chk_security_log_severity"
         ),  
         # Validation de la gravité
 
+        CheckConstraint(
+            "event_type IN (" + ", ".join(f"'{t.value}'" for t in SecurityEventType) + ")",
+            name="chk_security_log_event_type"
+        ),  
+        # Ensemble fermé de types d’événement (statistiques MCV fiables pour le planificateur)
+
         CheckConstraint(
             "((latitude IS NULL AND longitude IS NULL) OR "
             "(latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180))",
@@ -61,7 +104,7 @@ class SecurityLog(Base):
         String(50),
         nullable=False
     )  
-    # Type d’événement (login, fraud, ban, etc.)
+    # Type d’événement (SecurityEventType : login, fraud, ban, etc.)
 
     ip_address = Column(
         INET
@@ -74,9 +117,9 @@ class SecurityLog(Base):
     # Informations navigateur / device
 
     device_id = Column(
-        Text
+        String(128)
     )  
-    # Identifiant de l’appareil
+    # Identifiant de l’appareil (borné à 128 caractères)
 
     latitude = Column(
         Float
@@ -88,18 +131,27 @@ class SecurityLog(Base):
     )  
     # Longitude géographique (nullable)
 
+    event_subtype = Column(
+        SmallInteger
+    )  
+    # Sous-type d’événement (SecurityEventSubtype, nullable)
+
+    country_code = Column(
+        CHAR(2)
+    )  
+    # Pays d’origine ISO 3166-1 alpha-2 (nullable)
+
     severity = Column(
-        String(10),
+        SmallInteger,
         nullable=False,
-        server_default="medium"
+        server_default=text(str(int(SecuritySeverity.medium)))
     )  
-    # Gravité (low, medium, high, critical)
+    # Gravité (SecuritySeverity : 0 low, 1 medium, 2 high, 3 critical)
 
     details = Column(
-        JSONB,
-        nullable=False
+        JSONB
     )  
-    # Détails supplémentaires en JSON
+    # Détails supplémentaires en JSON, réservés aux champs réellement variables (nullable)
 
     created_at = Column(
         DateTime(timezone=True),
@@ -110,9 +162,10 @@ class SecurityLog(Base):
     updated_at = Column(
         DateTime(timezone=True),
         nullable=False,
-        server_default=func.current_timestamp()
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp()
     )  
-    # Date/heure de dernière mise à jour
+    # Date/heure de dernière mise à jour (ajoutée par SQLAlchemy à chaque UPDATE, sans trigger)
 
     resolved = Column(
         Boolean,
@@ -154,56 +207,58 @@ CREATE TABLE IF NOT EXISTS security_log_y2026
 """)
 
 # ========================================================
-# 3. DDL : fonction et appel pour créer automatiquement
-#          la partition de l’année suivante
+# 3. DDL : fonction de création des partitions des N années
+#          suivantes, partition par défaut et tâche pg_cron
 # ========================================================
 ddl_future_partitions = DDL("""
 DROP FUNCTION IF EXISTS create_future_security_log_partitions CASCADE;
 
-CREATE OR REPLACE FUNCTION create_future_security_log_partitions()
+CREATE OR REPLACE FUNCTION create_future_security_log_partitions(years_ahead INT DEFAULT 5)
 RETURNS void AS $$
 DECLARE
-  next_year TEXT := TO_CHAR(CURRENT_DATE + INTERVAL '1 year', 'YYYY');
-  year_start TIMESTAMPTZ := DATE_TRUNC('year', CURRENT_DATE + INTERVAL '1 year');
-  year_end   TIMESTAMPTZ := DATE_TRUNC('year', CURRENT_DATE + INTERVAL '2 years');
-  partition_name TEXT := 'security_log_y' || next_year;
+  year_start TIMESTAMPTZ;
+  partition_name TEXT;
 BEGIN
-  IF NOT EXISTS (
-    SELECT FROM pg_class WHERE relname = partition_name
-  ) THEN
-    EXECUTE format(
-      'CREATE TABLE %I PARTITION OF security_log FOR VALUES FROM (%L) TO (%L);',
-      partition_name,
-      year_start,
-      year_end
-    );
-  END IF;
+  FOR i IN 0..years_ahead LOOP
+    year_start := DATE_TRUNC('year', CURRENT_DATE + make_interval(years => i));
+    partition_name := 'security_log_y' || TO_CHAR(year_start, 'YYYY');
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format(  -- %% doublés : DDL() applique le formatage Python
+        'CREATE TABLE %%I PARTITION OF security_log FOR VALUES FROM (%%L) TO (%%L);',
+        partition_name,
+        year_start,
+        year_start + INTERVAL '1 year'
+      );
+    END IF;
+  END LOOP;
 END;
 $$ LANGUAGE plpgsql;
 
--- Appel immédiat pour s’assurer de la partition prochaine
-SELECT create_future_security_log_partitions();
-""")
+-- Filet de sécurité : aucune insertion ne tombe hors partition si la tâche planifiée est manquée
+CREATE TABLE IF NOT EXISTS security_log_default PARTITION OF security_log DEFAULT;
 
-# ========================================================
-# 4. DDL : trigger pour mise à jour automatique de updated_at
-# ========================================================
-ddl_update_ts = DDL("""
-CREATE OR REPLACE FUNCTION update_security_log_timestamp()
-RETURNS TRIGGER AS $$
+-- Création immédiate des 5 prochaines années
+SELECT create_future_security_log_partitions(5);
+
+-- Maintenance mensuelle : garde toujours 5 ans de partitions d’avance (si pg_cron est installé)
+DO $$
 BEGIN
-  NEW.updated_at := CURRENT_TIMESTAMP;
-  RETURN NEW;
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule(
+      'sec_log_partitions', '0 0 1 * *',
+      'SELECT create_future_security_log_partitions(5)'
+    );
+  END IF;
 END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_update_security_log
-BEFORE UPDATE ON security_log
-FOR EACH ROW EXECUTE FUNCTION update_security_log_timestamp();
+$$;
 """)
 
+# Note : updated_at n'est plus maintenu par un trigger. Les UPDATE passant par
+# l'ORM ou par update(SecurityLog) l'ajoutent automatiquement (onupdate) ;
+# une requête SQL brute doit inclure "updated_at = CURRENT_TIMESTAMP".
+
 # ========================================================
-# 5. Attacher tous les DDL au moment de la création de la table
+# 4. Attacher tous les DDL au moment de la création de la table
 # ========================================================
 event.listen(
     SecurityLog.__table__,
@@ -215,8 +270,3 @@ event.listen(
     "after_create",
     ddl_future_partitions
 )
-event.listen(
-    SecurityLog.__table__,
-    "after_create",
-    ddl_update_ts
-)
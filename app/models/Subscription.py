@@ -3,8 +3,9 @@ from sqlalchemy import (
     Column, String, Numeric, Date, DateTime, Boolean, Text, Integer,
     ForeignKey, CheckConstraint, Index, DDL, event, text, func
 )
-from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.database import Base
+from app.utils.lookup import LookupCode, lookup_ids, lookup_table
 
 # ========================================================
 # 1. Python Enums pour Subscription
@@ -33,6 +34,15 @@ class SubscriptionStatus(enum.Enum):
     failed    = "failed"
     pending   = "pending"
 
+# Tables de référence SMALLINT (2 octets par colonne, nouvelle valeur = simple INSERT)
+CURRENCY_IDS = lookup_ids(Currency)
+FREQUENCY_IDS = lookup_ids(Frequency)
+SUBSCRIPTION_STATUS_IDS = lookup_ids(SubscriptionStatus)
+
+subscription_currency_lu = lookup_table("subscription_currency_lu", CURRENCY_IDS)
+subscription_frequency_lu = lookup_table("subscription_frequency_lu", FREQUENCY_IDS)
+subscription_status_lu = lookup_table("subscription_status_lu", SUBSCRIPTION_STATUS_IDS)
+
 # ========================================================
 # 2. Modèle SQLAlchemy pour la table "subscription"
 # ========================================================
@@ -61,18 +71,17 @@ class Subscription(Base):
         Numeric(10, 2),
         nullable=False
     )  # 💶 Montant (positif)
-    __table_args__ = (
-        CheckConstraint("amount > 0", name="chk_subscription_amount_positive"),
-    )
 
     currency = Column(
-        PGEnum(Currency, name="subscription_currency", create_type=True),
+        LookupCode(Currency, CURRENCY_IDS),
+        ForeignKey("subscription_currency_lu.id"),
         nullable=False,
-        server_default=Currency.EUR.value
+        server_default=text(str(CURRENCY_IDS[Currency.EUR]))
     )  # 💱 Devise de l'abonnement
 
     frequency = Column(
-        PGEnum(Frequency, name="subscription_frequency", create_type=True),
+        LookupCode(Frequency, FREQUENCY_IDS),
+        ForeignKey("subscription_frequency_lu.id"),
         nullable=False
     )  # ⏱️ Fréquence des paiements
 
@@ -87,9 +96,10 @@ class Subscription(Base):
     )  # 📅 Date de fin (NULL = illimité)
 
     status = Column(
-        PGEnum(SubscriptionStatus, name="subscription_status", create_type=True),
+        LookupCode(SubscriptionStatus, SUBSCRIPTION_STATUS_IDS),
+        ForeignKey("subscription_status_lu.id"),
         nullable=False,
-        server_default=SubscriptionStatus.active.value
+        server_default=text(str(SUBSCRIPTION_STATUS_IDS[SubscriptionStatus.active]))
     )  # 🚦 Statut actuel
 
     next_payment_date = Column(
@@ -117,8 +127,9 @@ class Subscription(Base):
     updated_at = Column(
         DateTime(timezone=True),
         nullable=False,
-        server_default=func.current_timestamp()
-    )  # 🔄 Dernière mise à jour
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp()
+    )  # 🔄 Dernière mise à jour (ajoutée par SQLAlchemy à chaque UPDATE, sans trigger)
 
     description = Column(
         Text,
@@ -130,9 +141,6 @@ class Subscription(Base):
         nullable=False,
         server_default=text("0")
     )  # 🆓 Durée de la période d'essai
-    __table_args__ += (
-        CheckConstraint("trial_period_days >= 0", name="chk_subscription_trial_days_nonneg"),
-    )
 
     subcription_metadata = Column(
         "metadata",   # nom réel de la colonne en base
@@ -173,68 +181,65 @@ class Subscription(Base):
         nullable=False,
         server_default=text("3")
     )  # 🚫 Nombre max de relances
-    __table_args__ += (
-        CheckConstraint("retry_count >= 0", name="chk_subscription_retry_nonneg"),
-        CheckConstraint("max_retry >= 0", name="chk_subscription_max_retry_nonneg"),
-    )
 
     failure_reason = Column(
         Text,
         nullable=True
     )  # ❌ Dernière raison d'échec
 
-    # Indexes pour optimiser les requêtes
-    __table_args__ += (
+    # Contraintes et index, déclarés en une seule fois
+    __table_args__ = (
+        CheckConstraint("amount > 0", name="chk_subscription_amount_positive"),
+        CheckConstraint("trial_period_days >= 0", name="chk_subscription_trial_days_nonneg"),
+        CheckConstraint("retry_count >= 0", name="chk_subscription_retry_nonneg"),
+        CheckConstraint("max_retry >= 0", name="chk_subscription_max_retry_nonneg"),
+
+        # Indexes pour optimiser les requêtes
         Index("idx_subscription_next_payment", "next_payment_date"),
-        Index("idx_subscription_status", "status"),
-        Index("idx_subscription_user", "user_id"),
+        Index("idx_subscription_user_start", "user_id", "start_date"),  # couvre aussi user_id seul (FK)
         Index("idx_subscription_merchant", "merchant_id"),
-        Index("idx_subscription_start_date", "start_date"),
-        Index("idx_subscription_retry", "status", "retry_count"),
-        Index("idx_subscription_end_date", "end_date"),
+        Index("idx_subscription_retry", "status", "retry_count"),      # couvre aussi status seul
+        Index(
+            "idx_subscription_expiring", "end_date",
+            postgresql_where=text(
+                f"end_date IS NOT NULL AND status = {SUBSCRIPTION_STATUS_IDS[SubscriptionStatus.active]}"
+            )
+        ),  # abonnements actifs avec date de fin uniquement
     )
 
+# Note : updated_at n'est plus maintenu par un trigger. Les UPDATE passant par
+# l'ORM ou par update(Subscription) l'ajoutent automatiquement (onupdate) ;
+# une requête SQL brute doit inclure "updated_at = CURRENT_TIMESTAMP".
+
 # ========================================================
-# 3. DDL pour Trigger et Procédure stockée
+# 3. DDL pour fonction SQL
 # ========================================================
-ddl_update_subscription_ts = DDL("""
-CREATE OR REPLACE FUNCTION update_subscription_timestamp()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at = CURRENT_TIMESTAMP;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_update_subscription
-BEFORE UPDATE ON subscription
-FOR EACH ROW EXECUTE FUNCTION update_subscription_timestamp();
-""")
-
-ddl_cancel_subscription_proc = DDL("""
-CREATE OR REPLACE PROCEDURE cancel_subscription(
+ddl_cancel_subscription_fn = DDL("""
+DROP PROCEDURE IF EXISTS cancel_subscription(UUID, TEXT, UUID);
+
+CREATE OR REPLACE FUNCTION cancel_subscription(
     p_subscription_id UUID,
     p_reason TEXT DEFAULT NULL,
     p_canceller_id UUID DEFAULT NULL
 )
-LANGUAGE plpgsql
+RETURNS void
+LANGUAGE sql
 AS $$
-BEGIN
     UPDATE subscription
     SET
-        status = 'cancelled',
+        status = %(cancelled)s,  -- cancelled
         end_date = CURRENT_DATE,
         cancellation_reason = p_reason,
         updated_at = CURRENT_TIMESTAMP,
         updated_by = p_canceller_id
     WHERE id = p_subscription_id
-      AND status != 'cancelled';
-END;
+      AND status <> %(cancelled)s;
 $$;
-""")
+""", context={"cancelled": SUBSCRIPTION_STATUS_IDS[SubscriptionStatus.cancelled]})
+# Fonction SQL (SELECT cancel_subscription(...)) : pas d'interpréteur PL/pgSQL,
+# plan générique mis en cache après quelques exécutions
 
 # ========================================================
 # 4. Attachement des DDL après création de la table
 # ========================================================
-event.listen(Subscription.__table__, 'after_create', ddl_update_subscription_ts)
-event.listen(Subscription.__table__, 'after_create', ddl_cancel_subscription_proc)
+event.listen(Subscription.__table__, 'after_create', ddl_cancel_subscription_fn)
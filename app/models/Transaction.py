@@ -1,11 +1,14 @@
 import enum
 from sqlalchemy import (
-    Column, DateTime, Boolean, Integer, String, Text, Numeric,
-    ForeignKey, CheckConstraint, Index, DDL, event, text
+    Column, DateTime, Boolean, BigInteger, Integer, String, Text, Computed,
+    ForeignKey, CheckConstraint, Index, DDL, event, select, text
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, ENUM as PGEnum
+from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, TSVECTOR
 from app.database import Base
+from app.utils.lookup import LookupCode, lookup_ids, lookup_table
+from app.utils.ids import uuid7
 
 # ========================================================
 # 1. Python Enums pour Transaction
@@ -45,6 +48,23 @@ class TransactionStatus(enum.Enum):
     authorized  = "authorized"
     captured    = "captured"
 
+# Tables de référence SMALLINT (2 octets par colonne, nouvelle valeur = simple INSERT)
+TRANSACTION_TYPE_IDS = lookup_ids(TransactionType)
+TRANSACTION_METHOD_IDS = lookup_ids(TransactionMethod)
+CURRENCY_IDS = lookup_ids(Currency)
+TRANSACTION_STATUS_IDS = lookup_ids(TransactionStatus)
+
+transaction_type_lu = lookup_table("transaction_type_lu", TRANSACTION_TYPE_IDS)
+transaction_method_lu = lookup_table("transaction_method_lu", TRANSACTION_METHOD_IDS)
+transaction_currency_lu = lookup_table("transaction_currency_lu", CURRENCY_IDS)
+transaction_status_lu = lookup_table("transaction_status_lu", TRANSACTION_STATUS_IDS)
+
+def _type_ids(*types):                           # liste SQL d'identifiants pour les CHECK
+    return ", ".join(str(TRANSACTION_TYPE_IDS[t]) for t in types)
+
+def _status_ids(*statuses):                      # liste SQL d'identifiants pour les index partiels et triggers
+    return ", ".join(str(TRANSACTION_STATUS_IDS[s]) for s in statuses)
+
 # ========================================================
 # 2. Modèle SQLAlchemy pour la table "transaction"
 # ========================================================
@@ -54,6 +74,7 @@ class Transaction(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
+        default=uuid7,
         server_default=text("gen_random_uuid()")
     )  # [id] : Identifiant unique, généré automatiquement.
 
@@ -65,12 +86,14 @@ class Transaction(Base):
     )  # [created_at] : Horodatage de la création, partition clé.
 
     transaction_type = Column(
-        PGEnum(TransactionType, name="transaction_type", create_type=True),
+        LookupCode(TransactionType, TRANSACTION_TYPE_IDS),
+        ForeignKey("transaction_type_lu.id"),
         nullable=False
     )  # [transaction_type] : Type d’opération, contrôlé par Enum.
 
     transaction_method = Column(
-        PGEnum(TransactionMethod, name="transaction_method", create_type=True),
+        LookupCode(TransactionMethod, TRANSACTION_METHOD_IDS),
+        ForeignKey("transaction_method_lu.id"),
         nullable=False
     )  # [transaction_method] : Mode d’opération, contrôlé par Enum.
 
@@ -93,18 +116,20 @@ class Transaction(Base):
     )  # [recipient_wallet_id] : Portefeuille destinataire.
 
     amount = Column(
-        Numeric(12, 2),
+        BigInteger,
         nullable=False
-    )  # [amount] : Montant, positif ≤ 10 000 000.
+    )  # [amount] : Montant en unités mineures (centimes ; unités pour JPY/XOF), positif ≤ 1 000 000 000.
 
     currency = Column(
-        PGEnum(Currency, name="transaction_currency", create_type=True),
+        LookupCode(Currency, CURRENCY_IDS),
+        ForeignKey("transaction_currency_lu.id"),
         nullable=False,
-        server_default=Currency.EUR.value
+        server_default=text(str(CURRENCY_IDS[Currency.EUR]))
     )  # [currency] : Devise ISO 4217.
 
     status = Column(
-        PGEnum(TransactionStatus, name="transaction_status", create_type=True),
+        LookupCode(TransactionStatus, TRANSACTION_STATUS_IDS),
+        ForeignKey("transaction_status_lu.id"),
         nullable=False
     )  # [status] : Statut de la transaction.
 
@@ -132,10 +157,10 @@ class Transaction(Base):
     )  # [merchant_id] : Commerçant impliqué (le cas échéant).
 
     fee_amount = Column(
-        Numeric(10, 2),
+        BigInteger,
         nullable=False,
-        server_default=text("0.00")
-    )  # [fee_amount] : Montant des frais associés.
+        server_default=text("0")
+    )  # [fee_amount] : Montant des frais associés, en unités mineures.
 
     description = Column(
         Text,
@@ -178,6 +203,15 @@ class Transaction(Base):
         nullable=True
     )  # [deleted_at] : Suppression logique.
 
+    search_text = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(processor_transaction_id, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+            persisted=True
+        )
+    )  # [search_text] : Texte indexé full-text, calculé par Postgres (remplace search_index).
+
     __table_args__ = (
         CheckConstraint(
             "sender_wallet_id IS DISTINCT FROM recipient_wallet_id",
@@ -185,32 +219,118 @@ class Transaction(Base):
         ),  # empêche un portefeuille de s’envoyer à lui-même
 
         CheckConstraint(
-            "(transaction_type IN ('payment','transfer','withdrawal','chargeback') AND sender_wallet_id IS NOT NULL) OR "
-            "(transaction_type IN ('deposit','payment','transfer','refund') AND recipient_wallet_id IS NOT NULL) OR "
-            "(transaction_type IN ('fee_collection','adjustment') AND "
-            "(sender_wallet_id IS NOT NULL OR recipient_wallet_id IS NOT NULL))",
+            "CASE "
+            f"WHEN transaction_type IN ({_type_ids(TransactionType.withdrawal, TransactionType.chargeback)}) "
+            "THEN sender_wallet_id IS NOT NULL "
+            f"WHEN transaction_type IN ({_type_ids(TransactionType.deposit, TransactionType.refund)}) "
+            "THEN recipient_wallet_id IS NOT NULL "
+            "ELSE COALESCE(sender_wallet_id, recipient_wallet_id) IS NOT NULL "
+            "END",
             name="chk_wallet_ids_for_type"
-        ),  # cohérence wallets ↔ type de transaction
+        ),  # cohérence wallets ↔ type de transaction : une seule branche évaluée par ligne
 
         CheckConstraint(
-            "amount > 0 AND amount <= 10000000",
+            "amount > 0 AND amount <= 1000000000",
             name="chk_transaction_amount_range"
         ),  # montant valide
 
         Index("idx_transaction_type_status", "transaction_type", "status"),
-        Index("idx_transaction_sender", "sender_wallet_id"),
-        Index("idx_transaction_recipient", "recipient_wallet_id"),
-        Index("idx_transaction_created", "created_at"),
-        Index("idx_transaction_status", "status"),
-        Index("idx_transaction_merchant", "merchant_id"),
-        Index("idx_transaction_card_id", "card_id"),
+        # Index couvrants (INCLUDE) : "dernières opérations de ce portefeuille / commerçant / carte"
+        # se résout en index-only scan, sans visite du heap
+        Index("idx_transaction_sender", "sender_wallet_id", "created_at",
+              postgresql_include=["amount", "status"]),
+        Index("idx_transaction_recipient", "recipient_wallet_id", "created_at",
+              postgresql_include=["amount", "status"]),
+        Index(
+            "idx_transaction_created_brin",
+            "created_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ),  # index BRIN : created_at croît avec l'insertion, suffisant pour les filtres par période
+        Index(
+            "idx_transaction_pending",
+            "created_at",
+            postgresql_where=text(f"status = {TRANSACTION_STATUS_IDS[TransactionStatus.pending]}")
+        ),  # statut peu sélectif : seuls les états minoritaires recherchés sont indexés
+        Index(
+            "idx_transaction_disputed",
+            "created_at",
+            postgresql_where=text(f"status = {TRANSACTION_STATUS_IDS[TransactionStatus.disputed]}")
+        ),
+        Index("idx_transaction_merchant", "merchant_id", "created_at",
+              postgresql_include=["amount", "status"]),
+        Index("idx_transaction_card_id", "card_id", "created_at",
+              postgresql_include=["amount", "status"]),
         Index(
             "idx_transaction_fraud",
             "fraud_flag",
             postgresql_where=text("fraud_flag = TRUE")
         ),
+        Index("idx_transaction_search_text", "search_text", postgresql_using="gin"),
+        Index(
+            "idx_transaction_metadata_gin",
+            "metadata",
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"}
+        ),  # jsonb_path_ops : index bien plus compact, utilisable par @>, @? et @@ uniquement
+        Index(
+            "idx_tx_meta_iv",
+            text("(metadata->>'iv')"),
+            postgresql_where=text("metadata ? 'iv'")
+        ),  # égalité sur metadata->>'iv' : sonde B-tree, limitée aux lignes portant la clé
+        Index(
+            "idx_tx_meta_processor",
+            text("(metadata->>'processor_ref')"),
+            postgresql_where=text("metadata ? 'processor_ref'")
+        ),  # égalité sur metadata->>'processor_ref'
+
+        # Partitionnement natif mensuel : les requêtes bornées sur created_at n'ouvrent que
+        # les partitions concernées. Les index ci-dessus, déclarés sur la table parente,
+        # sont créés localement sur chaque partition par Postgres.
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
+    @classmethod
+    def find_by_processor_ref(cls, db, processor_ref):
+        """
+        Retourne les transactions dont metadata->>'processor_ref' vaut processor_ref.
+        L'expression et le prédicat "metadata ? 'processor_ref'" reprennent exactement
+        ceux de idx_tx_meta_processor, pour que le planificateur utilise cet index partiel.
+        """
+        stmt = select(cls).where(
+            cls.transaction_metadata.has_key("processor_ref"),
+            cls.transaction_metadata["processor_ref"].astext == processor_ref,
+        )
+        return db.scalars(stmt).all()
+
+    @classmethod
+    def process_payment(cls, db, sender_wallet_id, recipient_wallet_id, amount, currency,
+                        description=None, merchant_id=None):
+        """
+        Exécute la fonction SQL process_payment (verrou, débit/crédit et INSERT en une instruction)
+        et retourne l'id de la transaction créée. amount est en unités mineures.
+        Le contrôle de solde est la contrainte CHECK de wallet, atomique en READ COMMITTED :
+        sa violation est traduite en ValueError ; les autres erreurs (dont les autres CHECK,
+        de même SQLSTATE 23514 : montant hors bornes, virement à soi-même) remontent telles quelles.
+        """
+        try:
+            return db.execute(_PROCESS_PAYMENT, {
+                "sender": sender_wallet_id, "recipient": recipient_wallet_id,
+                "amount": amount, "currency": getattr(currency, "value", currency),
+                "description": description, "merchant": merchant_id,
+            }).scalar_one()
+        except IntegrityError as exc:
+            if getattr(getattr(exc.orig, "diag", None), "constraint_name", None) == BALANCE_CONSTRAINT:
+                raise ValueError("Solde insuffisant.") from exc
+            raise
+
+# Contrainte CHECK de wallet violée quand le solde est insuffisant (lue dans exc.orig.diag, psycopg2)
+BALANCE_CONSTRAINT = "chk_wallet_balance_non_negative"
+
+_PROCESS_PAYMENT = text(
+    "SELECT process_payment(:sender, :recipient, :amount, :currency, :description, :merchant)"
+)
+
 # ========================================================
 # 3. DDL pour le trigger de complétion automatique
 # ========================================================
@@ -218,8 +338,8 @@ ddl_set_completed_at = DDL("""
 CREATE OR REPLACE FUNCTION set_transaction_completed_at()
 RETURNS TRIGGER AS $$
 BEGIN
-  IF NEW.status IN ('completed','failed','refunded','cancelled')
-     AND (OLD.status IS NULL OR OLD.status NOT IN ('completed','failed','refunded','cancelled')) THEN
+  IF NEW.status IN (%(final)s)
+     AND NEW.completed_at IS NULL THEN
     NEW.completed_at := CURRENT_TIMESTAMP;
   END IF;
   RETURN NEW;
@@ -227,68 +347,131 @@ END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_set_transaction_completed_at
-BEFORE UPDATE ON transaction
+BEFORE INSERT OR UPDATE ON transaction
 FOR EACH ROW EXECUTE FUNCTION set_transaction_completed_at();
-""")  # met à jour completed_at dès que le statut passe en état final
+""", context={"final": _status_ids(
+    TransactionStatus.completed, TransactionStatus.failed,
+    TransactionStatus.refunded, TransactionStatus.cancelled,
+)})  # renseigne completed_at dès qu'une ligne est insérée ou passe en état final, sans UPDATE supplémentaire
 
 # ========================================================
-# 4. DDL pour la procédure stockée de paiement
+# 4. DDL pour la fonction de paiement
 # ========================================================
 ddl_process_payment = DDL("""
-CREATE OR REPLACE PROCEDURE process_payment(
+DROP PROCEDURE IF EXISTS process_payment(UUID, UUID, BIGINT, VARCHAR, TEXT, UUID);
+
+CREATE OR REPLACE FUNCTION process_payment(
   p_sender_wallet_id UUID,
   p_recipient_wallet_id UUID,
-  p_amount NUMERIC(12,2),
+  p_amount BIGINT,  -- unités mineures, comme wallet.balance
   p_currency VARCHAR(3),
   p_description TEXT,
   p_merchant_id UUID DEFAULT NULL
 )
-LANGUAGE plpgsql AS $$
+RETURNS UUID
+LANGUAGE sql
+AS $$
+  -- Verrouille les deux portefeuilles dans l'ordre de leur id : deux virements opposés
+  -- (A→B et B→A) prennent les verrous dans le même ordre et ne peuvent plus s'interbloquer.
+  SELECT id FROM wallet
+   WHERE id IN (p_sender_wallet_id, p_recipient_wallet_id)
+   ORDER BY id
+   FOR UPDATE;
+
+  -- Débit, crédit et écriture de la transaction en une seule instruction ; chaque échec
+  -- lève une erreur de contrainte (SQLSTATE exploitable) qui annule toute l'instruction :
+  --   solde insuffisant          -> chk_wallet_balance_non_negative (23514)
+  --   portefeuille inexistant ou NULL -> moins de 2 lignes dans mv, status NULL (23502),
+  --                                 vérifié avant les FK sender/recipient_wallet_id (23503)
+  --   devise inconnue            -> currency NULL (23502)
+  WITH mv AS (
+    UPDATE wallet w
+       SET balance = w.balance + v.delta, last_updated = CURRENT_TIMESTAMP
+      FROM (VALUES (p_sender_wallet_id,    -p_amount),
+                   (p_recipient_wallet_id,  p_amount)) AS v(id, delta)
+     WHERE w.id = v.id
+    RETURNING w.id
+  )
+  INSERT INTO transaction (
+    transaction_type, transaction_method, sender_wallet_id,
+    recipient_wallet_id, amount, currency, status,
+    description, merchant_id
+  )
+  SELECT %(payment)s, %(wallet)s, p_sender_wallet_id,
+         p_recipient_wallet_id, p_amount,
+         (SELECT id FROM transaction_currency_lu WHERE code = p_currency),
+         CASE WHEN (SELECT count(*) FROM mv) = 2 THEN %(completed)s END,
+         p_description, p_merchant_id  -- completed_at : trigger BEFORE INSERT
+  RETURNING id;
+$$;
+""", context={
+    "payment": TRANSACTION_TYPE_IDS[TransactionType.payment],
+    "wallet": TRANSACTION_METHOD_IDS[TransactionMethod.wallet],
+    "completed": TRANSACTION_STATUS_IDS[TransactionStatus.completed],
+})
+# Fonction SQL (SELECT process_payment(...)) : pas d'interpréteur PL/pgSQL ni de SPI,
+# retourne l'id de la transaction créée
+
+# ========================================================
+# 5. Vue de recherche full-text (remplace la table search_index)
+# ========================================================
+# Créée après "transaction", dernière des trois tables sources (FK vers merchant, lui-même lié à user).
+ddl_search_view = DDL("""
+CREATE OR REPLACE VIEW search_index AS
+    SELECT 'user'::VARCHAR(20) AS entity_type, id AS entity_id, search_text FROM "user"
+    UNION ALL
+    SELECT 'merchant', id, search_text FROM merchant
+    UNION ALL
+    SELECT 'transaction', id, search_text FROM transaction;
+""")  # chaque branche utilise l'index GIN de sa table ; aucune écriture applicative à synchroniser
+
+# ========================================================
+# 6. DDL des partitions mensuelles et de leur maintenance
+# ========================================================
+ddl_partitions = DDL("""
+CREATE OR REPLACE FUNCTION create_transaction_partitions(p_months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
 DECLARE
-  v_transaction_id UUID;
-  v_sender_balance NUMERIC(12,2);
+    v_month DATE;
+    v_name  TEXT;
 BEGIN
-  SELECT balance INTO v_sender_balance FROM wallet WHERE id = p_sender_wallet_id;
-  IF v_sender_balance IS NULL OR v_sender_balance < p_amount THEN
-    RAISE EXCEPTION 'Solde insuffisant ou portefeuille introuvable.';
-  END IF;
+    FOR i IN 0..p_months_ahead LOOP
+        v_month := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE;
+        v_name  := 'transaction_y' || to_char(v_month, 'YYYY') || 'm' || to_char(v_month, 'MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(  -- %% doublés : DDL() applique le formatage Python
+                'CREATE TABLE %%I PARTITION OF transaction FOR VALUES FROM (%%L) TO (%%L) '
+                || 'WITH (fillfactor = 90, autovacuum_vacuum_scale_factor = 0.05)',  -- HOT + carte de visibilité à jour
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
 
-  BEGIN
-    INSERT INTO transaction (
-      transaction_type, transaction_method, sender_wallet_id,
-      recipient_wallet_id, amount, currency, status,
-      description, merchant_id, created_at
-    ) VALUES (
-      'payment','wallet',p_sender_wallet_id,
-      p_recipient_wallet_id,p_amount,p_currency,
-      'pending',p_description,p_merchant_id,CURRENT_TIMESTAMP
-    ) RETURNING id INTO v_transaction_id;
-
-    UPDATE wallet
-      SET balance = balance - p_amount, last_updated = CURRENT_TIMESTAMP
-      WHERE id = p_sender_wallet_id;
-
-    UPDATE wallet
-      SET balance = balance + p_amount, last_updated = CURRENT_TIMESTAMP
-      WHERE id = p_recipient_wallet_id;
-
-    UPDATE transaction
-      SET status = 'completed'
-      WHERE id = v_transaction_id;
-  EXCEPTION
-    WHEN OTHERS THEN
-      UPDATE transaction
-        SET status = 'failed', completed_at = CURRENT_TIMESTAMP,
-            failure_reason = SQLERRM
-      WHERE id = v_transaction_id;
-      RAISE;
-  END;
+-- Filet de sécurité : reçoit les lignes hors des mois déjà créés
+CREATE TABLE IF NOT EXISTS transaction_default PARTITION OF transaction DEFAULT
+    WITH (fillfactor = 90, autovacuum_vacuum_scale_factor = 0.05);
+
+SELECT create_transaction_partitions();
+
+-- Maintenance : création anticipée des partitions chaque 1er du mois (si pg_cron est installé)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule(
+            'transaction_partitions', '0 3 1 * *',
+            'SELECT create_transaction_partitions()'
+        );
+    END IF;
 END;
 $$;
-""")  # procédure pour traiter un paiement atomiquement
+""")
 
 # ========================================================
-# 5. Attachement des DDL après création de la table
+# 7. Attachement des DDL après création de la table
 # ========================================================
+event.listen(Transaction.__table__, 'after_create', ddl_partitions)
 event.listen(Transaction.__table__, 'after_create', ddl_set_completed_at)
 event.listen(Transaction.__table__, 'after_create', ddl_process_payment)
+event.listen(Transaction.__table__, 'after_create', ddl_search_view)
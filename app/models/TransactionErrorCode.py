@@ -1,11 +1,12 @@
 import enum
 from sqlalchemy import (
-    UUID, Column, Text, Boolean, DateTime, Enum as SAEnum, ARRAY,
-    Index, DDL, event, ForeignKey, text
+    UUID, Column, Text, Boolean, DateTime, Enum as SAEnum, BigInteger, SmallInteger, String,
+    Table, CheckConstraint, Index, DDL, event, ForeignKey, select, text
 )
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import VARCHAR, JSONB
 from app.database import Base
+from app.utils.triggers import updated_ts_ddl
 
 # ========================================================
 # 1. Python Enums pour severity et category
@@ -27,7 +28,18 @@ class ErrorCategory(enum.Enum):
     user_input     = "user_input"
 
 # ========================================================
-# 2. Modèle SQLAlchemy pour transaction_error_code
+# 2. Dictionnaire des tags (au plus 64 : un bit de tag_bits par tag)
+# ========================================================
+error_code_tag = Table(
+    "error_code_tag",
+    Base.metadata,
+    Column("id", SmallInteger, primary_key=True, autoincrement=False),  # position du bit (0–63)
+    Column("name", String(50), nullable=False, unique=True),
+    CheckConstraint("id BETWEEN 0 AND 63", name="chk_error_code_tag_bit"),
+)
+
+# ========================================================
+# 3. Modèle SQLAlchemy pour transaction_error_code
 # ========================================================
 class TransactionErrorCode(Base):
     __tablename__ = "transaction_error_code"
@@ -63,11 +75,11 @@ class TransactionErrorCode(Base):
         nullable=False
     )  # category : Catégorie de l'erreur
 
-    tags = Column(
-        ARRAY(Text),
+    tag_bits = Column(
+        BigInteger,
         nullable=False,
-        server_default="{}"
-    )  # tags : Tableau de labels
+        server_default=text("0")
+    )  # tag_bits : Tags encodés en masque (bit n = error_code_tag.id n) ; vue transaction_error_code_tags pour le TEXT[]
 
     created_at = Column(
         DateTime(timezone=True),
@@ -99,34 +111,86 @@ class TransactionErrorCode(Base):
     )  # updated_by : Dernier modificateur
 
     __table_args__ = (
-        Index("idx_error_codes_severity", "severity"),
+        Index(
+            "idx_error_codes_severity_high",
+            "severity",
+            postgresql_where=text("severity IN ('high','critical')")
+        ),  # seules les erreurs graves sont recherchées ; retry_possible (2 valeurs) n'est plus indexé
         Index("idx_error_codes_category", "category"),
-        Index("idx_error_codes_retry", "retry_possible"),
-        Index("idx_error_codes_tags", "tags", postgresql_using="gin"),
+        # tag_bits n'est pas indexé : "a le tag" est un simple ET binaire sur quelques dizaines de lignes
     )
 
+    @classmethod
+    def with_any_tag(cls, db, tag_names):
+        """
+        Retourne les codes portant au moins un des tags donnés (tag_bits & masque <> 0).
+        Le masque est calculé en base par error_code_tag_mask() à partir du dictionnaire.
+        """
+        mask = func.error_code_tag_mask(tag_names)
+        stmt = select(cls).where(cls.tag_bits.op("&")(mask) != 0)
+        return db.scalars(stmt).all()
+
 # ========================================================
-# 3. DDL pour trigger updated_at
+# 4. DDL pour trigger updated_at
 # ========================================================
-ddl_update_timestamp = DDL("""
-CREATE OR REPLACE FUNCTION update_error_code_timestamp()
+ddl_update_timestamp = updated_ts_ddl("transaction_error_code", "trg_update_error_codes")  # fonction partagée set_updated_ts()
+
+# ========================================================
+# 5. DDL pour le masque de tags, la vue de compatibilité et la notification des changements
+# ========================================================
+ddl_tag_bits = DDL("""
+CREATE OR REPLACE FUNCTION error_code_tag_mask(p_tags TEXT[])
+RETURNS BIGINT
+LANGUAGE sql STABLE
+AS $$
+    SELECT COALESCE(bit_or(1::BIGINT << id), 0)
+    FROM error_code_tag
+    WHERE name = ANY(p_tags);
+$$;
+
+CREATE OR REPLACE VIEW transaction_error_code_tags AS
+    SELECT c.code,
+           ARRAY(
+               SELECT t.name FROM error_code_tag t
+               WHERE c.tag_bits & (1::BIGINT << t.id) <> 0
+               ORDER BY t.id
+           ) AS tags
+    FROM transaction_error_code c;
+""")  # ancienne représentation TEXT[] reconstituée à la lecture
+
+ddl_notify_changes = DDL("""
+CREATE OR REPLACE FUNCTION notify_error_codes_changed()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.updated_at := CURRENT_TIMESTAMP;
-    RETURN NEW;
+    PERFORM pg_notify('error_codes_changed', '');
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trg_update_error_codes
-BEFORE UPDATE ON transaction_error_code
-FOR EACH ROW EXECUTE FUNCTION update_error_code_timestamp();
-""")
+CREATE TRIGGER trg_notify_error_codes
+AFTER INSERT OR UPDATE OR DELETE ON transaction_error_code
+FOR EACH STATEMENT EXECUTE FUNCTION notify_error_codes_changed();
+""")  # invalide le cache en mémoire des workers (app/services/error_code_cache.py)
+
 
 # ========================================================
-# 4. Attachement du DDL après création de la table
+# 6. Attachement du DDL après création de la table
 # ========================================================
+# La fonction et la vue lisent error_code_tag : table créée avant transaction_error_code
+TransactionErrorCode.__table__.add_is_dependent_on(error_code_tag)
+
 event.listen(
     TransactionErrorCode.__table__,
     'after_create',
     ddl_update_timestamp
 )
+event.listen(
+    TransactionErrorCode.__table__,
+    'after_create',
+    ddl_tag_bits
+)
+event.listen(
+    TransactionErrorCode.__table__,
+    'after_create',
+    ddl_notify_changes
+)
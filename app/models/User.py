@@ -1,11 +1,13 @@
 import enum                                            # import Python enum base
 from sqlalchemy import (                               # import core SQLAlchemy constructs
-    Column, String, DateTime, Boolean, Integer, Text,
+    Column, String, DateTime, Boolean, Integer, Text, Computed,
     Index, DDL, event, text, ForeignKey
 )
 from sqlalchemy.sql import func                         # import SQL functions (e.g. now())
-from sqlalchemy.dialects.postgresql import UUID, INET, ENUM as PGEnum  # import Postgres types
+from sqlalchemy.dialects.postgresql import UUID, INET, TSVECTOR, ENUM as PGEnum  # import Postgres types
 from app.database import Base                          # Base declarative from your project
+from app.utils.ids import uuid7                        # UUIDv7 generator (time-ordered primary keys)
+from app.utils.triggers import updated_ts_ddl          # shared updated_at trigger
 
 # ========================================================
 # 🔐 1. Python Enums pour User (synchronisés en Postgres)
@@ -43,7 +45,8 @@ class User(Base):
     id = Column(                                       # [id] : UUID primary key
         UUID(as_uuid=True),
         primary_key=True,
-        server_default=text("gen_random_uuid()")
+        default=uuid7,                                 #   UUIDv7 generated client-side (time-ordered)
+        server_default=text("gen_random_uuid()")       #   fallback for raw SQL inserts
     )
 
     username = Column(                                 # [username] : unique public identifier
@@ -61,16 +64,14 @@ class User(Base):
         nullable=True
     )
 
-    email = Column(                                    # [email] : unique, required email
+    email = Column(                                    # [email] : required email (unique among live users, see idx_user_email_lower)
         String(255),
-        nullable=False,
-        unique=True
+        nullable=False
     )
 
-    phone = Column(                                    # [phone] : unique, required phone number
+    phone = Column(                                    # [phone] : required phone number (unique among live users, see idx_user_phone)
         String(20),
-        nullable=False,
-        unique=True
+        nullable=False
     )
 
     password_hash = Column(                            # [password_hash] : hashed password
@@ -169,32 +170,55 @@ class User(Base):
         server_default=text("FALSE")
     )
 
+    search_text = Column(                              # [search_text] : generated full-text vector (replaces search_index)
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(username, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(full_name, '')), 'B')",
+            persisted=True
+        )
+    )
+
+    # Server-generated values (timestamps, defaults, search_text, trigger-set updated_at) are read back
+    # through INSERT/UPDATE ... RETURNING at flush time: no refresh SELECT after a write
+    __mapper_args__ = {"eager_defaults": True}
+
     __table_args__ = (
-        Index("idx_user_email_lower", func.lower(email), unique=True),  # unique index on lower(email)
-        Index("idx_user_phone", phone, unique=True),                    # unique index on phone
+        Index("idx_user_email_lower", func.lower(email), unique=True,
+              postgresql_where=text("deleted_at IS NULL")),             # unique lower(email) among live users
+        Index("idx_user_phone", phone, unique=True,
+              postgresql_where=text("deleted_at IS NULL")),             # unique phone among live users
         Index("idx_user_status", status),                               # index on status
         Index("idx_user_type", type),                                   # index on type
         Index("idx_user_created_at", created_at),                       # index on creation timestamp
         Index("idx_user_account_status", account_status),               # index on account_status
-        Index("idx_user_email_verified", email_verified),               # index on email_verified flag
+        Index("idx_user_unverified", id,
+              postgresql_where=text("NOT email_verified")),             # partial index: users still to verify
+        Index("idx_user_search_text", search_text, postgresql_using="gin"),  # GIN index for full-text search
     )
 
+# API error detail for each unique index an INSERT/UPDATE on "user" can violate
+UNIQUE_VIOLATION_DETAILS = {
+    "idx_user_email_lower": "Email already registered",
+    "idx_user_phone": "Phone already registered",
+}
+
+
+def unique_violation_detail(exc):
+    """
+    API error detail for an IntegrityError raised by one of the unique indexes above, else None.
+    Reads the violated index name from psycopg2 (orig.diag) or asyncpg (chained original error).
+    """
+    orig = exc.orig
+    name = getattr(getattr(orig, "diag", None), "constraint_name", None)
+    if name is None:
+        name = getattr(orig.__cause__, "constraint_name", None)
+    return UNIQUE_VIOLATION_DETAILS.get(name)
+
 # ========================================================
 # 🔔 3. DDL pour triggers et procédure stockée
 # ========================================================
-ddl_update_ts = DDL("""
-CREATE OR REPLACE FUNCTION update_user_timestamp()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at = CURRENT_TIMESTAMP;  -- update 'updated_at' on modify
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_update_user
-BEFORE UPDATE ON "user"
-FOR EACH ROW EXECUTE FUNCTION update_user_timestamp();
-""")
+ddl_update_ts = updated_ts_ddl('"user"', "trg_update_user")  # shared set_updated_ts() trigger function
 
 ddl_lock_proc = DDL("""
 CREATE OR REPLACE PROCEDURE lock_user_account(p_user_id UUID)
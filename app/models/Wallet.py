@@ -1,11 +1,13 @@
 import enum
 from sqlalchemy import (
-    Column, DateTime, Boolean, Numeric, ForeignKey, CheckConstraint,
-    Index, DDL, event, text
+    Column, DateTime, Boolean, BigInteger, ForeignKey, CheckConstraint,
+    UniqueConstraint, Index, DDL, event, text
 )
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID, ENUM as PGEnum
 from app.database import Base
+from app.utils.triggers import updated_ts_ddl
+from app.utils.ids import uuid7
 
 # ========================================================
 # 1. Python Enums pour Wallet
@@ -32,6 +34,7 @@ class Wallet(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
+        default=uuid7,
         server_default=text("gen_random_uuid()")
     )  # [id] : Identifiant unique du portefeuille, généré automatiquement
 
@@ -42,10 +45,10 @@ class Wallet(Base):
     )  # [user_id] : Référence vers l'utilisateur propriétaire (ON DELETE CASCADE)
 
     balance = Column(
-        Numeric(12, 2),
+        BigInteger,
         nullable=False,
-        server_default=text("0.00")
-    )  # [balance] : Solde actuel, précision 2 décimales, non négatif
+        server_default=text("0")
+    )  # [balance] : Solde actuel en unités mineures (centimes ; unités pour JPY/XOF), non négatif
 
     currency = Column(
         PGEnum(Currency, name="wallet_currency", create_type=True),
@@ -60,10 +63,10 @@ class Wallet(Base):
     )  # [last_updated] : Date et heure de la dernière mise à jour
 
     max_balance = Column(
-        Numeric(12, 2),
+        BigInteger,
         nullable=False,
-        server_default=text("1000000.00")
-    )  # [max_balance] : Limite maximale du solde, bornée entre 0 et 10 000 000
+        server_default=text("100000000")
+    )  # [max_balance] : Limite maximale du solde en unités mineures, bornée entre 0 et 1 000 000 000
 
     is_primary = Column(
         Boolean,
@@ -89,12 +92,16 @@ class Wallet(Base):
     )  # [deleted_at] : Suppression logique (soft delete)
 
     __table_args__ = (
-        CheckConstraint("balance >= 0", name="chk_wallet_balance_non_negative"),  # solde non négatif
+        CheckConstraint("balance >= 0", name="chk_wallet_balance_non_negative"),  # solde non négatif (seule garde, sans trigger)
         CheckConstraint(
-            "max_balance >= 0 AND max_balance <= 10000000.00",
+            "max_balance >= 0 AND max_balance <= 1000000000",
             name="chk_wallet_max_balance_range"
         ),  # bornes du solde maximal
-        Index("idx_wallet_user_currency", "user_id", "currency", unique=True),     # un portefeuille par devise/utilisateur
+        UniqueConstraint("id", "user_id", name="uq_wallet_id_user"),              # cible de la FK composite card(wallet_id, user_id)
+        Index(
+            "idx_wallet_user_currency", "user_id", "currency", unique=True,
+            postgresql_where=text("deleted_at IS NULL")
+        ),  # un portefeuille actif par devise/utilisateur (réouverture possible après suppression logique)
         Index("idx_wallet_user_id", "user_id"),                                   # index pour rechercher par utilisateur
         Index("idx_wallet_currency", "currency"),                                 # index pour filtrer par devise
         Index(
@@ -107,38 +114,14 @@ class Wallet(Base):
 # ========================================================
 # 3. DDL pour triggers
 # ========================================================
-ddl_update_wallet_ts = DDL("""
-CREATE OR REPLACE FUNCTION update_wallet_timestamp()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.last_updated = CURRENT_TIMESTAMP;  -- met à jour last_updated avant chaque UPDATE
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_update_wallet
-BEFORE UPDATE ON wallet
-FOR EACH ROW EXECUTE FUNCTION update_wallet_timestamp();
-""")  # trigger automatique sur last_updated
-
-ddl_check_wallet_balance = DDL("""
-CREATE OR REPLACE FUNCTION check_wallet_balance()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF NEW.balance < 0 THEN
-        RAISE EXCEPTION 'Le solde du portefeuille ne peut pas être négatif.';  -- empêche solde négatif
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE CONSTRAINT TRIGGER trg_check_wallet_balance
-AFTER INSERT OR UPDATE OF balance ON wallet
-FOR EACH ROW EXECUTE FUNCTION check_wallet_balance();
-""")  # trigger complémentaire pour garantir balance >= 0
+ddl_update_wallet_ts = updated_ts_ddl("wallet", "trg_update_wallet", column="last_updated")  # fonction partagée set_last_updated_ts()
+
+ddl_wallet_storage = DDL("""
+ALTER TABLE wallet SET (fillfactor = 80, autovacuum_vacuum_scale_factor = 0.02);
+""")  # 20 % d’espace libre par page : balance et last_updated ne sont indexés nulle part, leurs UPDATE restent HOT
 
 # ========================================================
 # 4. Attachement des DDL après création de la table
 # ========================================================
 event.listen(Wallet.__table__, 'after_create', ddl_update_wallet_ts)
-event.listen(Wallet.__table__, 'after_create', ddl_check_wallet_balance)
+event.listen(Wallet.__table__, 'after_create', ddl_wallet_storage)
@@ -1,6 +1,11 @@
 import enum
+import hashlib
+import ipaddress
+import struct
+import uuid
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import (
-    Column, DateTime, Boolean, Numeric, String, Text, ForeignKey,
+    Column, DateTime, Boolean, BigInteger, String, Text, ForeignKey,
     Index, DDL, event, text
 )
 from sqlalchemy.sql import func
@@ -9,6 +14,7 @@ from sqlalchemy.dialects.postgresql import (
 )
 from sqlalchemy.schema import Computed
 from app.database import Base
+from app.utils.ids import uuid7
 
 # ========================================================
 # 📜 1. Python Enums pour WalletAuditLog
@@ -39,9 +45,10 @@ class WalletAuditLog(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
+        default=uuid7,
         server_default=text("gen_random_uuid()")
     )  
-    # [id] : Identifiant unique généré automatiquement
+    # [id] : Identifiant unique généré automatiquement (UUIDv7 côté Python, gen_random_uuid() en secours)
 
     wallet_id = Column(
         UUID(as_uuid=True),
@@ -58,19 +65,19 @@ class WalletAuditLog(Base):
     # [user_id] : Référence à l'utilisateur (ON DELETE SET NULL)
 
     old_balance = Column(
-        Numeric(12, 2),
+        BigInteger,
         nullable=False
     )  
-    # [old_balance] : Solde avant l'opération
+    # [old_balance] : Solde avant l'opération (unités mineures, comme wallet.balance)
 
     new_balance = Column(
-        Numeric(12, 2),
+        BigInteger,
         nullable=False
     )  
     # [new_balance] : Solde après l'opération
 
     change_amount = Column(
-        Numeric(12, 2),
+        BigInteger,
         Computed("new_balance - old_balance", persisted=True),
         nullable=False
     )  
@@ -125,7 +132,7 @@ class WalletAuditLog(Base):
         CIDR,
         nullable=True
     )  
-    # [ip_truncated] : IP anonymisée (masquée en /24 ou /64)
+    # [ip_truncated] : IP anonymisée (masquée en /24 ou /64, calculée côté Python, voir truncate_ip)
 
     source_system = Column(
         String(30),
@@ -137,7 +144,8 @@ class WalletAuditLog(Base):
         Text,
         nullable=True
     )  
-    # [entry_hash] : Hash d'intégrité basé sur wallet_id, new_balance, changed_at
+    # [entry_hash] : Hash d'intégrité basé sur wallet_id, new_balance, changed_at (empreinte binaire calculée côté Python, voir audit_entry_hash ;
+    #                préfixe "v2:" = format binaire, les valeurs sans préfixe sont l'ancien hash texte)
 
     currency = Column(
         PGEnum(AuditCurrency, name="wallet_audit_log_currency", create_type=True),
@@ -147,79 +155,196 @@ class WalletAuditLog(Base):
 
     __table_args__ = (
         Index("idx_wallet_audit_wallet", "wallet_id"),                                      # index wallet_id
-        Index("idx_wallet_audit_changed_at", "changed_at"),                                 # index changed_at
+        Index("idx_wallet_audit_changed_at", "changed_at",                                  # BRIN changed_at (insertions chronologiques)
+              postgresql_using="brin", postgresql_with={"pages_per_range": 32}),
         Index("idx_wallet_audit_operation", "operation_type"),                             # index operation_type
         Index("idx_wallet_audit_wallet_date", "wallet_id", text("changed_at DESC")),        # index composite wallet_id + changed_at DESC
         Index("idx_wallet_audit_transaction", "transaction_id"),                           # index transaction_id
+        {"postgresql_partition_by": "RANGE (changed_at)"},                                  # partitions mensuelles (section 5)
     )
 
 # ========================================================
 # 📜 3. DDL pour triggers
 # ========================================================
-ddl_set_user_id = DDL("""
-CREATE OR REPLACE FUNCTION set_audit_user_id()
+ddl_audit_gate = DDL("""
+-- Valeur par défaut de la base : tous les types audités. Ajustable à chaud, par exemple :
+--   ALTER DATABASE ... SET audit.enabled_ops = '{deposit,withdrawal,transfer,reversal,chargeback}';
+--   SET LOCAL audit.enabled_ops = '{}';  -- aucune écriture d'audit pour la transaction en cours
+DO $$
+BEGIN
+    EXECUTE format('ALTER DATABASE %%I SET audit.enabled_ops = %%L', current_database(),
+                   '{deposit,withdrawal,transfer,adjustment,fee,reversal,chargeback}');
+END
+$$;
+
+CREATE OR REPLACE FUNCTION filter_audit_operation()
 RETURNS TRIGGER AS $$
+DECLARE
+    v_ops TEXT := current_setting('audit.enabled_ops', true);
 BEGIN
-    IF NEW.user_id IS NULL THEN
-        SELECT user_id INTO NEW.user_id FROM wallet WHERE id = NEW.wallet_id;
+    -- GUC absent ou vide (''): aucun filtrage
+    IF v_ops IS NULL OR v_ops = '' THEN
+        RETURN NEW;
+    END IF;
+    IF NOT (NEW.operation_type::text = ANY (v_ops::text[])) THEN
+        RETURN NULL;  -- annule l'INSERT : les triggers suivants ne sont pas exécutés
     END IF;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql STABLE;
 
-CREATE TRIGGER trg_set_audit_user_id
+CREATE TRIGGER trg_audit_filter_operation
 BEFORE INSERT ON wallet_audit_log
-FOR EACH ROW EXECUTE FUNCTION set_audit_user_id();
+FOR EACH ROW EXECUTE FUNCTION filter_audit_operation();
 """)  
-# Trigger 1 : remplit user_id depuis wallet si absent
+# Trigger 0 : ignore les types d'opération absents de audit.enabled_ops.
+# Les triggers d'une même table s'exécutent par ordre alphabétique de nom :
+# trg_audit_filter_operation passe avant les autres et un RETURN NULL leur évite tout travail.
 
-ddl_calc_audit_fields = DDL("""
-CREATE OR REPLACE FUNCTION calculate_audit_fields()
+ddl_set_user_id = DDL("""
+CREATE OR REPLACE FUNCTION set_audit_user_id()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.ip_truncated := CASE
-        WHEN NEW.ip_address IS NULL THEN NULL
-        WHEN family(NEW.ip_address) = 4 THEN set_masklen(NEW.ip_address, 24)
-        ELSE set_masklen(NEW.ip_address, 64)
-    END;
-    NEW.entry_hash := encode(
-        digest(NEW.wallet_id::TEXT || NEW.new_balance::TEXT || NEW.changed_at::TEXT, 'sha256'),
-        'hex'
-    );
+    -- chargements massifs : SET LOCAL app.skip_triggers = 'on' (user_id fourni par l'appelant)
+    IF current_setting('app.skip_triggers', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+    IF NEW.user_id IS NULL THEN
+        SELECT user_id INTO NEW.user_id FROM wallet WHERE id = NEW.wallet_id;
+    END IF;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql STABLE;
 
-CREATE TRIGGER trg_calculate_audit_fields
+CREATE TRIGGER trg_set_audit_user_id
 BEFORE INSERT ON wallet_audit_log
-FOR EACH ROW EXECUTE FUNCTION calculate_audit_fields();
+FOR EACH ROW EXECUTE FUNCTION set_audit_user_id();
 """)  
-# Trigger 2 : calcule ip_truncated et entry_hash
+# Trigger 1 : remplit user_id depuis wallet si absent
 
 ddl_check_tx_exists = DDL("""
 CREATE OR REPLACE FUNCTION check_transaction_exists()
 RETURNS TRIGGER AS $$
+DECLARE
+    v_missing UUID;
 BEGIN
-    IF NEW.transaction_id IS NOT NULL THEN
-        PERFORM 1 FROM transaction WHERE id = NEW.transaction_id;
-        IF NOT FOUND THEN
-            RAISE EXCEPTION 'Transaction invalide: %', NEW.transaction_id;
-        END IF;
+    SELECT n.transaction_id INTO v_missing
+    FROM new_rows n
+    LEFT JOIN transaction t ON t.id = n.transaction_id
+    WHERE n.transaction_id IS NOT NULL AND t.id IS NULL
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Transaction invalide: %%', v_missing
+            USING ERRCODE = 'foreign_key_violation';
     END IF;
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE CONSTRAINT TRIGGER trg_check_transaction_exists
-AFTER INSERT OR UPDATE ON wallet_audit_log
-DEFERRABLE INITIALLY DEFERRED
-FOR EACH ROW EXECUTE FUNCTION check_transaction_exists();
+CREATE TRIGGER trg_check_transaction_exists_ins
+AFTER INSERT ON wallet_audit_log
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION check_transaction_exists();
+
+CREATE TRIGGER trg_check_transaction_exists_upd
+AFTER UPDATE ON wallet_audit_log
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION check_transaction_exists();
 """)  
-# Trigger 3 : vérifie l’existence de la transaction référencée
+# Trigger 2 : vérifie l’existence des transactions référencées, une fois par instruction
+# (une seule jointure sur la table de transition au lieu d'une sonde d'index par ligne).
+# Un CONSTRAINT TRIGGER ne peut pas porter de table de transition : triggers AFTER simples,
+# un par événement (PostgreSQL n'accepte pas de table de transition sur INSERT OR UPDATE).
+
+# ========================================================
+# 🔏 4. Champs calculés côté client (hash d'intégrité, IP anonymisée)
+# ========================================================
+def truncate_ip(ip_address):
+    """
+    Réseau anonymisé de l'adresse : /24 en IPv4, /64 en IPv6 (ex. "203.0.113.0/24"), None si absente.
+    """
+    if ip_address is None:
+        return None
+    ip = ipaddress.ip_interface(ip_address).ip
+    return str(ipaddress.ip_network(f"{ip}/{24 if ip.version == 4 else 64}", strict=False))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_INT64_PAIR = struct.Struct(">qq")
+# Version du format d'empreinte, stockée en préfixe de entry_hash ("v2:<hex>")
+AUDIT_HASH_VERSION = "v2"
+
+
+def audit_entry_hash(wallet_id, new_balance, changed_at) -> str:
+    """
+    "v2:" suivi du SHA-256 hexadécimal d'une empreinte binaire de 32 octets, un seul bloc SHA-256 :
+    wallet_id (16 octets) || new_balance (int64 gros-boutiste, unités mineures)
+    || changed_at (int64 gros-boutiste, microsecondes depuis l'epoch UTC).
+    Aucune mise en forme texte ; hashlib délègue à OpenSSL (SHA-NI si le CPU le permet).
+    Lève ValueError si changed_at est naïf (sans fuseau) : l'instant haché serait ambigu.
+    """
+    if changed_at.tzinfo is None or changed_at.utcoffset() is None:
+        raise ValueError("changed_at doit porter un fuseau horaire (datetime aware)")
+    preimage = uuid.UUID(str(wallet_id)).bytes + _INT64_PAIR.pack(
+        int(new_balance), (changed_at - _EPOCH) // _MICROSECOND
+    )
+    return f"{AUDIT_HASH_VERSION}:{hashlib.sha256(preimage).hexdigest()}"
+
+
+@event.listens_for(WalletAuditLog, "before_insert")
+def _set_client_fields(mapper, connection, target):
+    # changed_at est fixé ici plutôt que par le serveur : il fait partie du hash
+    if target.changed_at is None:
+        target.changed_at = datetime.now(timezone.utc)
+    target.entry_hash = audit_entry_hash(target.wallet_id, target.new_balance, target.changed_at)
+    target.ip_truncated = truncate_ip(target.ip_address)
+
+# ========================================================
+# 🗂️ 5. Partitions mensuelles
+# ========================================================
+ddl_partitions = DDL("""
+CREATE OR REPLACE FUNCTION create_wallet_audit_partitions(p_months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    v_month DATE;
+    v_name  TEXT;
+BEGIN
+    FOR i IN 0..p_months_ahead LOOP
+        v_month := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE;
+        v_name  := 'wallet_audit_log_y' || to_char(v_month, 'YYYY') || 'm' || to_char(v_month, 'MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(  -- %% doublés : DDL() applique le formatage Python
+                'CREATE TABLE %%I PARTITION OF wallet_audit_log FOR VALUES FROM (%%L) TO (%%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Filet de sécurité : reçoit les lignes hors des mois déjà créés
+CREATE TABLE IF NOT EXISTS wallet_audit_log_default PARTITION OF wallet_audit_log DEFAULT;
+
+SELECT create_wallet_audit_partitions();
+
+-- Maintenance : création anticipée des partitions chaque 1er du mois (si pg_cron est installé)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule(
+            'wallet_audit_partitions', '0 3 1 * *',
+            'SELECT create_wallet_audit_partitions()'
+        );
+    END IF;
+END;
+$$;
+""")  # les mois anciens se détachent (DETACH PARTITION) vers l'archivage sans toucher au mois courant
 
 # ========================================================
-# 🚀 4. Attachement des DDL après création de la table
+# 🚀 6. Attachement des DDL après création de la table
 # ========================================================
+event.listen(WalletAuditLog.__table__, 'after_create', ddl_partitions)
+event.listen(WalletAuditLog.__table__, 'after_create', ddl_audit_gate)
 event.listen(WalletAuditLog.__table__, 'after_create', ddl_set_user_id)
-event.listen(WalletAuditLog.__table__, 'after_create', ddl_calc_audit_fields)
 event.listen(WalletAuditLog.__table__, 'after_create', ddl_check_tx_exists)
@@ -3,7 +3,9 @@ import enum                                      # import du module enum pour d
 from sqlalchemy import (                          # import des classes et fonctions SQLAlchemy
     Column, Text, Boolean, Integer, DateTime,     #   types de colonne de base
     CheckConstraint, Index, DDL, event, text,     #   contraintes, index, DDL, écoute d’événements, SQL brut
-    ARRAY, ForeignKey                              #   type ARRAY et clé étrangère
+    ARRAY, ForeignKey,                             #   type ARRAY et clé étrangère
+    BigInteger, SmallInteger, String, Table,       #   types du masque d’événements et table dictionnaire
+    select                                         #   requêtes SELECT
 )
 from sqlalchemy.sql import func                    # import de func pour les fonctions SQL (CURRENT_TIMESTAMP)
 from sqlalchemy.dialects.postgresql import (      # import des types PostgreSQL spécifiques
@@ -21,7 +23,40 @@ class WebhookStatus(enum.Enum):                   # déclaration de l’énumér
     failed = "failed"                             #   statut en échec
 
 # ========================================================
-# 2. Modèle SQLAlchemy pour la table "webhook"
+# 2. Dictionnaire des événements (au plus 63 : un bit de events_bitset par événement)
+# ========================================================
+webhook_event = Table(                            # table des événements connus
+    "webhook_event",
+    Base.metadata,
+    Column("id", SmallInteger, primary_key=True, autoincrement=False),  # position du bit (0–62, bit de signe exclu)
+    Column("name", String(100), nullable=False, unique=True),          # nom de l’événement (ex. "payment.success")
+    CheckConstraint("id BETWEEN 0 AND 62", name="chk_webhook_event_bit"),
+)
+
+# Événements émis par l’application ("<TransactionType>.success|failed"), position = bit.
+# payment.success et payment.failed gardent les bits 0 et 1 (événements par défaut, events_bitset DEFAULT 3) ;
+# un nouvel événement s’ajoute en fin de liste : les bits existants ne changent jamais.
+WEBHOOK_EVENTS = (
+    "payment.success", "payment.failed",
+    "refund.success", "refund.failed",
+    "chargeback.success", "chargeback.failed",
+    "withdrawal.success", "withdrawal.failed",
+    "deposit.success", "deposit.failed",
+    "transfer.success", "transfer.failed",
+    "fee_collection.success", "fee_collection.failed",
+    "adjustment.success", "adjustment.failed",
+)
+
+ddl_seed_events = DDL(
+    "INSERT INTO webhook_event (id, name) VALUES\n"
+    + ",\n".join(f"    ({bit}, '{name}')" for bit, name in enumerate(WEBHOOK_EVENTS))
+    + "\nON CONFLICT DO NOTHING;"
+)  # un bit par événement de WEBHOOK_EVENTS
+
+event.listen(webhook_event, 'after_create', ddl_seed_events)  # attache ddl_seed_events
+
+# ========================================================
+# 3. Modèle SQLAlchemy pour la table "webhook"
 # ========================================================
 class Webhook(Base):                              # définition de la classe Webhook héritant de Base
     __tablename__ = "webhook"                     # nom de la table en base
@@ -54,6 +89,12 @@ class Webhook(Base):                              # définition de la classe Web
         server_default=text("ARRAY['payment.success','payment.failed']")  # valeur par défaut
     )
 
+    events_bitset = Column(                       # colonne events_bitset
+        BigInteger,                               #   masque : bit n = webhook_event.id n
+        nullable=False,                           #   ne peut pas être nul
+        server_default=text("3")                  #   payment.success | payment.failed
+    )                                             #   calculé depuis events par trg_webhook_events_bitset
+
     status = Column(                              # colonne status
         PGEnum(WebhookStatus,                     #   type ENUM PostgreSQL basé sur WebhookStatus
                name="webhook_status", create_type=True),
@@ -144,17 +185,39 @@ class Webhook(Base):                              # définition de la classe Web
             "max_retry BETWEEN 0 AND 10",
             name="chk_webhook_max_retry_range"
         ),
+        CheckConstraint(                          # au moins un événement connu
+            "events_bitset > 0",
+            name="chk_webhook_events_bitset"
+        ),
         Index("idx_webhook_merchant", "merchant_id"),          # index sur merchant_id
-        Index("idx_webhook_status", "status"),                # index sur status
+        Index("idx_webhook_active", "merchant_id",            # webhooks actifs par marchand (dispatcher)
+              postgresql_where=text("status = 'active'"),       #   partiel : inactive/failed hors index
+              postgresql_include=["events_bitset"]),           #   filtre d'abonnement sans visite du heap
+        # url / secret_key restent hors INCLUDE : subscribed_to charge la ligne entière (select(cls)),
+        # le heap est visité de toute façon pour les quelques webhooks retenus
         Index("idx_webhook_last_delivery",                      # index sur last_delivery_attempt DESC
               text("last_delivery_attempt DESC")),
         Index("idx_webhook_retry", "retry_count"),            # index sur retry_count
-        Index("idx_webhook_event", "events",                  # index GIN sur events
-              postgresql_using="gin"),
+        # events_bitset n’est pas indexé : un B-tree ne sert pas un prédicat "& masque <> 0",
+        # le filtre s’applique aux quelques webhooks actifs du marchand trouvés par idx_webhook_active
     )
 
+    @classmethod
+    def subscribed_to(cls, db, merchant_id, event_names):
+        """
+        Retourne les webhooks actifs du marchand abonnés à au moins un des événements
+        (events_bitset & masque <> 0, masque calculé en base par webhook_event_mask()).
+        """
+        mask = func.webhook_event_mask(event_names)
+        stmt = select(cls).where(
+            cls.merchant_id == merchant_id,
+            cls.status == WebhookStatus.active,
+            cls.events_bitset.op("&")(mask) != 0,
+        )
+        return db.scalars(stmt).all()
+
 # ========================================================
-# 3. DDL pour trigger `updated_at`
+# 4. DDL pour trigger `updated_at`
 # ========================================================
 ddl_update_ts = DDL("""                              # DDL pour mise à jour du timestamp
 CREATE OR REPLACE FUNCTION update_webhook_timestamp()
@@ -171,7 +234,7 @@ FOR EACH ROW EXECUTE FUNCTION update_webhook_timestamp();
 """)
 
 # ========================================================
-# 4. DDL pour procédure `verify_webhook`
+# 5. DDL pour procédure `verify_webhook`
 # ========================================================
 ddl_verify_proc = DDL("""                           # DDL pour procédure de vérification
 CREATE OR REPLACE PROCEDURE verify_webhook(p_webhook_id UUID)
@@ -186,7 +249,60 @@ $$;
 """)
 
 # ========================================================
-# 5. Attachement des DDL après création de la table
+# 6. DDL pour le masque d’événements
 # ========================================================
+ddl_events_bitset = DDL("""
+CREATE OR REPLACE FUNCTION webhook_event_mask(p_events TEXT[])
+RETURNS BIGINT
+LANGUAGE sql STABLE
+AS $$
+    SELECT COALESCE(bit_or(1::BIGINT << id), 0)
+    FROM webhook_event
+    WHERE name = ANY(p_events);
+$$;
+
+CREATE OR REPLACE FUNCTION set_webhook_events_bitset()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_unknown TEXT[];
+BEGIN
+    SELECT array_agg(e) INTO v_unknown
+    FROM unnest(NEW.events) AS e
+    WHERE NOT EXISTS (SELECT 1 FROM webhook_event w WHERE w.name = e);
+    IF v_unknown IS NOT NULL THEN
+        RAISE EXCEPTION 'Unknown webhook event(s): %%', v_unknown
+            USING ERRCODE = 'check_violation';  -- refus explicite plutôt qu’un bit manquant
+    END IF;
+    NEW.events_bitset := webhook_event_mask(NEW.events);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_webhook_events_bitset
+BEFORE INSERT OR UPDATE OF events ON webhook
+FOR EACH ROW EXECUTE FUNCTION set_webhook_events_bitset();
+
+CREATE OR REPLACE FUNCTION refresh_webhook_events_bitset()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE webhook
+    SET events_bitset = webhook_event_mask(events)
+    WHERE events_bitset IS DISTINCT FROM webhook_event_mask(events);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_webhook_event_changed
+AFTER INSERT OR UPDATE OR DELETE ON webhook_event
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_webhook_events_bitset();
+""")  # events reste la source : nom inconnu refusé, masques recalculés quand le dictionnaire change
+
+# ========================================================
+# 7. Attachement des DDL après création de la table
+# ========================================================
+# webhook_event_mask() lit webhook_event : table créée avant webhook
+Webhook.__table__.add_is_dependent_on(webhook_event)
+
 event.listen(Webhook.__table__, 'after_create', ddl_update_ts)     # attache ddl_update_ts
 event.listen(Webhook.__table__, 'after_create', ddl_verify_proc)  # attache ddl_verify_proc
+event.listen(Webhook.__table__, 'after_create', ddl_events_bitset)  # attache ddl_events_bitset
@@ -5,6 +5,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.database import Base
+from app.utils.ids import uuid7
 
 # ========================================================
 # 1. Modèle SQLAlchemy pour la table "webhook_log"
@@ -18,9 +19,15 @@ class WebhookLog(Base):
         # Plage raisonnable de tentatives max
         CheckConstraint("retry_max BETWEEN 0 AND 10", name="chk_webhook_log_retry_max"),
         # Indexes pour les requêtes fréquentes
-        Index("idx_webhook_log_webhook_id", "webhook_id"),
+        # Dernières livraisons par webhook (tableau de bord) en parcours d'index seul ;
+        # sert aussi les recherches par webhook_id (préfixe de l'index)
+        Index("idx_webhook_log_webhook_recent", "webhook_id", text("created_at DESC"),
+              postgresql_include=["success", "response_code", "delivery_time_ms"]),
         Index("idx_webhook_log_created_at", "created_at"),
-        Index("idx_webhook_log_success", "success"),
+        # Relances en attente seulement : un booléen seul ne filtre rien, et les succès
+        # sont lus par plage de created_at
+        Index("idx_webhook_log_failed", "webhook_id", "next_retry_at",
+              postgresql_where=text("success = FALSE AND next_retry_at IS NOT NULL")),
         Index("idx_webhook_log_event_type", "event_type"),
         Index("idx_webhook_log_next_retry", "next_retry_at"),
         Index("idx_webhook_log_retry_attempt", "retry_attempt"),
@@ -29,6 +36,7 @@ class WebhookLog(Base):
     id = Column(
         UUID(as_uuid=True),
         nullable=False,
+        default=uuid7,  # croissant dans le temps : insertions en fin d'index de clé primaire
         server_default=text("gen_random_uuid()")
     )
     webhook_id = Column(
@@ -43,7 +51,7 @@ class WebhookLog(Base):
     payload = Column(
         JSONB,
         nullable=False
-    )
+    )  # compressé en LZ4 dans TOAST (voir ddl_payload_compression)
     response_code = Column(
         Integer,
         nullable=True
@@ -139,9 +147,92 @@ END;
 $$ LANGUAGE plpgsql;
 """)
 
+# Compression LZ4 du payload (PostgreSQL >= 14, serveur compilé --with-lz4) :
+# décompression bien plus rapide que pglz pour les relances qui relisent les gros payloads.
+# Sur une partition, SET COMPRESSION se propage aux partitions existantes et futures.
+# Le reste de la base peut suivre via postgresql.conf : default_toast_compression = 'lz4'
+ddl_payload_compression = DDL("""
+ALTER TABLE webhook_log ALTER COLUMN payload SET COMPRESSION lz4;
+""")
+
+# ========================================================
+# 3. File des relances : vue matérialisée + notification
+# ========================================================
+# Une ligne par webhook en attente de relance : le dispatcher lit cette vue
+# au lieu de ré-agréger la table partitionnée à chaque tick.
+ddl_retry_queue = DDL("""
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_webhook_retry_queue AS
+    SELECT webhook_id,
+           min(next_retry_at) AS next_retry_at,
+           min(retry_attempt) AS retry_attempt
+    FROM webhook_log
+    WHERE success = FALSE AND next_retry_at IS NOT NULL
+    GROUP BY webhook_id;
+
+-- Index unique requis par REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_webhook_retry_queue_webhook
+    ON mv_webhook_retry_queue (webhook_id);
+
+-- Notifie seulement si l'instruction touche des lignes de la file (échec avec next_retry_at) :
+-- les succès et les écritures étrangères à la relance ne provoquent aucun REFRESH.
+-- Tables de transition : interdites sur un trigger multi-événements, d'où un trigger par événement.
+CREATE OR REPLACE FUNCTION notify_webhook_retry_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NOT EXISTS (SELECT 1 FROM new_rows
+                       WHERE success = FALSE AND next_retry_at IS NOT NULL) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM old_rows
+                       WHERE success = FALSE AND next_retry_at IS NOT NULL) THEN
+            RETURN NULL;
+        END IF;
+    ELSE
+        -- UPDATE : différence symétrique des lignes de la file avant / après
+        IF NOT EXISTS (
+            (SELECT webhook_id, next_retry_at, retry_attempt FROM new_rows
+             WHERE success = FALSE AND next_retry_at IS NOT NULL
+             EXCEPT ALL
+             SELECT webhook_id, next_retry_at, retry_attempt FROM old_rows
+             WHERE success = FALSE AND next_retry_at IS NOT NULL)
+            UNION ALL
+            (SELECT webhook_id, next_retry_at, retry_attempt FROM old_rows
+             WHERE success = FALSE AND next_retry_at IS NOT NULL
+             EXCEPT ALL
+             SELECT webhook_id, next_retry_at, retry_attempt FROM new_rows
+             WHERE success = FALSE AND next_retry_at IS NOT NULL)
+        ) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    PERFORM pg_notify('webhook_retry_queue_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_notify_webhook_retry_queue_ins
+AFTER INSERT ON webhook_log
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_webhook_retry_queue();
+
+CREATE TRIGGER trg_notify_webhook_retry_queue_upd
+AFTER UPDATE ON webhook_log
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_webhook_retry_queue();
+
+CREATE TRIGGER trg_notify_webhook_retry_queue_del
+AFTER DELETE ON webhook_log
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_webhook_retry_queue();
+""")  # notification seulement si la file change ; le rafraîchissement est fait par app/services/webhook_retry_queue.py
+
 # ========================================================
-# 3. Attachement des DDLs après création de la table
+# 4. Attachement des DDLs après création de la table
 # ========================================================
 event.listen(WebhookLog.__table__, 'after_create', ddl_partition_by)
+event.listen(WebhookLog.__table__, 'after_create', ddl_payload_compression)
 event.listen(WebhookLog.__table__, 'after_create', ddl_partitions)
 event.listen(WebhookLog.__table__, 'after_create', ddl_ensure_partition_fn)
+event.listen(WebhookLog.__table__, 'after_create', ddl_retry_queue)
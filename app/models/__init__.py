@@ -1,32 +1,58 @@
 # app/models/__init__.py
 
+import importlib
+
 # On importe la base déclarative depuis le fichier database.py
 from app.database import Base
 
-# On importe tous les modèles pour qu'Alembic puisse les détecter
-from .ApiKey import ApiKey
-from .BankAccount import BankAccount
-from .BatchProcessing import BatchProcessing
-from .Card import Card
-from .Document import Document
-from .EncryptionKey import EncryptionKey
-from .ExchangeRate import ExchangeRate
-from .FailedTransaction import FailedTransaction
-from .Merchant import Merchant
-from .Notification import Notification
-from .SearchIndex import SearchIndex
-from .SecurityLog import SecurityLog
-from .Subscription import Subscription
-from .Transaction import Transaction
-from .TransactionErrorCode import TransactionErrorCode
-from .User import User
-from .Wallet import Wallet
-from .WalletAuditLog import WalletAuditLog
-from .Webhook import Webhook
-from .WebhookLog import WebhookLog
+# Registre des modèles : nom de la classe -> module qui la définit.
+# Les modules ne sont plus importés d'office : chacun est chargé à la première
+# utilisation (PEP 562), ce qui évite d'importer les 20 modèles au démarrage
+# quand seul User est nécessaire.
+_MODELS = {
+    "ApiKey": ".ApiKey",
+    "BankAccount": ".BankAccount",
+    "BatchProcessing": ".BatchProcessing",
+    "Card": ".Card",
+    "Document": ".Document",
+    "EncryptionKey": ".EncryptionKey",
+    "ExchangeRate": ".ExchangeRate",
+    "FailedTransaction": ".FailedTransaction",
+    "Merchant": ".Merchant",
+    "Notification": ".Notification",
+    "SecurityLog": ".SecurityLog",
+    "Subscription": ".Subscription",
+    "Transaction": ".Transaction",
+    "TransactionErrorCode": ".TransactionErrorCode",
+    "User": ".User",
+    "Wallet": ".Wallet",
+    "WalletAuditLog": ".WalletAuditLog",
+    "Webhook": ".Webhook",
+    "WebhookLog": ".WebhookLog",
+}
+
+__all__ = ["Base", "load_all_models", *_MODELS]
+
+
+def __getattr__(name):
+    """
+    Import paresseux : `from app.models import Wallet` charge uniquement Wallet.py.
+    """
+    if name in _MODELS:
+        module = importlib.import_module(_MODELS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def load_all_models():
+    """
+    Importe tous les modèles pour qu'ils soient enregistrés dans Base.metadata.
+    À appeler avant create_all() et dans Alembic (autogenerate doit voir toutes les tables).
+    """
+    for module in _MODELS.values():
+        importlib.import_module(module, __name__)
+    return Base.metadata
 
 
 # Ajoute ici d'autres modèles au fur et à mesure (Wallet, Transaction, etc.)
-# from .wallet import Wallet
-# from .card import Card
-# etc.
+# en les déclarant dans _MODELS.
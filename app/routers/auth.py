@@ -1,6 +1,9 @@
 # app/routers/auth.py
 
 from fastapi import APIRouter, Depends, HTTPException, status   # Outils FastAPI pour la gestion des endpoints et des exceptions HTTP
+from sqlalchemy import func, select, text                    # lower() : même expression que idx_user_email_lower
+from sqlalchemy.exc import IntegrityError                    # Violation d'index unique (email/téléphone déjà pris)
+from sqlalchemy.ext.asyncio import AsyncSession             # Session asynchrone (connexion)
 from sqlalchemy.orm import Session                           # Pour interagir avec la base de données
 import os
 
@@ -8,13 +11,13 @@ import os
 from app.schemas.auth import LoginRequest, Token
 from app.schemas.user import UserCreate, UserOut
 # Importation du modèle User (défini en SQLAlchemy)
-from app.models.User import User
-# Importation de la session de base de données
-from app.database import SessionLocal
+from app.models.User import User, unique_violation_detail
+# Importation de la dépendance partagée fournissant la session de base de données
+from app.dependencies import get_db, get_async_db
 
 # Importation des fonctions des modules services et utils
 from app.services.auth_service import create_access_token, authenticate_user
-from app.utils.security import get_password_hash
+from app.utils.security import aget_password_hash, get_password_hash, needs_rehash
 
 # Création du routeur pour gérer l'authentification
 router = APIRouter(
@@ -22,37 +25,15 @@ router = APIRouter(
     tags=["auth"]  # Tag utilisé dans la documentation Swagger pour regrouper ces endpoints
 )
 
-def get_db():
-    """
-    Dépendance FastAPI pour fournir une session de base de données à chaque endpoint.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/register", response_model=UserOut)
 def register(user_in: UserCreate, db: Session = Depends(get_db)):
     """
     Endpoint d'inscription (register) :
-    - Vérifie que l'email et le téléphone n'existent pas déjà.
     - Hash le mot de passe avec get_password_hash().
     - Crée et sauvegarde l'utilisateur dans la base de données.
+    - L'unicité de l'email et du téléphone est garantie par les index uniques :
+      un doublon est détecté à l'INSERT (un seul aller-retour, sans fenêtre de course).
     """
-    # Vérification de l'unicité de l'email
-    if db.query(User).filter(User.email == user_in.email).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    # Vérification de l'unicité du téléphone
-    if db.query(User).filter(User.phone == user_in.phone).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Phone already registered"
-        )
-    
     # Hashage sécurisé du mot de passe
     hashed_password = get_password_hash(user_in.password)
     
@@ -67,24 +48,45 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
         password_hash=hashed_password,
         type=user_in.type
     )
+    # COMMIT sans attente du flush WAL, pour cette transaction uniquement : un crash serveur
+    # peut perdre une inscription des dernières centaines de ms (jamais la corrompre) ;
+    # les écritures financières gardent synchronous_commit = on.
+    db.execute(text("SET LOCAL synchronous_commit = OFF"))
     db.add(new_user)
+    try:
+        db.flush()  # INSERT ... RETURNING : valeurs générées par le serveur lues au passage (eager_defaults)
+    except IntegrityError as exc:
+        db.rollback()
+        detail = unique_violation_detail(exc)
+        if detail is None:
+            raise
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    # Réponse construite avant le COMMIT, qui expire l'objet (sinon un SELECT de rechargement)
+    user_out = UserOut.model_validate(new_user)
     db.commit()
-    db.refresh(new_user)
-    return new_user
+    return user_out
 
 @router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint de connexion (login) :
     - Récupère l'utilisateur par email.
-    - Vérifie que le mot de passe fourni est correct.
+    - Vérifie que le mot de passe fourni est correct (dans le pool dédié aux hashs).
     - Génère et renvoie un token JWT si l'authentification est réussie.
+    Déclaré en async : une rafale de connexions n'occupe ni le threadpool de FastAPI
+    ni la boucle d'événements pendant les vérifications argon2id/bcrypt.
     """
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not authenticate_user(user, login_data.password):
+    user = await db.scalar(
+        select(User).where(func.lower(User.email) == login_data.email.lower(), User.deleted_at.is_(None))
+    )
+    if not user or not await authenticate_user(user, login_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
+    # Migration progressive : un ancien hash (bcrypt) est remplacé par argon2id, une seule fois par compte
+    if needs_rehash(user.password_hash):
+        user.password_hash = await aget_password_hash(login_data.password)
+        await db.commit()
     access_token = create_access_token(data={"sub": str(user.id), "email": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
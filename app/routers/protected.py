@@ -10,9 +10,10 @@ router = APIRouter(
 )
 
 @router.get("/profile", response_model=UserOut)
-def read_user_profile(current_user = Depends(get_current_user)):
+async def read_user_profile(current_user = Depends(get_current_user)):
     """
     Cet endpoint protégé retourne le profil de l'utilisateur actuellement connecté.
     Le token JWT doit être fourni dans l'en-tête Authorization sous la forme "Bearer <token>".
+    Déclaré en async : aucune E/S bloquante, donc pas de passage par le threadpool.
     """
     return current_user
@@ -1,16 +1,38 @@
 # app/routers/user.py
 
-import hashlib  # Pour le hashage du mot de passe
 import uuid     # Pour manipuler l'identifiant utilisateur (UUID)
 from datetime import datetime  # Pour gérer les timestamps (date et heure)
-from typing import List      # Pour annoter des listes (ex: liste d'utilisateurs)
+from typing import List, Optional  # Pour annoter des listes (ex: liste d'utilisateurs) et paramètres optionnels
 
-from fastapi import APIRouter, Depends, HTTPException, status  # Importation des outils FastAPI pour définir les endpoints et gérer les erreurs
-from sqlalchemy.orm import Session  # Pour interagir avec la base de données via SQLAlchemy
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status  # Importation des outils FastAPI pour définir les endpoints et gérer les erreurs
+from pydantic import TypeAdapter  # Validateur/sérialiseur construit une seule fois
+from sqlalchemy import exists, select, update  # Requête projetée de la liste, UPDATE ... RETURNING, EXISTS
+from sqlalchemy.exc import IntegrityError  # Violation d'index unique (email/téléphone déjà pris)
+from sqlalchemy.ext.asyncio import AsyncSession  # Session asynchrone : la boucle d'événements reste libre pendant les E/S
 
-from app.models.User import User  # Importation du modèle User (défini en SQLAlchemy)
+from app.models.User import User, UserStatus, AccountStatus, unique_violation_detail  # Modèle User et messages des index uniques
 from app.schemas.user import UserCreate, UserUpdate, UserOut  # Importation des schémas Pydantic pour la validation et la transformation des données
-from app.database import SessionLocal  # Importation de la session de base de données configurée
+from app.dependencies import get_async_db  # Dépendance fournissant une session asynchrone (asyncpg, une par requête)
+from app.utils.security import aget_password_hash  # Hash argon2id (pool dédié), le même que /register
+
+# Colonnes de "user" exposées par UserOut : la liste ne charge que celles-ci (pas de password_hash, search_text…).
+# Seuls les champs qui existent dans la table sont projetés : un champ du schéma sans colonne
+# ne doit pas empêcher l'import du module (il est signalé par la validation de la réponse).
+USER_OUT_COLUMNS = tuple(getattr(User, name) for name in UserOut.model_fields if name in User.__table__.c)
+
+# Sérialiseurs des réponses de lecture, construits une fois à l'import : le handler renvoie directement
+# le JSON produit par pydantic-core en une passe (une Response est renvoyée telle quelle par FastAPI,
+# sans revalidation ni jsonable_encoder ; response_model reste déclaré pour la documentation OpenAPI)
+_USERS_ADAPTER = TypeAdapter(List[UserOut])
+_USER_ADAPTER = TypeAdapter(UserOut)
+
+
+def _json_response(adapter: TypeAdapter, data) -> Response:
+    """
+    Valide `data` (objets ou lignes, lus par attribut) avec `adapter` et renvoie la réponse JSON.
+    """
+    body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return Response(content=body, media_type="application/json")
 
 # Création d'un routeur dédié aux opérations sur les utilisateurs.
 router = APIRouter(
@@ -18,57 +40,50 @@ router = APIRouter(
     tags=["users"]     # Tag utilisé pour grouper dans la documentation
 )
 
-def get_db():
-    """
-    Fonction de dépendance pour fournir une session de base de données à chaque endpoint.
-    Cette fonction crée une session, la renvoie et s'assure qu'elle est fermée après utilisation.
-    """
-    db = SessionLocal()  # Création d'une session de base de données
-    try:
-        yield db  # Fourniture de la session pour l'endpoint qui en a besoin
-    finally:
-        db.close()  # Fermeture de la session après utilisation pour éviter les fuites de connexion
-
 @router.get("/", response_model=List[UserOut])
-def get_users(db: Session = Depends(get_db)):
+async def get_users(
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[uuid.UUID] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Endpoint GET pour récupérer la liste de tous les utilisateurs.
-    La réponse est formatée selon le schéma UserOut.
+    Endpoint GET pour récupérer la liste des utilisateurs, page par page (au plus `limit`).
+    Pagination par curseur (keyset) : `after` est l'id du dernier utilisateur de la page précédente ;
+    la page suivante est un parcours de l'index de clé primaire à partir de ce point, sans OFFSET.
+    Les id étant des UUIDv7, l'ordre des pages suit l'ordre de création des comptes.
+    Seules les colonnes de UserOut sont lues, en tuples : aucun objet User n'est hydraté
+    ni suivi par la session. La réponse est formatée selon le schéma UserOut.
     """
-    users = db.query(User).all()  # Récupère la liste de tous les utilisateurs de la base de données
-    return users  # Retourne la liste des utilisateurs (convertie automatiquement par FastAPI)
+    stmt = select(*USER_OUT_COLUMNS).order_by(User.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(User.id > after)
+    users = (await db.execute(stmt)).all()  # Lignes projetées (accès par attribut)
+    return _json_response(_USERS_ADAPTER, users)  # Retourne la liste des utilisateurs, sérialisée en une passe
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_user(user_id: uuid.UUID, db: Session = Depends(get_db)):
+async def get_user(user_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint GET pour récupérer un utilisateur par son identifiant.
     Si l'utilisateur n'est pas trouvé, une exception HTTP 404 est renvoyée.
     """
-    user = db.query(User).filter(User.id == user_id).first()  # Recherche de l'utilisateur dans la base de données par son UUID
+    user = await db.get(User, user_id)  # Chargement par clé primaire (identity map de la session d'abord)
     if not user:
         # Si aucun utilisateur n'est trouvé, renvoie une erreur 404
         raise HTTPException(status_code=404, detail="User not found")
-    return user  # Retourne l'utilisateur trouvé
+    return _json_response(_USER_ADAPTER, user)  # Retourne l'utilisateur trouvé
 
 @router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def create_user(user_in: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint POST pour créer un nouvel utilisateur.
-    - Vérifie que l'email et le numéro de téléphone ne sont pas déjà utilisés.
-    - Hash le mot de passe fourni (ici avec SHA-256; en production, privilégiez bcrypt ou argon2).
+    - L'unicité de l'email et du téléphone est garantie par les index uniques (doublon détecté à l'INSERT).
+    - Hash le mot de passe fourni avec aget_password_hash() (argon2id, comme /register).
     - Crée et stocke le nouvel utilisateur dans la base de données.
     La réponse est formatée selon le schéma UserOut.
     """
-    # Vérification de l'unicité de l'email
-    if db.query(User).filter(User.email == user_in.email).first():
-        raise HTTPException(status_code=400, detail="Email already registered")
-    # Vérification de l'unicité du numéro de téléphone
-    if db.query(User).filter(User.phone == user_in.phone).first():
-        raise HTTPException(status_code=400, detail="Phone already registered")
-    
-    # Hashage du mot de passe utilisant SHA-256.
-    # En production, il est recommandé d'utiliser une solution de hashage plus sécurisée.
-    password_hash = hashlib.sha256(user_in.password.encode("utf-8")).hexdigest()
+    # Hashage du mot de passe (argon2id) : l'utilisateur créé ici peut se connecter via /login.
+    # Calcul de plusieurs dizaines de ms : exécuté dans le pool dédié pour ne pas bloquer la boucle.
+    password_hash = await aget_password_hash(user_in.password)
 
     # Création de l'instance de l'utilisateur avec les informations fournies.
     # Notez que les champs sensibles (first_name, last_name, birth_date, birth_place, type) sont définis lors de la création.
@@ -83,66 +98,83 @@ def create_user(user_in: UserCreate, db: Session = Depends(get_db)):
         type=user_in.type                      # Affecte le type de compte
     )
     db.add(user)         # Ajoute l'instance utilisateur à la session en cours
-    db.commit()          # Valide l'insertion dans la base de données
-    db.refresh(user)     # Recharge l'objet utilisateur pour récupérer les valeurs générées (ex: id, timestamps)
+    # INSERT ... RETURNING (eager_defaults sur User) : id, horodatages et valeurs par défaut
+    # sont renseignés sans SELECT de rechargement ; expire_on_commit=False les conserve après le COMMIT
+    try:
+        await db.commit()  # Valide l'insertion dans la base de données
+    except IntegrityError as exc:
+        await db.rollback()
+        # Index unique violé : message correspondant (email ou téléphone), sinon erreur d'origine
+        detail = unique_violation_detail(exc)
+        if detail is None:
+            raise
+        raise HTTPException(status_code=400, detail=detail)
     return user          # Retourne l'utilisateur créé, formaté selon UserOut
 
 @router.put("/{user_id}", response_model=UserOut)
-def update_user(user_id: uuid.UUID, user_update: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(user_id: uuid.UUID, user_update: UserUpdate, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint PUT pour mettre à jour un utilisateur existant.
     Seuls les champs modifiables (par exemple, email, téléphone, langue, etc.) peuvent être mis à jour.
     Les champs sensibles (prénom, nom, date/lieu de naissance, mot de passe, type) ne sont pas inclus pour des raisons de sécurité.
+    Une seule instruction UPDATE ... RETURNING : ni SELECT préalable ni rechargement.
     """
-    # Recherche de l'utilisateur à mettre à jour
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        # Retourne une erreur 404 si l'utilisateur n'existe pas
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Extrait les données de la requête qui ont été effectivement fournies
-    update_data = user_update.dict(exclude_unset=True)
+    update_data = user_update.model_dump(exclude_unset=True)
     if "password" in update_data:
         # Le cas du mot de passe est à gérer avec une méthode dédiée : ici, on hash le nouveau mot de passe
-        update_data["password_hash"] = hashlib.sha256(
-            update_data.pop("password").encode("utf-8")
-        ).hexdigest()
-    
-    # Mise à jour des attributs de l'utilisateur avec les champs fournis dans la requête
-    for field, value in update_data.items():
-        setattr(user, field, value)
-    
-    db.commit()  # Confirme la mise à jour dans la base de données
-    db.refresh(user)  # Recharge l'objet mis à jour
+        update_data["password_hash"] = await aget_password_hash(update_data.pop("password"))
+
+    if update_data:
+        # Mise à jour des champs fournis et relecture de la ligne (updated_at posé par le trigger) en un aller-retour
+        stmt = update(User).where(User.id == user_id).values(**update_data).returning(User)
+        try:
+            user = await db.scalar(stmt)
+            await db.commit()  # Confirme la mise à jour dans la base de données
+        except IntegrityError as exc:
+            await db.rollback()
+            # Nouvel email ou téléphone déjà pris par un autre compte
+            detail = unique_violation_detail(exc)
+            if detail is None:
+                raise
+            raise HTTPException(status_code=400, detail=detail)
+    else:
+        user = await db.get(User, user_id)  # Rien à modifier : simple lecture
+    if not user:
+        # Retourne une erreur 404 si l'utilisateur n'existe pas
+        raise HTTPException(status_code=404, detail="User not found")
     return user  # Retourne l'utilisateur mis à jour, formaté selon UserOut
 
 
 
 @router.patch("/{user_id}/deactivate", response_model=UserOut)
-def deactivate_user(user_id: uuid.UUID, db: Session = Depends(get_db)):
+async def deactivate_user(user_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint PATCH pour désactiver (clôturer) un compte utilisateur.
     Dans une application bancaire, on ne supprime jamais un utilisateur, mais on clôture son compte.
     Cette opération modifie le statut du compte en "closed" et le status de sécurité en "blocked".
     """
-    # Recherche de l'utilisateur dans la base de données par son identifiant (UUID)
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        # Si aucun utilisateur n'est trouvé, on renvoie une erreur 404
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Vérifie si le compte est déjà clôturé; si oui, on renvoie une erreur 400 pour éviter une redondance
-    if user.status == "closed":
+    # Clôture conditionnelle en une instruction : seule une ligne pas encore clôturée est modifiée,
+    # puis relue par RETURNING (statuts et updated_at à jour)
+    stmt = (
+        update(User)
+        .where(User.id == user_id, User.status != UserStatus.closed)
+        .values(
+            status=UserStatus.closed,             # Modifie le statut général du compte à "closed"
+            account_status=AccountStatus.blocked  # Change également le statut de sécurité à "blocked" pour empêcher toute utilisation
+        )
+        .returning(User)
+    )
+    user = await db.scalar(stmt)
+    if user is None:
+        # Aucune ligne modifiée : utilisateur inexistant (404) ou compte déjà clôturé (400) ;
+        # SELECT EXISTS (un booléen) plutôt que le chargement d'une ligne User complète
+        if not await db.scalar(select(exists().where(User.id == user_id))):
+            raise HTTPException(status_code=404, detail="User not found")
         raise HTTPException(status_code=400, detail="User account is already closed")
-    
-    # Met à jour le statut de l'utilisateur pour indiquer que le compte est clôturé
-    user.status = "closed"            # Modifie le statut général du compte à "closed"
-    user.account_status = "blocked"     # Change également le statut de sécurité à "blocked" pour empêcher toute utilisation
 
     # Valide les modifications dans la base de données
-    db.commit()
-    # Recharge l'objet utilisateur pour avoir les dernières valeurs mises à jour (notamment, les timestamps éventuels)
-    db.refresh(user)
-    
+    await db.commit()
+
     # Retourne l'utilisateur mis à jour, formaté selon le schéma UserOut
     return user
@@ -1,13 +1,38 @@
 # app/schemas/user.py
 
 # Importation de BaseModel et ConfigDict depuis Pydantic (nouvelle syntaxe pour la configuration en v2)
-from pydantic import BaseModel, EmailStr, constr, ConfigDict
+from pydantic import BaseModel, EmailStr, constr, ConfigDict, StringConstraints, field_validator
 # Importation des types date et datetime pour gérer les dates et timestamps
 from datetime import date, datetime
 # Importation d'Optional pour les champs optionnels dans le schéma de mise à jour
-from typing import Optional
+from typing import Annotated, Optional
 # Importation du type UUID pour les identifiants uniques
 from uuid import UUID
+# Énumérations des colonnes ENUM PostgreSQL de "user" : validées dans le cœur Rust de Pydantic
+from app.models.User import UserType, UserStatus, AccountStatus, Language
+
+# Séparateurs de saisie retirés du téléphone (forme canonique E.164 : "+33612345678")
+_PHONE_SEPARATORS = str.maketrans("", "", " .-()/\t")
+
+
+def normalize_phone(phone):
+    """
+    Forme canonique d'un numéro saisi : "+33 6 12-34.56.78" -> "+33612345678".
+    Le "+" initial est ajouté s'il manque ("33612345678" ou "0033612345678" -> "+33612345678") :
+    une seule écriture par numéro, l'index unique idx_user_phone compare alors des valeurs égales.
+    Appliquée avant la validation du type (les valeurs non textuelles sont laissées à Pydantic).
+    """
+    if not isinstance(phone, str):
+        return phone
+    phone = phone.translate(_PHONE_SEPARATORS)
+    if phone.startswith("+"):
+        return phone
+    return "+" + (phone[2:] if phone.startswith("00") else phone)  # préfixe international 00 -> +
+
+
+# Numéro canonique (E.164 : indicatif pays sans 0 initial, 8 à 15 chiffres) ; motif compilé par le cœur Rust
+# de Pydantic, une saisie invalide est rejetée (422) sans aller-retour à la base
+PhoneNumber = Annotated[str, StringConstraints(pattern=r"^\+[1-9]\d{7,14}$")]
 
 # ---------------------------------------------------------------------------
 # Schéma de base utilisé lors de la création de l'utilisateur (champs immuables en production)
@@ -19,19 +44,16 @@ class UserBase(BaseModel):
     birth_place: str        # Lieu de naissance (obligatoire et immuable)
     email: EmailStr         # Email de l'utilisateur (obligatoire)
     phone: str              # Numéro de téléphone (obligatoire)
-    type: str               # Type de compte (ex: "client", "merchant", "admin") (obligatoire et immuable)
-
-    # Nouvelle configuration Pydantic v2 pour autoriser la lecture par attributs des objets ORM
-    model_config = ConfigDict(from_attributes=True)
+    type: UserType          # Type de compte ("client", "merchant", "admin") (obligatoire et immuable)
 
 # ---------------------------------------------------------------------------
 # Schéma utilisé lors de la création d'un utilisateur
 # ---------------------------------------------------------------------------
 class UserCreate(UserBase):
+    phone: PhoneNumber              # Numéro de téléphone, contrôlé sous forme canonique
     password: constr(min_length=6)  # Mot de passe en clair à fournir lors de la création (sera hashé côté serveur)
 
-    # Hérite également de la configuration pour la conversion à partir d'objets ORM
-    model_config = ConfigDict(from_attributes=True)
+    canonical_phone = field_validator("phone", mode="before")(normalize_phone)  # téléphone stocké sous forme canonique
 
 # ---------------------------------------------------------------------------
 # Schéma pour la mise à jour d'un utilisateur en contexte bancaire
@@ -39,26 +61,27 @@ class UserCreate(UserBase):
 # ---------------------------------------------------------------------------
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None         # Email modifiable (optionnel)
-    phone: Optional[str] = None              # Téléphone modifiable (optionnel)
-    language: Optional[str] = None           # Langue préférée modifiable (optionnel)
+    phone: Optional[PhoneNumber] = None      # Téléphone modifiable (optionnel)
+    language: Optional[Language] = None      # Langue préférée modifiable (optionnel)
     gdpr_consent: Optional[bool] = None      # Statut de consentement RGPD, modifiable (optionnel)
     mfa_enabled: Optional[bool] = None       # Activation ou désactivation de l'authentification multi-facteurs (optionnel)
 
-    # Configuration pour Pydantic v2
-    model_config = ConfigDict(from_attributes=True)
+    canonical_phone = field_validator("phone", mode="before")(normalize_phone)  # même forme canonique qu'à la création
+
+    # Pas de from_attributes : ce schéma ne valide que le JSON entrant, jamais un objet ORM
 
 # ---------------------------------------------------------------------------
 # Schéma pour la réponse qui restitue toutes les informations de l'utilisateur
 # ---------------------------------------------------------------------------
 class UserOut(UserBase):
     id: UUID                             # Identifiant unique de l'utilisateur
-    status: str                          # Statut du compte (ex: "active", "inactive", etc.)
-    account_status: str                  # Statut de sécurité du compte (ex: "active", "blocked", etc.)
+    status: UserStatus                   # Statut du compte (ex: "active", "inactive", etc.)
+    account_status: AccountStatus        # Statut de sécurité du compte (ex: "active", "blocked", etc.)
     failed_login_attempts: int           # Nombre de tentatives de connexion échouées
     last_login_at: Optional[datetime] = None  # Date/heure de la dernière connexion (optionnel)
     created_at: datetime                 # Date/heure de création du compte
     updated_at: datetime                 # Date/heure de la dernière mise à jour
-    language: str                        # Langue préférée de l'utilisateur
+    language: Language                   # Langue préférée de l'utilisateur
     gdpr_consent: bool                   # Indique si le consentement RGPD a été donné
     mfa_enabled: bool                    # Indique si l’authentification multi-facteurs est activée
     last_password_change_at: Optional[datetime] = None  # Date/heure du dernier changement de mot de passe (optionnel)
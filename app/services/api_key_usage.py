@@ -0,0 +1,110 @@
+# app/services/api_key_usage.py
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Intervalle entre deux écritures groupées (en secondes)
+FLUSH_INTERVAL = 0.5
+
+# Usages en attente d'écriture : api_key.id -> [nombre d'utilisations, dernier horodatage, dernière IP]
+# Plusieurs utilisations d'une même clé pendant la fenêtre sont fusionnées en une seule ligne.
+_pending: dict = {}
+_flush_task: Optional[asyncio.Task] = None
+
+# Une seule instruction, quelle que soit la taille du lot : quatre tableaux dépliés par unnest()
+# (4 paramètres fixes au lieu de 4 par clé ; la requête préparée est réutilisée d'un flush à l'autre)
+_FLUSH = text("""
+    UPDATE api_key
+    SET usage_count  = api_key.usage_count + c.delta,
+        last_used_at = GREATEST(api_key.last_used_at, c.ts),
+        last_ip_used = COALESCE(c.ip, api_key.last_ip_used)
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:deltas AS bigint[]),
+                CAST(:ts AS timestamptz[]), CAST(:ips AS inet[])) AS c(id, delta, ts, ip)
+    WHERE api_key.id = c.id
+""")
+
+
+def record_api_key_usage(api_key_id: uuid.UUID, ip: Optional[str] = None) -> None:
+    """
+    Enregistre une utilisation de clé API en mémoire (aucune E/S).
+    L'UPDATE de usage_count / last_used_at / last_ip_used est différé et groupé par flush_api_key_usage().
+    """
+    now = datetime.now(timezone.utc)
+    entry = _pending.get(api_key_id)
+    if entry is None:
+        _pending[api_key_id] = [1, now, ip]
+    else:
+        entry[0] += 1
+        entry[1] = now
+        if ip is not None:
+            entry[2] = ip  # seule la dernière IP par clé est conservée
+
+
+async def flush_api_key_usage() -> int:
+    """
+    Écrit en une seule requête toutes les utilisations accumulées depuis le dernier flush.
+    Retourne le nombre de clés mises à jour. En cas d'erreur, le lot (compteurs statistiques)
+    est abandonné et l'erreur journalisée avec sa taille.
+    """
+    global _pending
+    if not _pending:
+        return 0
+    batch, _pending = _pending, {}
+
+    params = {"ids": [], "deltas": [], "ts": [], "ips": []}
+    for key_id, (delta, ts, ip) in batch.items():
+        params["ids"].append(key_id)
+        params["deltas"].append(delta)
+        params["ts"].append(ts)
+        params["ips"].append(ip)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_FLUSH, params)
+            await db.commit()
+    except Exception:
+        logger.exception("API key usage flush failed: %d keys dropped", len(batch))
+        return 0
+    return len(batch)
+
+
+async def _flush_loop() -> None:
+    """
+    Boucle de fond : vide le tampon toutes les FLUSH_INTERVAL secondes.
+    """
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        await flush_api_key_usage()  # n'échoue pas : un lot en erreur est journalisé puis abandonné
+
+
+def start_api_key_usage_flusher() -> None:
+    """
+    Démarre la tâche de fond d'écriture groupée (appelée au démarrage de l'application).
+    """
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_api_key_usage_flusher() -> None:
+    """
+    Arrête la tâche de fond puis écrit les usages restants (appelée à l'arrêt de l'application).
+    """
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_api_key_usage()
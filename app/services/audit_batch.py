@@ -0,0 +1,73 @@
+# app/services/audit_batch.py
+
+import uuid
+from datetime import datetime, timezone
+from typing import List, Mapping, Optional, Sequence
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.WalletAuditLog import WalletAuditLog, audit_entry_hash, truncate_ip
+from app.utils.ids import uuid7
+
+# Nombre de lignes par INSERT multi-VALUES
+AUDIT_BATCH_SIZE = 200
+
+# RETURNING id : seules les lignes réellement écrites sont renvoyées, celles écartées par
+# trg_audit_filter_operation (RETURN NULL) n'en font pas partie ; rowcount n'est pas fiable en executemany
+_INSERT_AUDIT = insert(WalletAuditLog).returning(WalletAuditLog.id)
+
+
+def prepare_audit_rows(rows: Sequence[Mapping], batch_id: uuid.UUID) -> List[dict]:
+    """
+    Calcule en une passe les champs côté client de tout le lot (INSERT en lot : l'événement
+    before_insert de l'ORM, voir _set_client_fields, n'est pas déclenché) :
+    une seule lecture de l'horloge pour les changed_at absents (un lot = un instant),
+    et une seule anonymisation par adresse IP distincte (un lot vient en général d'une même origine).
+    """
+    now = datetime.now(timezone.utc)
+    networks = {}
+    prepared = []
+    for row in rows:
+        full = dict(row)
+        full["audit_batch_id"] = full.get("audit_batch_id") or batch_id
+        if full.get("changed_at") is None:
+            full["changed_at"] = now
+        full["entry_hash"] = audit_entry_hash(full["wallet_id"], full["new_balance"], full["changed_at"])
+        ip = full.get("ip_address")
+        if ip not in networks:
+            networks[ip] = truncate_ip(ip)
+        full["ip_truncated"] = networks[ip]
+        prepared.append(full)
+    return prepared
+
+
+def batch_insert_audit(db: Session, rows: Sequence[Mapping],
+                       audit_batch_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Insère des lignes wallet_audit_log par INSERT multi-VALUES de AUDIT_BATCH_SIZE lignes,
+    toutes rattachées au même audit_batch_id (généré si absent), champs calculés par prepare_audit_rows.
+    synchronous_commit = OFF pour la transaction en cours uniquement : le COMMIT n'attend pas
+    le flush du WAL (un crash peut perdre les dernières centaines de ms, jamais corrompre).
+    Un lot refusé (IntegrityError) est rejoué ligne à ligne ; les lignes invalides sont ignorées.
+    Retourne le nombre de lignes insérées (hors lignes filtrées par audit.enabled_ops).
+    """
+    batch_id = audit_batch_id or uuid7()
+    prepared = prepare_audit_rows(rows, batch_id)
+
+    db.execute(text("SET LOCAL synchronous_commit = OFF"))
+    inserted = 0
+    for start in range(0, len(prepared), AUDIT_BATCH_SIZE):
+        chunk = prepared[start:start + AUDIT_BATCH_SIZE]
+        try:
+            with db.begin_nested():  # SAVEPOINT : un lot en échec n'annule pas les précédents
+                inserted += len(db.execute(_INSERT_AUDIT, chunk).all())
+        except IntegrityError:
+            for row in chunk:
+                try:
+                    with db.begin_nested():
+                        inserted += len(db.execute(_INSERT_AUDIT, [row]).all())
+                except IntegrityError:
+                    pass
+    return inserted
@@ -1,30 +1,47 @@
 # app/services/auth_service.py
 
-from datetime import datetime, timedelta
-from jose import jwt  # Pour encoder et générer le token JWT
-import os             # Pour accéder à la variable d'environnement
+import base64
+import hashlib
+import hmac           # HS256 via hmac/hashlib de la bibliothèque standard, donc OpenSSL (SHA-NI si disponible)
+import json
+import time
+from datetime import timedelta
+from app.config import get_settings  # Paramètres de l'application (lus une seule fois)
 
 # Import du module utilitaire pour la vérification du mot de passe
-from app.utils.security import verify_password
+from app.utils.security import averify_password
 
-# Paramètres pour le JWT
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")  # Clé secrète extraite de l'environnement
-ALGORITHM = "HS256"                                     # Algorithme de chiffrement du token
-ACCESS_TOKEN_EXPIRE_MINUTES = 30                        # Durée de validité du token en minutes
+# Paramètres pour le JWT, lus une seule fois depuis les paramètres de l'application
+_settings = get_settings()
+SECRET_KEY = _settings.secret_key.get_secret_value().encode()  # Clé secrète (octets)
+ALGORITHM = _settings.jwt_algorithm                            # Algorithme de signature du token
+ACCESS_TOKEN_EXPIRE_SECONDS = _settings.access_token_expire_seconds  # Durée de validité du token en secondes
+
+
+def _b64url(raw: bytes) -> bytes:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+
+# En-tête JWT identique pour tous les tokens : encodé une seule fois à l'import.
+# Les tokens restent décodés et vérifiés par PyJWT (app/dependencies.py).
+_JWT_HEADER_SEGMENT = _b64url(json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode())
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """
     Génère et retourne un token d'accès (JWT) avec une date d'expiration.
     """
-    to_encode = data.copy()  # Copie des données à inclure dans le token
-    expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})  # Ajout de la date d'expiration dans la charge utile
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode = data.copy()  # Copie des données à inclure dans le token (valeurs sérialisables en JSON)
+    # "exp" en secondes epoch (NumericDate entier)
+    lifetime = expires_delta.total_seconds() if expires_delta else ACCESS_TOKEN_EXPIRE_SECONDS
+    to_encode["exp"] = int(time.time() + lifetime)  # Ajout de la date d'expiration dans la charge utile
+    # header.payload signés en HMAC-SHA256 (RFC 7515), seule la charge utile est sérialisée à chaque appel
+    signing_input = _JWT_HEADER_SEGMENT + b"." + _b64url(json.dumps(to_encode, separators=(",", ":")).encode())
+    signature = hmac.new(SECRET_KEY, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + _b64url(signature)).decode("ascii")
 
-def authenticate_user(user, plain_password: str) -> bool:
+async def authenticate_user(user, plain_password: str) -> bool:
     """
     Vérifie si l'utilisateur est authentique en comparant le mot de passe fourni 
     avec le mot de passe hashé stocké.
     """
-    return verify_password(plain_password, user.password_hash)
+    return await averify_password(plain_password, user.password_hash)
@@ -0,0 +1,315 @@
+# app/services/bulk_service.py
+
+import enum
+import hashlib
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, Mapping, Sequence
+
+from sqlalchemy import Table, insert, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from app.models.Transaction import Transaction
+from app.utils.ids import uuid7
+from app.utils.lookup import LookupCode
+
+logger = logging.getLogger(__name__)
+
+# Nombre de lignes par instruction INSERT multi-VALUES
+DEFAULT_BATCH_SIZE = 1000
+
+
+def bulk_insert(db: Session, model, rows: Sequence[Mapping], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Insère des lignes par lots de `batch_size` dans une seule transaction.
+    SQLAlchemy 2.0 compile chaque lot en un INSERT ... VALUES (...), (...), ... (insertmanyvalues)
+    au lieu d'un aller-retour par objet ajouté via session.add().
+    Les valeurs par défaut Python des colonnes (ex. id UUIDv7) sont appliquées.
+    """
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(model), list(rows[start:start + batch_size]))
+    return len(rows)
+
+
+def skip_row_triggers(db: Session) -> None:
+    """
+    Désactive, pour la transaction en cours uniquement, les triggers de ligne qui testent
+    current_setting('app.skip_triggers') (ex. set_audit_user_id sur wallet_audit_log).
+    Contrairement à ALTER TABLE ... DISABLE TRIGGER, aucun verrou ACCESS EXCLUSIVE n'est pris,
+    et contrairement à session_replication_role, aucun droit superutilisateur n'est requis.
+    L'appelant fournit alors lui-même les colonnes normalement calculées par ces triggers.
+    """
+    db.execute(text("SET LOCAL app.skip_triggers = 'on'"))
+
+
+def _copy_text_value(value) -> str:
+    """
+    Encode une valeur Python au format texte de COPY (NULL = \\N, tabulations et retours échappés).
+    """
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    elif isinstance(value, enum.Enum):
+        value = value.value  # membre d'une énumération Python
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_rows(db: Session, table_name: str, columns: Sequence[str], rows: Iterable[Sequence],
+              skip_triggers: bool = False, analyze: bool = True) -> int:
+    """
+    Chargement massif via COPY ... FROM STDIN (chemin le plus rapide de PostgreSQL), pour les backfills.
+    - skip_triggers : SET LOCAL session_replication_role = 'replica' pour ne pas déclencher les triggers
+      (réservé aux rechargements de données déjà validées ; nécessite les droits superutilisateur).
+    - analyze : rafraîchit les statistiques du planificateur après le chargement.
+    Les valeurs par défaut Python (ex. id) ne sont pas appliquées : fournir toutes les colonnes utiles.
+    """
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(_copy_text_value(v) for v in row))
+        buffer.write("\n")
+        count += 1
+    buffer.seek(0)
+
+    if skip_triggers:
+        db.execute(text("SET LOCAL session_replication_role = 'replica'"))
+
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{table_name}" ({column_list}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+
+    if skip_triggers:
+        db.execute(text("SET LOCAL session_replication_role = 'origin'"))
+    if analyze:
+        db.execute(text(f'ANALYZE "{table_name}"'))
+    return count
+
+
+@lru_cache(maxsize=None)
+def _attribute_columns(model) -> dict:
+    """
+    Attribut mappé -> colonne de la table (ex. Transaction.transaction_metadata -> colonne "metadata").
+    """
+    return {attr.key: attr.columns[0] for attr in model.__mapper__.column_attrs}
+
+
+def _check_attributes(model, keys) -> dict:
+    """
+    Retourne _attribute_columns(model) ; lève ValueError si une clé n'est pas un attribut mappé
+    (une clé inconnue serait sinon ignorée sans erreur et la colonne laissée à NULL).
+    """
+    columns = _attribute_columns(model)
+    unknown = set(keys) - columns.keys()
+    if unknown:
+        raise ValueError(f"Unknown {model.__name__} attribute(s): {', '.join(sorted(unknown))}")
+    return columns
+
+
+def bulk_insert_transactions(engine: Engine, rows: Sequence[Mapping]) -> int:
+    """
+    Ingestion de transactions hors unité de travail de l'ORM, en une seule transaction.
+    Les lignes sont des dicts indexés par attribut (ex. transaction_metadata), traduits ici
+    en clés de colonnes ; l'engine les regroupe en INSERT multi-VALUES de insertmanyvalues_page_size lignes.
+    """
+    if not rows:
+        return 0
+    columns = _check_attributes(Transaction, {key for row in rows for key in row})
+    params = [{columns[key].key: value for key, value in row.items()} for row in rows]
+    with engine.begin() as conn:
+        conn.execute(insert(Transaction.__table__), params)
+    return len(rows)
+
+
+def copy_transactions(db: Session, rows: Sequence[Mapping], analyze: bool = True) -> int:
+    """
+    Variante COPY de bulk_insert_transactions pour les très gros lots (> 100 000 lignes).
+    Les dicts sont indexés par attribut, comme pour bulk_insert_transactions, et partagent les clés
+    de la première ligne ; l'id absent est généré ici (UUIDv7), COPY n'appliquant pas les valeurs
+    par défaut Python.
+    """
+    if not rows:
+        return 0
+    keys = set(rows[0]) | {"id"}
+    attributes = _check_attributes(Transaction, keys)
+    selected = [(key, column) for key, column in attributes.items() if key in keys]
+    # Colonnes LookupCode (type, statut, devise…) : membre d'énumération -> id SMALLINT
+    convert = [
+        column.type.process_bind_param if isinstance(column.type, LookupCode) else None
+        for _, column in selected
+    ]
+    values = (
+        [
+            fn(full.get(key), None) if fn else full.get(key)
+            for (key, _), fn in zip(selected, convert)
+        ]
+        for full in ({**row, "id": row.get("id") or uuid7()} for row in rows)
+    )
+    columns = [column.name for _, column in selected]
+    return copy_rows(db, Transaction.__table__.name, columns, values, analyze=analyze)
+
+
+def _create_index_concurrently(engine: Engine, index) -> None:
+    """
+    Recrée un index avec CREATE INDEX CONCURRENTLY (hors transaction, sans verrou bloquant les écritures).
+    IF NOT EXISTS : un index déjà reconstruit est ignoré lors d'une reprise (rebuild_indexes).
+    """
+    options = index.dialect_options["postgresql"]
+    previous = options["concurrently"]
+    options["concurrently"] = True
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    finally:
+        options["concurrently"] = previous
+
+
+def _partitions(engine: Engine, table: Table):
+    """
+    Noms des partitions de `table` (y compris la partition DEFAULT), lus dans le catalogue ;
+    None si `table` n'est pas une table partitionnée (relkind 'p').
+    """
+    with engine.connect() as conn:
+        relkind = conn.scalar(
+            text("SELECT relkind FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": table.name},
+        )
+        if relkind != "p":
+            return None
+        return list(conn.scalars(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+            ),
+            {"table": table.name},
+        ))
+
+
+def partition_index_name(index_name: str, partition: str) -> str:
+    """
+    Nom de l'index d'une partition : "<partition>_<empreinte>", au plus 63 caractères (NAMEDATALEN).
+    L'empreinte couvre l'index et la partition : deux index d'une même partition, ou un même index
+    sur deux partitions aux noms tronqués identiques, ne peuvent pas recevoir le même nom.
+    """
+    digest = hashlib.sha1(f"{index_name}:{partition}".encode()).hexdigest()[:8]
+    return f"{partition[:54]}_{digest}"
+
+
+def partitioned_index_ddl(dialect, index, partitions: Sequence[str]) -> list:
+    """
+    Instructions de reconstruction d'un index de table partitionnée, CONCURRENTLY étant refusé
+    sur le parent : l'index parent est créé ON ONLY (invalide, sans lecture des données), l'index
+    de chaque partition est créé CONCURRENTLY puis attaché ; le parent devient valide avec la dernière.
+    IF NOT EXISTS (et ATTACH, sans effet sur un index déjà attaché) rendent la suite rejouable.
+    """
+    preparer = dialect.identifier_preparer
+    index_name = preparer.quote(index.name)
+    parent = preparer.format_table(index.table)
+    prefix = f"CREATE INDEX {index_name} ON {parent} "
+    ddl = str(CreateIndex(index).compile(dialect=dialect))  # "%" déjà doublés pour le driver
+    statements = [ddl.replace(prefix, f"CREATE INDEX IF NOT EXISTS {index_name} ON ONLY {parent} ", 1)]
+    for partition in partitions:
+        partition_index = preparer.quote(partition_index_name(index.name, partition))
+        statements.append(ddl.replace(
+            prefix,
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {preparer.quote(partition)} ",
+            1,
+        ))
+        statements.append(f"ALTER INDEX {index_name} ATTACH PARTITION {partition_index}")
+    return statements
+
+
+def _create_partitioned_index_concurrently(engine: Engine, index, partitions: Sequence[str]) -> None:
+    """
+    Exécute partitioned_index_ddl hors transaction (CONCURRENTLY l'exige).
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in partitioned_index_ddl(engine.dialect, index, partitions):
+            conn.exec_driver_sql(statement)
+
+
+def rebuild_indexes(engine: Engine, table: Table, indexes=None, workers: int = 4) -> None:
+    """
+    (Re)crée les index non uniques de `table` (ou `indexes`) CONCURRENTLY, en parallèle sur
+    `workers` connexions ; sur une table partitionnée, partition par partition
+    (voir partitioned_index_ddl). Rejouable : les index déjà présents sont conservés.
+    Chaque échec est journalisé, puis une RuntimeError nomme les index à reconstruire.
+    """
+    if indexes is None:
+        indexes = [ix for ix in table.indexes if not ix.unique]
+    partitions = _partitions(engine, table)
+    if partitions is not None:
+        create = lambda ix: _create_partitioned_index_concurrently(engine, ix, partitions)
+    else:
+        create = lambda ix: _create_index_concurrently(engine, ix)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {index.name: pool.submit(create, index) for index in indexes}
+    failed = []
+    for name, future in futures.items():
+        if future.exception() is not None:
+            logger.error("Index rebuild failed: %s.%s", table.name, name, exc_info=future.exception())
+            failed.append(name)
+    if failed:
+        raise RuntimeError(
+            f"Index rebuild failed on {table.name}: {', '.join(failed)}; "
+            f"rerun rebuild_indexes() to restore them"
+        )
+
+
+@contextmanager
+def deferred_indexes(engine: Engine, table: Table, workers: int = 4):
+    """
+    Pour les backfills massifs : supprime les index secondaires non uniques de `table`,
+    laisse le bloc `with` charger les données (copy_rows, bulk_insert…), puis recrée
+    les index avec rebuild_indexes (CREATE INDEX CONCURRENTLY, en parallèle).
+    Les index uniques sont conservés pour garantir l'intégrité pendant le chargement.
+    Si une reconstruction échoue, l'erreur nomme les index manquants (à refaire par rebuild_indexes).
+    """
+    indexes = [ix for ix in table.indexes if not ix.unique]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for index in indexes:
+            conn.execute(DropIndex(index, if_exists=True))
+    try:
+        yield
+    finally:
+        rebuild_indexes(engine, table, indexes, workers)
+
+
+# Index GIN des colonnes search_text générées (sources de la vue search_index)
+SEARCH_TEXT_INDEXES = ("idx_user_search_text", "idx_merchant_search_text", "idx_transaction_search_text")
+
+
+def reindex_search_text(engine: Engine, workers: int = 3) -> None:
+    """
+    Reconstruit les index full-text avec REINDEX INDEX CONCURRENTLY (hors transaction),
+    en parallèle : les tsvector étant des colonnes générées, seuls les index sont à refaire,
+    sans table de staging ni verrou bloquant les écritures.
+    """
+    def _reindex(name):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f'REINDEX INDEX CONCURRENTLY "{name}"'))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_reindex, SEARCH_TEXT_INDEXES))
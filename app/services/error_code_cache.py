@@ -0,0 +1,114 @@
+# app/services/error_code_cache.py
+
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models.TransactionErrorCode import TransactionErrorCode
+
+logger = logging.getLogger(__name__)
+
+# Canal notifié par le trigger trg_notify_error_codes à chaque modification de la table
+CHANNEL = "error_codes_changed"
+# Rechargement de secours si aucune notification n'arrive (ex. LISTEN perdu derrière pgbouncer)
+REFRESH_INTERVAL = 300
+# Attente avant de rouvrir la connexion LISTEN après une coupure
+RECONNECT_DELAY = 5
+
+# Table transaction_error_code entière en mémoire : code -> ligne (détachée de la session)
+_codes: dict = {}
+_changed = asyncio.Event()
+_listen_task: Optional[asyncio.Task] = None
+
+
+def get_error_code(code: str) -> Optional[TransactionErrorCode]:
+    """
+    Retourne la ligne transaction_error_code de `code` depuis le cache (simple dict.get, aucune E/S).
+    """
+    return _codes.get(code)
+
+
+async def load_error_codes() -> int:
+    """
+    Recharge toute la table (quelques dizaines de lignes) et remplace le cache d'un seul coup.
+    Retourne le nombre de codes chargés.
+    """
+    global _codes
+    async with AsyncSessionLocal() as db:
+        rows = (await db.scalars(select(TransactionErrorCode))).all()
+    _codes = {row.code: row for row in rows}
+    return len(_codes)
+
+
+def _on_notify(connection, pid, channel, payload) -> None:
+    _changed.set()  # rappel asyncpg : le rechargement est fait par la boucle
+
+
+def _on_terminate(connection) -> None:
+    _changed.set()  # réveille la boucle, qui constate la fermeture et se reconnecte
+
+
+async def _listen(conn) -> None:
+    """
+    LISTEN sur CHANNEL via `conn`, puis recharge le cache à chaque notification
+    ou au plus tard toutes les REFRESH_INTERVAL secondes. Lève ConnectionError si la connexion se ferme.
+    """
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    driver.add_termination_listener(_on_terminate)
+    await driver.add_listener(CHANNEL, _on_notify)
+    while True:
+        try:
+            await asyncio.wait_for(_changed.wait(), timeout=REFRESH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        if driver.is_closed():
+            raise ConnectionError("LISTEN connection closed")
+        _changed.clear()
+        try:
+            await load_error_codes()
+        except Exception:
+            # Le cache précédent reste en service jusqu'au prochain rechargement
+            logger.exception("Error code cache reload failed")
+
+
+async def _listen_loop() -> None:
+    """
+    Boucle de fond : écoute les modifications (voir _listen) et rouvre la connexion LISTEN
+    après une coupure, en rechargeant le cache pour rattraper les notifications perdues.
+    """
+    while True:
+        try:
+            async with async_engine.connect() as conn:
+                await _listen(conn)
+        except Exception:
+            logger.exception("Error code cache listener failed, reconnecting in %d s", RECONNECT_DELAY)
+        await asyncio.sleep(RECONNECT_DELAY)
+        _changed.set()  # rechargement immédiat à la reconnexion
+
+
+async def start_error_code_cache() -> None:
+    """
+    Charge le cache puis démarre l'écoute des modifications (appelée au démarrage de l'application).
+    """
+    global _listen_task
+    await load_error_codes()
+    if _listen_task is None:
+        _listen_task = asyncio.create_task(_listen_loop())
+
+
+async def stop_error_code_cache() -> None:
+    """
+    Arrête l'écoute des modifications (appelée à l'arrêt de l'application).
+    """
+    global _listen_task
+    if _listen_task is not None:
+        _listen_task.cancel()
+        try:
+            await _listen_task
+        except asyncio.CancelledError:
+            pass
+        _listen_task = None
@@ -0,0 +1,166 @@
+# app/services/failed_transaction_log.py
+
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Écriture groupée : au plus toutes les FLUSH_INTERVAL secondes, ou dès BATCH_SIZE échecs en attente
+FLUSH_INTERVAL = 0.2
+BATCH_SIZE = 500
+# Tampon borné : au-delà, les nouveaux échecs sont écartés (et comptés) pendant une panne prolongée
+MAX_PENDING = 50 * BATCH_SIZE
+# Tentatives d'un lot en échec transitoire (base injoignable…) avant son abandon journalisé
+MAX_ATTEMPTS = 5
+
+# Échecs en attente : (transaction_id, error_code, reason, fraud_detected)
+_pending: list = []
+# Lot en échec transitoire et son nombre de tentatives, retenté seul avant les nouveaux échecs
+_retry: Optional[tuple] = None
+_dropped = 0
+_batch_ready = asyncio.Event()
+_flush_task: Optional[asyncio.Task] = None
+
+_LOG_BULK = text(
+    "CALL log_failed_transactions_bulk("
+    "CAST(:ids AS uuid[]), CAST(:codes AS varchar(50)[]), "
+    "CAST(:reasons AS text[]), CAST(:fraud AS boolean[]))"
+)
+
+
+def record_failed_transaction(transaction_id: uuid.UUID, error_code: Optional[str],
+                              reason: Optional[str], fraud_detected: bool = False) -> None:
+    """
+    Enregistre un échec de transaction en mémoire (aucune E/S).
+    Lors d'un pic d'échecs (refus 3DS, panne PSP), des milliers d'appels donnent
+    une poignée de CALL log_failed_transactions_bulk au lieu d'autant d'allers-retours.
+    Tampon plein (MAX_PENDING) : l'échec est écarté et compté, le total est journalisé au flush suivant.
+    """
+    global _dropped
+    if len(_pending) >= MAX_PENDING:
+        _dropped += 1
+        return
+    _pending.append((transaction_id, error_code, reason, fraud_detected))
+    if len(_pending) >= BATCH_SIZE:
+        _batch_ready.set()  # réveille la boucle sans attendre la fin de l'intervalle
+
+
+def _params(records) -> dict:
+    ids, codes, reasons, fraud = (list(column) for column in zip(*records))
+    return {"ids": ids, "codes": codes, "reasons": reasons, "fraud": fraud}
+
+
+def _dead_letter(records, why: str) -> None:
+    for record in records:
+        logger.error("Failed transaction record dropped (%s): %r", why, record)
+
+
+async def _write_rows(batch) -> int:
+    """
+    Repli ligne à ligne (un SAVEPOINT par échec) après un lot refusé par la base :
+    seules les lignes invalides sont écartées et journalisées, les autres sont écrites.
+    """
+    written = 0
+    async with AsyncSessionLocal() as db:
+        for record in batch:
+            try:
+                async with db.begin_nested():
+                    await db.execute(_LOG_BULK, _params([record]))
+                written += 1
+            except (IntegrityError, DataError) as exc:
+                _dead_letter([record], type(exc.orig).__name__ if exc.orig else type(exc).__name__)
+        await db.commit()
+    return written
+
+
+async def _write_batch(batch, attempts: int) -> int:
+    """
+    Écrit `batch` en un CALL. Lot refusé par une donnée (IntegrityError, DataError) : repli ligne à ligne.
+    Autre erreur (transitoire) : le lot est conservé dans _retry jusqu'à MAX_ATTEMPTS tentatives,
+    puis abandonné et journalisé. Retourne le nombre d'échecs écrits.
+    """
+    global _retry
+    try:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(_LOG_BULK, _params(batch))
+                await db.commit()
+            return len(batch)
+        except (IntegrityError, DataError):
+            logger.warning("Failed transaction batch of %d rejected, retrying row by row", len(batch))
+            return await _write_rows(batch)
+    except Exception:
+        attempts += 1
+        if attempts >= MAX_ATTEMPTS:
+            logger.exception("Failed transaction flush failed %d times: dropping %d records", attempts, len(batch))
+            _dead_letter(batch, "retries exhausted")
+        else:
+            logger.exception("Failed transaction flush failed (attempt %d): %d records kept", attempts, len(batch))
+            _retry = (batch, attempts)
+        return 0
+
+
+async def flush_failed_transactions() -> int:
+    """
+    Écrit en un seul appel tous les échecs accumulés depuis le dernier flush (après le lot à retenter,
+    s'il y en a un ; tant qu'il échoue, les nouveaux échecs restent dans le tampon borné).
+    Retourne le nombre d'échecs écrits. N'échoue pas : les erreurs sont journalisées (voir _write_batch).
+    """
+    global _pending, _retry, _dropped
+    if _dropped:
+        logger.error("Failed transaction buffer full: %d records dropped", _dropped)
+        _dropped = 0
+    written = 0
+    if _retry is not None:
+        (batch, attempts), _retry = _retry, None
+        written += await _write_batch(batch, attempts)
+        if _retry is not None:
+            return written
+    if _pending:
+        batch, _pending = _pending, []
+        written += await _write_batch(batch, 0)
+    return written
+
+
+async def _flush_loop() -> None:
+    """
+    Boucle de fond : vide le tampon toutes les FLUSH_INTERVAL secondes, ou plus tôt si le lot est plein.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(_batch_ready.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _batch_ready.clear()
+        await flush_failed_transactions()  # n'échoue pas : les erreurs sont journalisées (voir _write_batch)
+
+
+def start_failed_transaction_flusher() -> None:
+    """
+    Démarre la tâche de fond d'écriture groupée (appelée au démarrage de l'application).
+    """
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_failed_transaction_flusher() -> None:
+    """
+    Arrête la tâche de fond puis écrit les échecs restants (appelée à l'arrêt de l'application).
+    """
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_failed_transactions()
@@ -0,0 +1,44 @@
+# app/services/webhook_log_writer.py
+
+from typing import Mapping, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.WebhookLog import WebhookLog
+from app.services.bulk_service import copy_rows
+from app.utils.ids import uuid7
+
+# Au-delà de ce nombre de lignes, COPY est plus rapide qu'un INSERT multi-VALUES
+COPY_THRESHOLD = 200
+
+
+def copy_webhook_logs(db: Session, rows: Sequence[Mapping]) -> int:
+    """
+    Écrit des lignes webhook_log via COPY ... FROM STDIN (ni analyse SQL ni aller-retour par ligne).
+    Les dicts sont indexés par attribut et partagent les clés de la première ligne ;
+    l'id absent est généré ici (UUIDv7, COPY n'appliquant pas les valeurs par défaut Python),
+    les autres colonnes absentes (created_at…) reçoivent leur valeur par défaut serveur.
+    """
+    if not rows:
+        return 0
+    table = WebhookLog.__table__
+    keys = set(rows[0]) | {"id"}
+    columns = [c for c in table.columns if c.key in keys]
+    values = (
+        [full.get(c.key) for c in columns]
+        for full in ({**row, "id": row.get("id") or uuid7()} for row in rows)
+    )
+    return copy_rows(db, table.name, [c.name for c in columns], values, analyze=False)
+
+
+def write_webhook_logs(db: Session, rows: Sequence[Mapping]) -> int:
+    """
+    Point d'entrée du vidage des livraisons terminées : COPY au-delà de COPY_THRESHOLD lignes,
+    INSERT multi-VALUES en dessous (le COPY ne vaut pas son coût fixe pour quelques lignes).
+    """
+    if len(rows) > COPY_THRESHOLD:
+        return copy_webhook_logs(db, rows)
+    if rows:
+        db.execute(insert(WebhookLog), list(rows))
+    return len(rows)
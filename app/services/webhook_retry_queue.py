@@ -0,0 +1,113 @@
+# app/services/webhook_retry_queue.py
+
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.database import async_engine
+
+logger = logging.getLogger(__name__)
+
+# Canal notifié par les triggers trg_notify_webhook_retry_queue_* (instructions qui modifient la file)
+CHANNEL = "webhook_retry_queue_changed"
+# Délai minimal entre les débuts de deux rafraîchissements : une rafale d'écritures donne un seul REFRESH.
+# Si un REFRESH dure plus longtemps, l'intervalle s'aligne sur sa durée (au plus un REFRESH en cours sur deux)
+MIN_REFRESH_INTERVAL = 1.0
+# Rafraîchissement de secours si aucune notification n'arrive (ex. LISTEN inopérant derrière pgbouncer)
+REFRESH_INTERVAL = 60
+# Attente avant de rouvrir la connexion LISTEN après une coupure
+RECONNECT_DELAY = 5
+
+_changed = asyncio.Event()
+_refresh_task: Optional[asyncio.Task] = None
+
+_REFRESH = text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_webhook_retry_queue")
+
+
+async def refresh_webhook_retry_queue() -> None:
+    """
+    Rafraîchit mv_webhook_retry_queue sans bloquer ses lecteurs (CONCURRENTLY).
+    """
+    async with async_engine.begin() as conn:
+        await conn.execute(_REFRESH)
+
+
+def _on_notify(connection, pid, channel, payload) -> None:
+    _changed.set()  # rappel asyncpg : le rafraîchissement est fait par la boucle
+
+
+def _on_terminate(connection) -> None:
+    _changed.set()  # réveille la boucle, qui constate la fermeture et se reconnecte
+
+
+async def _listen(conn) -> None:
+    """
+    LISTEN sur CHANNEL via `conn`, puis un REFRESH par rafale de notifications, espacés d'au moins
+    MIN_REFRESH_INTERVAL secondes, ou au plus tard toutes les REFRESH_INTERVAL secondes.
+    Lève ConnectionError si la connexion se ferme.
+    """
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    driver.add_termination_listener(_on_terminate)
+    await driver.add_listener(CHANNEL, _on_notify)
+    loop = asyncio.get_running_loop()
+    last_started = last_duration = 0.0
+    while True:
+        try:
+            await asyncio.wait_for(_changed.wait(), timeout=REFRESH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        if driver.is_closed():
+            raise ConnectionError("LISTEN connection closed")
+        # Regroupe les notifications rapprochées : attend le reste de l'intervalle depuis le dernier REFRESH
+        delay = max(MIN_REFRESH_INTERVAL, last_duration) - (loop.time() - last_started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        _changed.clear()
+        last_started = loop.time()
+        try:
+            await refresh_webhook_retry_queue()
+        except Exception:
+            # La vue garde son contenu précédent jusqu'au prochain rafraîchissement
+            logger.exception("Webhook retry queue refresh failed")
+        last_duration = loop.time() - last_started
+
+
+async def _refresh_loop() -> None:
+    """
+    Boucle de fond : rafraîchit la vue à la demande (voir _listen) et rouvre la connexion LISTEN
+    après une coupure, avec un rafraîchissement immédiat pour rattraper les notifications perdues.
+    """
+    while True:
+        try:
+            async with async_engine.connect() as conn:
+                await _listen(conn)
+        except Exception:
+            logger.exception("Webhook retry queue listener failed, reconnecting in %d s", RECONNECT_DELAY)
+        await asyncio.sleep(RECONNECT_DELAY)
+        _changed.set()  # rafraîchissement immédiat à la reconnexion
+
+
+def start_webhook_retry_queue_refresher() -> None:
+    """
+    Démarre le rafraîchissement à la demande (appelée au démarrage de l'application).
+    """
+    global _refresh_task
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop_webhook_retry_queue_refresher() -> None:
+    """
+    Arrête le rafraîchissement à la demande (appelée à l'arrêt de l'application).
+    """
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
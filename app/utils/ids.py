@@ -0,0 +1,24 @@
+# app/utils/ids.py
+import os
+import time
+import uuid
+
+
+def _uuid7() -> uuid.UUID:
+    """
+    Génère un UUID version 7 (RFC 9562) : horodatage Unix en millisecondes sur 48 bits,
+    suivi de 74 bits aléatoires. Les identifiants sont croissants dans le temps,
+    ce qui rend les insertions dans l'index B-tree de la clé primaire quasi séquentielles.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80  # unix_ts_ms (48 bits)
+    value |= 0x7 << 76                                 # version 7
+    value |= ((rand >> 62) & 0xFFF) << 64              # rand_a (12 bits)
+    value |= 0b10 << 62                                # variante RFC 4122
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF              # rand_b (62 bits)
+    return uuid.UUID(int=value)
+
+
+# Python 3.14+ fournit uuid.uuid7() nativement
+uuid7 = getattr(uuid, "uuid7", _uuid7)
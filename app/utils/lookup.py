@@ -0,0 +1,66 @@
+# app/utils/lookup.py
+from sqlalchemy import Column, DDL, SmallInteger, String, Table, event
+from sqlalchemy.types import TypeDecorator
+
+from app.database import Base
+
+
+class LookupCode(TypeDecorator):
+    """
+    Colonne SMALLINT (clé d'une table de référence) exposée en Python comme membre d'énumération.
+    La correspondance code <-> id est un dictionnaire en mémoire : aucune requête pour la traduire.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class, ids):
+        super().__init__()
+        self.enum_class = enum_class
+        # Les attributs nommés comme les arguments d'__init__ forment la clé de cache
+        # SQLAlchemy (cache_ok) : ils doivent être hachables, d'où le tuple
+        self.ids = tuple(ids.items())
+        self.members = {v: k for k, v in ids.items()}
+        # Table précalculée membre -> id et valeur texte -> id : un seul dict.get par écriture,
+        # sans passer par enum_class(value) (EnumMeta.__call__ / _missing_)
+        self._bind_ids = {**ids, **{member.value: i for member, i in ids.items()}}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self._bind_ids[value]  # accepte le membre ou sa valeur texte
+        except KeyError:
+            raise ValueError(f"{value!r} is not a valid {self.enum_class.__name__}") from None
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.members[value]
+
+
+def lookup_ids(enum_class) -> dict:
+    """
+    Identifiants figés dans l'ordre de déclaration de l'énumération (1, 2, 3…).
+    Les nouvelles valeurs doivent être ajoutées en fin d'énumération pour ne pas décaler les ids.
+    """
+    return {member: i for i, member in enumerate(enum_class, start=1)}
+
+
+def lookup_table(name: str, ids: dict) -> Table:
+    """
+    Déclare une table de référence (id SMALLINT, code unique) remplie à sa création.
+    Ajouter une valeur revient à un simple INSERT, sans ALTER TYPE ... ADD VALUE.
+    """
+    table = Table(
+        name,
+        Base.metadata,
+        Column("id", SmallInteger, primary_key=True, autoincrement=False),
+        Column("code", String(32), nullable=False, unique=True),
+    )
+    rows = ", ".join(f"({i}, '{member.value}')" for member, i in ids.items())
+    event.listen(
+        table,
+        "after_create",
+        DDL(f"INSERT INTO {name} (id, code) VALUES {rows} ON CONFLICT (id) DO NOTHING"),
+    )
+    return table
@@ -1,24 +1,71 @@
 # app/utils/security.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+# Nouveaux hashs en argon2id (résistant aux GPU/ASIC), profil OWASP « faible mémoire » :
+# 19 MiB, 2 passes, 1 fil. Les hashs bcrypt existants restent vérifiables et sont
+# convertis en argon2id à la connexion suivante (voir needs_rehash).
+_argon2 = PasswordHasher(memory_cost=19456, time_cost=2, parallelism=1)
+# Méthodes liées résolues une fois : appel direct, sans recherche d'attribut à chaque hash/vérification
+_argon2_hash = _argon2.hash
+_argon2_verify = _argon2.verify
+_bcrypt_checkpw = bcrypt.checkpw
+
+# bcrypt ne prend en compte que les 72 premiers octets (au-delà, bcrypt >= 4.1 lève une erreur) :
+# troncature explicite, comme le faisait passlib
+_BCRYPT_MAX_BYTES = 72
+
 
-# Si l'attribut __about__ n'existe pas dans bcrypt, on le définit pour éviter l'erreur
-if not hasattr(bcrypt, '__about__'):
-    bcrypt.__about__ = {'__version__': bcrypt.__version__}
+# Pool dédié aux hashs (volontairement lents) : une rafale de connexions occupe au plus un fil par cœur
+# et ne prive ni la boucle d'événements ni le threadpool de FastAPI (handlers synchrones).
+# Des fils suffisent : argon2-cffi et bcrypt relâchent le GIL pendant le calcul.
+_HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="password-hash")
 
 
-from passlib.context import CryptContext
+def _is_bcrypt(hashed_password: str) -> bool:
+    return hashed_password.startswith(("$2a$", "$2b$", "$2y$"))
 
-# Création d'un contexte bcrypt pour le hashage des mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_password_hash(password: str) -> str:
     """
-    Retourne le hash bcrypt du mot de passe fourni.
+    Retourne le hash argon2id du mot de passe fourni.
     """
-    return pwd_context.hash(password)
+    return _argon2_hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Vérifie que le mot de passe en clair correspond au mot de passe hashé.
+    Vérifie que le mot de passe en clair correspond au mot de passe hashé (argon2id ou bcrypt).
+    """
+    try:
+        if _is_bcrypt(hashed_password):
+            return _bcrypt_checkpw(plain_password.encode("utf-8")[:_BCRYPT_MAX_BYTES],
+                                   hashed_password.encode("ascii"))
+        return _argon2_verify(hashed_password, plain_password)
+    except (ValueError, VerificationError, InvalidHashError):
+        return False  # mauvais mot de passe ou hash mal formé : refus plutôt qu'une erreur 500
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Indique si le hash doit être recalculé (bcrypt ou paramètres argon2 antérieurs) :
+    à appeler après une vérification réussie, quand le mot de passe en clair est disponible.
+    """
+    return _is_bcrypt(hashed_password) or _argon2.check_needs_rehash(hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    """
+    get_password_hash exécuté dans le pool dédié, pour les handlers async.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_HASH_POOL, get_password_hash, password)
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password exécuté dans le pool dédié, pour les handlers async.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await asyncio.get_running_loop().run_in_executor(
+        _HASH_POOL, verify_password, plain_password, hashed_password
+    )
@@ -0,0 +1,26 @@
+# app/utils/triggers.py
+from sqlalchemy import DDL
+
+
+def updated_ts_ddl(table_name: str, trigger_name: str, column: str = "updated_at") -> DDL:
+    """
+    DDL du trigger BEFORE UPDATE qui horodate `column` avec clock_timestamp().
+    Une seule fonction partagée par colonne (set_updated_ts pour updated_at,
+    set_last_updated_ts pour last_updated…) au lieu d'une fonction par table.
+    CREATE OR REPLACE rend la création de la fonction indépendante de l'ordre des tables.
+    clock_timestamp() : des lignes modifiées dans une même transaction reçoivent des horodatages distincts.
+    """
+    function_name = "set_updated_ts" if column == "updated_at" else f"set_{column}_ts"
+    return DDL(f"""
+CREATE OR REPLACE FUNCTION {function_name}()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.{column} := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {trigger_name}
+BEFORE UPDATE ON {table_name}
+FOR EACH ROW EXECUTE FUNCTION {function_name}();
+""")
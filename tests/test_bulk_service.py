@@ -0,0 +1,107 @@
+# tests/test_bulk_service.py
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.dialects.postgresql import psycopg2
+
+from app.models.Transaction import Transaction
+from app.services import bulk_service
+from app.services.bulk_service import bulk_insert_transactions, partition_index_name, partitioned_index_ddl
+
+# Partitions mensuelles de "transaction" telles que créées par create_transaction_partitions()
+PARTITIONS = ["transaction_default", "transaction_y2025m01", "transaction_y2025m02"]
+
+
+def test_partition_index_names_are_bounded_and_unique():
+    """
+    Un nom par (index, partition), jamais plus de 63 caractères : aucune troncature ni collision.
+    """
+    names = [
+        partition_index_name(index.name, partition)
+        for index in Transaction.__table__.indexes
+        for partition in PARTITIONS
+    ]
+    assert all(len(name) <= 63 for name in names)
+    assert len(set(names)) == len(names)
+
+
+def test_partition_index_names_survive_long_partition_names():
+    long_a = "p" * 70 + "a"
+    long_b = "p" * 70 + "b"
+    assert partition_index_name("idx", long_a) != partition_index_name("idx", long_b)
+
+
+def test_partitioned_index_ddl():
+    """
+    Index parent ON ONLY, puis pour chaque partition CREATE INDEX CONCURRENTLY et ATTACH PARTITION.
+    """
+    dialect = psycopg2.dialect()
+    index = next(ix for ix in Transaction.__table__.indexes if ix.name == "idx_transaction_metadata_gin")
+    statements = partitioned_index_ddl(dialect, index, PARTITIONS)
+
+    assert len(statements) == 1 + 2 * len(PARTITIONS)
+    assert statements[0].startswith(
+        'CREATE INDEX IF NOT EXISTS idx_transaction_metadata_gin ON ONLY transaction USING gin'
+    )
+    for partition, create, attach in zip(PARTITIONS, statements[1::2], statements[2::2]):
+        name = partition_index_name(index.name, partition)
+        assert create.startswith(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {partition} USING gin")
+        assert "jsonb_path_ops" in create
+        assert attach == f"ALTER INDEX idx_transaction_metadata_gin ATTACH PARTITION {name}"
+
+
+class _RecordingConnection:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, statement, params):
+        self.calls.append((statement, params))
+
+
+class _RecordingEngine:
+    def __init__(self):
+        self.conn = _RecordingConnection()
+
+    @contextmanager
+    def begin(self):
+        yield self.conn
+
+
+def test_bulk_insert_transactions_maps_attribute_keys():
+    """
+    transaction_metadata (attribut) est écrit dans la colonne "metadata", pas ignoré.
+    """
+    engine = _RecordingEngine()
+    rows = [{"amount": 100, "transaction_metadata": {"iv": "abc"}}]
+
+    assert bulk_insert_transactions(engine, rows) == 1
+    statement, params = engine.conn.calls[0]
+    assert params == [{"amount": 100, "metadata": {"iv": "abc"}}]
+    compiled = statement.compile(dialect=psycopg2.dialect(), column_keys=list(params[0]))
+    assert "metadata" in compiled.params
+
+
+def test_copy_transactions_maps_attribute_keys(monkeypatch):
+    captured = {}
+
+    def fake_copy_rows(db, table_name, columns, values, analyze=True):
+        captured.update(table=table_name, columns=columns, values=list(values))
+        return len(captured["values"])
+
+    monkeypatch.setattr(bulk_service, "copy_rows", fake_copy_rows)
+    rows = [{"amount": 100, "transaction_metadata": {"iv": "abc"}}]
+
+    assert bulk_service.copy_transactions(None, rows) == 1
+    assert captured["table"] == "transaction"
+    assert set(captured["columns"]) == {"id", "amount", "metadata"}
+    values = dict(zip(captured["columns"], captured["values"][0]))
+    assert values["metadata"] == {"iv": "abc"}
+    assert values["amount"] == 100
+
+
+def test_unknown_attribute_is_rejected():
+    with pytest.raises(ValueError, match="metadata"):
+        bulk_insert_transactions(_RecordingEngine(), [{"metadata": {}}])
+    with pytest.raises(ValueError, match="bogus"):
+        bulk_service.copy_transactions(None, [{"bogus": 1}])
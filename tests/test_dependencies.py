@@ -0,0 +1,49 @@
+# tests/test_dependencies.py
+
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+import xxhash
+from fastapi import HTTPException
+
+from app import dependencies
+from app.services.auth_service import create_access_token
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    dependencies._token_cache.clear()
+    yield
+    dependencies._token_cache.clear()
+
+
+def test_decode_user_id_hashes_str_tokens():
+    """
+    Le token (str) est encodé avant xxh3 : xxhash 4 refuse les chaînes.
+    """
+    user_id = uuid.uuid4()
+    token = create_access_token({"sub": str(user_id)})
+    assert dependencies._decode_user_id(token) == user_id
+    assert dependencies._decode_user_id(token) == user_id  # second appel : depuis le cache
+
+
+def test_invalid_token_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        dependencies._decode_user_id("not-a-jwt")
+    assert exc.value.status_code == 401
+
+
+def test_cached_token_expires_with_its_exp():
+    """
+    Un token présent dans le cache est refusé dès son exp atteint, même pendant le TTL du cache.
+    """
+    user_id = uuid.uuid4()
+    token = create_access_token({"sub": str(user_id)}, expires_delta=timedelta(seconds=-1))
+    token_key = xxhash.xxh3_64_intdigest(token.encode())
+    dependencies._token_cache[token_key] = (token, user_id, int(time.time()) - 1)
+
+    with pytest.raises(HTTPException) as exc:
+        dependencies._decode_user_id(token)
+    assert exc.value.status_code == 401
@@ -0,0 +1,112 @@
+# tests/test_failed_transaction_log.py
+
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services import failed_transaction_log as ftl
+
+POISON = uuid.UUID(int=0)
+
+
+class _FakeSession:
+    """
+    Session factice : rejette (IntegrityError) tout appel contenant POISON, ou échoue
+    (OperationalError) tant que `down` est vrai ; les appels validés sont ajoutés à `written`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.staged = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin_nested(self):
+        session = self
+
+        class _Savepoint:
+            async def __aenter__(self):
+                self.mark = len(session.staged)
+
+            async def __aexit__(self, exc_type, exc, tb):
+                if exc_type is not None:
+                    del session.staged[self.mark:]
+                return False
+
+        return _Savepoint()
+
+    async def execute(self, statement, params):
+        if self.db.down:
+            raise OperationalError("CALL", params, Exception("connection refused"))
+        if POISON in params["ids"]:
+            raise IntegrityError("CALL", params, Exception("violates check constraint"))
+        self.staged.extend(params["ids"])
+
+    async def commit(self):
+        self.db.written.extend(self.staged)
+
+
+class _FakeDatabase:
+    def __init__(self):
+        self.down = False
+        self.written = []
+
+    def __call__(self):
+        return _FakeSession(self)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = _FakeDatabase()
+    monkeypatch.setattr(ftl, "AsyncSessionLocal", database)
+    monkeypatch.setattr(ftl, "_pending", [])
+    monkeypatch.setattr(ftl, "_retry", None)
+    monkeypatch.setattr(ftl, "_dropped", 0)
+    return database
+
+
+def test_poison_record_does_not_block_the_batch(db):
+    good = [uuid.uuid4() for _ in range(3)]
+    for transaction_id in (good[0], POISON, *good[1:]):
+        ftl.record_failed_transaction(transaction_id, "E1", "declined")
+
+    assert asyncio.run(ftl.flush_failed_transactions()) == 3
+    assert db.written == good
+    assert ftl._pending == [] and ftl._retry is None
+
+
+def test_transient_failure_is_retried_then_dropped(db):
+    db.down = True
+    ftl.record_failed_transaction(uuid.uuid4(), "E1", "declined")
+    for attempt in range(1, ftl.MAX_ATTEMPTS):
+        asyncio.run(ftl.flush_failed_transactions())
+        assert ftl._retry[1] == attempt
+    asyncio.run(ftl.flush_failed_transactions())
+    assert ftl._retry is None and db.written == []
+
+
+def test_transient_failure_recovers(db):
+    db.down = True
+    first = uuid.uuid4()
+    ftl.record_failed_transaction(first, "E1", "declined")
+    asyncio.run(ftl.flush_failed_transactions())
+    second = uuid.uuid4()
+    ftl.record_failed_transaction(second, "E2", "declined")
+
+    db.down = False
+    assert asyncio.run(ftl.flush_failed_transactions()) == 2
+    assert db.written == [first, second]
+
+
+def test_buffer_is_bounded(db, monkeypatch):
+    monkeypatch.setattr(ftl, "MAX_PENDING", 2)
+    for _ in range(5):
+        ftl.record_failed_transaction(uuid.uuid4(), "E1", "declined")
+    assert len(ftl._pending) == 2
+    assert ftl._dropped == 3
@@ -0,0 +1,21 @@
+# tests/test_imports.py
+
+import importlib
+
+
+def test_all_models_load():
+    """
+    Tous les modèles se chargent (index, contraintes et DDL résolus sur leurs tables).
+    """
+    from app.models import load_all_models
+
+    load_all_models()
+
+
+def test_application_imports():
+    """
+    L'application et ses routeurs s'importent : une erreur de déclaration échoue ici, pas à la première requête.
+    """
+    main = importlib.import_module("app.main")
+    for module_name in main.ROUTER_MODULES:
+        importlib.import_module(module_name)
@@ -0,0 +1,30 @@
+# tests/test_wallet_audit_log.py
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.WalletAuditLog import AUDIT_HASH_VERSION, audit_entry_hash
+
+
+def test_audit_entry_hash_is_versioned_and_offset_independent():
+    """
+    Le hash porte le préfixe de version et ne dépend que de l'instant, pas du fuseau d'origine.
+    """
+    wallet_id = uuid.uuid4()
+    utc = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+    paris = utc.astimezone(timezone(timedelta(hours=2)))
+
+    digest = audit_entry_hash(wallet_id, 1_000, utc)
+    assert digest.startswith(f"{AUDIT_HASH_VERSION}:")
+    assert len(digest) == len(AUDIT_HASH_VERSION) + 1 + 64
+    assert audit_entry_hash(wallet_id, 1_000, paris) == digest
+
+
+def test_audit_entry_hash_rejects_naive_datetime():
+    """
+    Un changed_at sans fuseau est refusé explicitement.
+    """
+    with pytest.raises(ValueError):
+        audit_entry_hash(uuid.uuid4(), 1_000, datetime(2025, 6, 1, 12, 0))